@@ -0,0 +1,88 @@
+"""Click, snapshot and recovery costs of the autosave journal
+
+    python benchmarks/bench_journal.py --results 1000000 --clicks 100000 --retention 0 5000
+
+Builds a session of random results and snapshots it, then times journaling
+clicks one by one, the snapshot that compacts them (only the copy made on
+the caller's thread, the write is in the background) and recovering the
+session from the snapshot and the journal of clicks.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import AnalysisEngine
+from journal import Journal
+
+
+def summary(times):
+    times = sorted(times)
+    return (f"mean {sum(times) / len(times) * 1e6:8.2f} us  "
+            f"p50 {times[len(times) // 2] * 1e6:8.2f} us  "
+            f"p95 {times[int(len(times) * 0.95)] * 1e6:8.2f} us")
+
+
+def run(retention, args, directory):
+    rnd = random.Random(args.seed)
+    engine = AnalysisEngine(retention=retention)
+    engine.add_results([rnd.choice("WL") for _ in range(args.results)])
+    directory = os.path.join(directory, f"bench-{retention}")
+
+    journal = Journal(directory)
+    journal.snapshot(engine)
+
+    # Only the journaling is timed, the click's own analysis is the same either way
+    clicks = []
+    for _ in range(args.clicks):
+        result = rnd.choice("WL")
+        engine.add_result(result)
+        start = time.perf_counter()
+        journal.add_results(result)
+        clicks.append(time.perf_counter() - start)
+    journal.close()
+
+    start = time.perf_counter()
+    recovered = Journal(directory)
+    recovered.recover()
+    replayed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recovered.snapshot(engine)
+    snapshot = time.perf_counter() - start
+    recovered.close()
+
+    start = time.perf_counter()
+    compacted = Journal(directory)
+    compacted.recover()
+    reopened = time.perf_counter() - start
+    compacted.close()
+
+    print(f"retention {retention or 'unlimited'}: {args.results:,} results, {args.clicks:,} clicks")
+    print(f"    journal click      {summary(clicks)}")
+    print(f"    recover            {replayed * 1e3:9.1f} ms with the clicks in the journal")
+    print(f"    snapshot           {snapshot * 1e3:9.1f} ms on the caller's thread")
+    print(f"    recover compacted  {reopened * 1e3:9.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=1000000, help="results in the session (default 1000000)")
+    parser.add_argument("--clicks", type=int, default=100000, help="clicks journaled one by one (default 100000)")
+    parser.add_argument("--retention", type=int, nargs="+", default=[0, 5000],
+                        help="retentions to compare (default 0, unlimited, and 5000)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for retention in args.retention:
+            run(retention, args, directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Micro-benchmark for the recent results grid
+
+    python benchmarks/bench_recent_results.py --updates 2000
+
+Times one grid update per WIN/LOSS press for the previous implementation,
+which deleted and recreated 20 styled labels, against the window's pooled
+cells. Posted events (deferred deletes, polish, layout) are flushed inside
+the timed section so both pay for the work they leave behind.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QEvent, Qt
+from PyQt5.QtWidgets import QApplication, QGridLayout, QLabel, QWidget
+
+from pattern import ModernBaccaratAnalyzer
+
+
+def legacy_update(grid, results):
+    """The recent results update before pooling"""
+    for i in range(grid.count()):
+        item = grid.itemAt(i)
+        if item:
+            widget = item.widget()
+            if widget:
+                widget.deleteLater()
+
+    results_to_show = min(20, len(results))
+    if results_to_show == 0:
+        return
+
+    row, col = 0, 0
+    for result in results[-results_to_show:]:
+        result_label = QLabel(result)
+        result_label.setAlignment(Qt.AlignCenter)
+        result_label.setFixedSize(18, 18)
+        result_label.setStyleSheet(
+            f"background-color: {'#2e7d32' if result == 'W' else '#c62828'}; "
+            f"color: white; font-weight: bold; border-radius: 2px;"
+        )
+        grid.addWidget(result_label, row, col)
+
+        col += 1
+        if col >= 10:
+            col = 0
+            row += 1
+
+
+def time_updates(app, update, window, updates, seed):
+    """Appends random results and returns the per-update times in seconds"""
+    rnd = random.Random(seed)
+    times = []
+    for _ in range(updates):
+        window.engine.results.append(rnd.choice("WL"))
+        start = time.perf_counter()
+        update()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+        app.processEvents()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summary(times):
+    times = sorted(times)
+    return (f"mean {sum(times) / len(times) * 1e6:8.1f} us  "
+            f"p50 {times[len(times) // 2] * 1e6:8.1f} us  "
+            f"p95 {times[int(len(times) * 0.95)] * 1e6:8.1f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000, help="grid updates to time (default 2000)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = ModernBaccaratAnalyzer()
+    window.show()
+
+    # The legacy grid lives in the same window so it inherits the same stylesheet
+    legacy_widget = QWidget(window)
+    legacy_grid = QGridLayout(legacy_widget)
+    legacy = time_updates(app, lambda: legacy_update(legacy_grid, window.engine.results),
+                          window, args.updates, args.seed)
+
+    window.engine.clear()
+    pooled = time_updates(app, window.update_recent_results, window, args.updates, args.seed)
+
+    print(f"legacy  {summary(legacy)}")
+    print(f"pooled  {summary(pooled)}")
+    print(f"speedup {sum(legacy) / sum(pooled):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
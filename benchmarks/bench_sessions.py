@@ -0,0 +1,76 @@
+"""Throughput and latency benchmark for many concurrent sessions
+
+    python benchmarks/bench_sessions.py --tables 500 --history 2000 --rounds 20 --workers 0 4
+
+Fills every table with a history of random results, then times rounds in
+which every table gets one new result in a single add_results batch, and
+single results sent to one table at a time, for each worker count.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sessions import SessionManager
+
+
+def summary(times):
+    times = sorted(times)
+    return (f"mean {sum(times) / len(times) * 1e6:8.1f} us  "
+            f"p50 {times[len(times) // 2] * 1e6:8.1f} us  "
+            f"p95 {times[int(len(times) * 0.95)] * 1e6:8.1f} us")
+
+
+def run(workers, args):
+    rnd = random.Random(args.seed)
+    tables = [f"table-{i}" for i in range(args.tables)]
+    with SessionManager(workers=workers, retention=args.retention) as manager:
+        manager.add_results([(table, rnd.choice("WL")) for table in tables for _ in range(args.history)])
+
+        rounds = []
+        for _ in range(args.rounds):
+            events = [(table, rnd.choice("WL")) for table in tables]
+            start = time.perf_counter()
+            manager.add_results(events)
+            rounds.append(time.perf_counter() - start)
+
+        singles = []
+        for _ in range(args.singles):
+            event = (rnd.choice(tables), rnd.choice("WL"))
+            start = time.perf_counter()
+            manager.add_results([event])
+            singles.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        manager.predict()
+        predict_all = time.perf_counter() - start
+
+    per_result = sum(rounds) / (len(rounds) * args.tables)
+    print(f"workers {workers}: round of {args.tables} results {summary(rounds)}")
+    print(f"           per result in a round {per_result * 1e6:8.1f} us ({1 / per_result:,.0f} results/s)")
+    print(f"           single result         {summary(singles)}")
+    print(f"           predict all tables    {predict_all * 1e3:8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=500, help="concurrent sessions (default 500)")
+    parser.add_argument("--history", type=int, default=2000, help="results per table before timing (default 2000)")
+    parser.add_argument("--retention", type=int, default=0, help="results kept per table (default 0, all)")
+    parser.add_argument("--rounds", type=int, default=20, help="rounds of one result per table (default 20)")
+    parser.add_argument("--singles", type=int, default=2000, help="single results to time (default 2000)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count()],
+                        help="worker process counts to compare (default 0 and all cores)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    for workers in args.workers:
+        run(workers, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Write and reopen costs of the SQLite session store against session files
+
+    python benchmarks/bench_store.py --results 1000000 --clicks 5000 --retention 0 5000
+
+Builds a session of random results, then times recording clicks one by one
+into a store (a sync per click, written in batches), saving the whole
+session to a .wls file for comparison, and reopening the session from both.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionStore
+from engine import AnalysisEngine
+from storage import load_session, save_session
+
+
+def summary(times):
+    times = sorted(times)
+    return (f"mean {sum(times) / len(times) * 1e6:8.1f} us  "
+            f"p50 {times[len(times) // 2] * 1e6:8.1f} us  "
+            f"p95 {times[int(len(times) * 0.95)] * 1e6:8.1f} us")
+
+
+def run(retention, args, directory):
+    rnd = random.Random(args.seed)
+    engine = AnalysisEngine(retention=retention)
+    engine.add_results([rnd.choice("WL") for _ in range(args.results)])
+    store_path = os.path.join(directory, f"bench-{retention}.wldb")
+    session_path = os.path.join(directory, f"bench-{retention}.wls")
+
+    store = SessionStore(store_path)
+    start = time.perf_counter()
+    store.save("bench", engine)
+    saved = time.perf_counter() - start
+
+    # Only the sync is timed, the click's own analysis is the same either way
+    syncs = []
+    for _ in range(args.clicks):
+        engine.add_result(rnd.choice("WL"))
+        start = time.perf_counter()
+        store.sync(engine)
+        syncs.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    store.close()
+    closed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    save_session(session_path, engine)
+    file_saved = time.perf_counter() - start
+
+    start = time.perf_counter()
+    SessionStore(store_path).load("bench", AnalysisEngine(retention=retention))
+    reopened = time.perf_counter() - start
+    start = time.perf_counter()
+    load_session(session_path, AnalysisEngine(retention=retention))
+    file_loaded = time.perf_counter() - start
+
+    print(f"retention {retention or 'unlimited'}: {args.results:,} results")
+    print(f"    store save         {saved * 1e3:9.1f} ms   close {closed * 1e3:7.1f} ms   "
+          f"{os.path.getsize(store_path) / 1e6:7.2f} MB")
+    print(f"    store click        {summary(syncs)}")
+    print(f"    session file save  {file_saved * 1e3:9.1f} ms per save")
+    print(f"    reopen store       {reopened * 1e3:9.1f} ms   session file {file_loaded * 1e3:7.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=1000000, help="results in the session (default 1000000)")
+    parser.add_argument("--clicks", type=int, default=5000, help="clicks recorded one by one (default 5000)")
+    parser.add_argument("--retention", type=int, nargs="+", default=[0, 5000],
+                        help="retentions to compare (default 0, unlimited, and 5000)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for retention in args.retention:
+            run(retention, args, directory)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""Benchmark suite for the analysis engine and the window
+
+    python benchmarks/bench_suite.py --sizes 1e3 1e4 1e5 1e6 1e7 --output before.json
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+
+Sessions are synthetic W/L sequences from a two-state Markov chain with a
+chosen win rate (--bias) and lag-1 autocorrelation (--autocorrelation).
+Every operation is timed at every size with the window built offscreen;
+results are written as JSON so runs of different versions can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+
+from engine import ALGORITHMS, AnalysisEngine
+from pattern import ModernBaccaratAnalyzer
+
+BULK_SIZE = 1000  # results per add_bulk_results call
+
+
+def synthetic_results(size, bias=0.5, autocorrelation=0.0, seed=0):
+    """W/L values (W=1) from a Markov chain with win rate bias and lag-1 autocorrelation
+
+    The chain stays on W with probability bias + a * (1 - bias) and moves
+    from L to W with probability bias * (1 - a), so runs are geometric and
+    the sequence is built run by run without a Python loop.
+    """
+    if not 0 < bias < 1:
+        raise ValueError("bias must be between 0 and 1")
+    stay_w = bias + autocorrelation * (1 - bias)
+    to_w = bias * (1 - autocorrelation)
+    if not (0 <= stay_w < 1 and 0 < to_w <= 1):
+        raise ValueError(f"autocorrelation {autocorrelation} is out of range for bias {bias}")
+
+    rng = np.random.default_rng(seed)
+    first = int(rng.random() < bias)
+    runs = []
+    length = 0
+    while length < size:
+        # Runs alternate between W and L, starting with the first result
+        count = max(int((size - length) * min(1 - stay_w, to_w)) + 16, 16)
+        w_runs = rng.geometric(1 - stay_w, count)
+        l_runs = rng.geometric(to_w, count)
+        pairs = np.stack((w_runs, l_runs) if first else (l_runs, w_runs), axis=1).ravel()
+        runs.append(pairs)
+        length += int(pairs.sum())
+
+    runs = np.concatenate(runs)
+    kinds = np.resize(np.array([first, 1 - first], dtype=np.uint8), len(runs))
+    return np.repeat(kinds, runs)[:size]
+
+
+def load_session(window, values):
+    """Puts values into the window's engine without scoring predictions"""
+    engine = AnalysisEngine()
+    engine.results.extend(values)
+    engine.pattern_index.rebuild(engine.results)
+    engine.analyze()
+    window.engine = engine
+    window.update_display()
+
+
+def timed(operation, repeat, budget, setup=None, teardown=None):
+    """Runs operation up to repeat times within about budget seconds, returns the times"""
+    times = []
+    while len(times) < repeat and (not times or sum(times) < budget):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return times
+
+
+def run_suite(args):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = ModernBaccaratAnalyzer()
+    window.show()
+    app.processEvents()
+
+    def settle():
+        # Wait for a background worker and run the deferred work of an update
+        while window.worker:
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+
+    rows = []
+    for size in args.sizes:
+        values = synthetic_results(size, args.bias, args.autocorrelation, args.seed)
+        load_session(window, values)
+        engine = window.engine
+        bulk_text = ' '.join('W' if v else 'L' for v in synthetic_results(BULK_SIZE, args.bias, args.autocorrelation,
+                                                                          args.seed + 1))
+
+        def add_bulk():
+            window.bulk_input.setText(bulk_text)
+            window.add_bulk_results()
+            settle()
+
+        operations = [
+            ("analyze_patterns", engine.analyze_patterns, None, None),
+            ("analyze_matrix", engine.analyze_matrix, None, None),
+            ("analyze_adaptive", engine.analyze_adaptive, None, None),
+        ]
+        for algorithm in ALGORITHMS:
+            def predict(algorithm=algorithm):
+                engine.active_algorithm = algorithm
+                engine.predict_next()
+            operations.append((f"predict_next[{algorithm}]", predict, None, None))
+        operations += [
+            ("add_result", lambda: (window.add_result('W'), settle()), None, window.delete_last_result),
+            ("update_display", lambda: (window.update_display(), settle()), None, None),
+            (f"add_bulk_results[{BULK_SIZE}]", add_bulk, None, lambda: load_session(window, values)),
+        ]
+
+        for name, operation, setup, teardown in operations:
+            engine.active_algorithm = "pattern"
+            times = timed(operation, args.repeat, args.budget, setup, teardown)
+            engine = window.engine  # add_bulk_results hands back a new engine
+            rows.append({
+                "size": size,
+                "operation": name,
+                "runs": len(times),
+                "min": min(times),
+                "median": statistics.median(times),
+                "mean": statistics.mean(times)
+            })
+            print(f"{size:>10}  {name:<28}{rows[-1]['median'] * 1e3:>11.3f} ms", file=sys.stderr)
+
+    window.close()
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, tolerance):
+    """Prints median time ratios against a previous report, returns the regressions"""
+    before = {(row["size"], row["operation"]): row["median"] for row in baseline["results"]}
+    regressions = 0
+    print(f"Compared with {baseline.get('revision') or 'baseline'} (ratio = new / old median)")
+    for row in report["results"]:
+        old = before.get((row["size"], row["operation"]))
+        if old is None:
+            continue
+        ratio = row["median"] / old if old else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 / (1 + tolerance):
+            flag = "  faster"
+        print(f"{row['size']:>10}  {row['operation']:<28}{old * 1e3:>11.3f} ms{row['median'] * 1e3:>11.3f} ms"
+              f"{ratio:>8.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=lambda text: int(float(text)), nargs="+",
+                        default=[1000, 10000, 100000, 1000000, 10000000], help="session sizes (default 1e3 to 1e7)")
+    parser.add_argument("--bias", type=float, default=0.5, help="win rate of the synthetic sessions (default 0.5)")
+    parser.add_argument("--autocorrelation", type=float, default=0.0,
+                        help="lag-1 autocorrelation of the synthetic sessions (default 0)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="maximum runs per operation (default 5)")
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="stop repeating an operation after this many seconds (default 2)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown reported as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "settings": {"bias": args.bias, "autocorrelation": args.autocorrelation, "seed": args.seed,
+                     "repeat": args.repeat, "budget": args.budget},
+        "results": run_suite(args)
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        return 1 if compare(report, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
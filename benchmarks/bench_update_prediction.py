@@ -0,0 +1,111 @@
+"""Latency benchmark for the prediction panel update
+
+    python benchmarks/bench_update_prediction.py --results 1000 --updates 2000
+
+Builds the full window offscreen, loads random results and times
+update_prediction after each new result, for the previous implementation,
+which scanned the window's labels for the algorithm label, against the
+window's direct label bindings. Both include the engine's predict_next.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from pattern import ModernBaccaratAnalyzer
+
+
+def legacy_update_prediction(window):
+    """The prediction panel update before direct label binding"""
+    if len(window.engine.results) < 3:
+        window.pattern_value_pred.setText("-")
+        window.success_value_pred.setText("-")
+        window.recommend_value_pred.setText("-")
+        window.recommend_value_pred.setStyleSheet("color: #c5cee0; font-size: 12pt; font-weight: bold;")
+        return
+
+    current_prediction = window.engine.predict_next()
+
+    algorithm_names = {
+        "pattern": "Pattern Analysis",
+        "matrix": "Matrix Analysis",
+        "adaptive": "Adaptive Analysis",
+        "combined": "Combined Analysis"
+    }
+
+    for widget in window.findChildren(QLabel):
+        if widget.text() == "Algorithm:":
+            parent = widget.parent()
+            if parent:
+                for w in parent.findChildren(QLabel):
+                    if w != widget and "Analysis" in w.text():
+                        w.setText(algorithm_names.get(window.engine.active_algorithm, "Pattern Analysis"))
+
+    if current_prediction:
+        window.pattern_value_pred.setText(current_prediction["pattern"])
+        window.success_value_pred.setText(
+            f"{current_prediction['prob']:.1f}% ({current_prediction['samples']} samples)")
+
+        window.recommend_value_pred.setText(current_prediction["target"])
+        if current_prediction["target"] == "W":
+            window.recommend_value_pred.setStyleSheet("color: #4CAF50; font-size: 12pt; font-weight: bold;")
+        else:
+            window.recommend_value_pred.setStyleSheet("color: #F44336; font-size: 12pt; font-weight: bold;")
+    else:
+        window.pattern_value_pred.setText("-")
+        window.success_value_pred.setText("-")
+        window.recommend_value_pred.setText("Insufficient data")
+        window.recommend_value_pred.setStyleSheet("color: #c5cee0; font-size: 12pt; font-weight: bold;")
+
+
+def time_updates(update, window, results, updates, seed):
+    """Adds random results and returns the per-update times in seconds"""
+    rnd = random.Random(seed)
+    window.engine.clear()
+    window.engine.add_results([rnd.choice("WL") for _ in range(results)])
+    times = []
+    for _ in range(updates):
+        window.engine.add_result(rnd.choice("WL"))
+        start = time.perf_counter()
+        update()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summary(times):
+    times = sorted(times)
+    return (f"mean {sum(times) / len(times) * 1e6:8.1f} us  "
+            f"p50 {times[len(times) // 2] * 1e6:8.1f} us  "
+            f"p95 {times[int(len(times) * 0.95)] * 1e6:8.1f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=1000, help="results loaded before timing (default 1000)")
+    parser.add_argument("--updates", type=int, default=2000, help="updates to time (default 2000)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    window = ModernBaccaratAnalyzer()
+    window.show()
+    app.processEvents()
+    print(f"{len(window.findChildren(QLabel))} labels in the window")
+
+    legacy = time_updates(lambda: legacy_update_prediction(window), window, args.results, args.updates, args.seed)
+    direct = time_updates(window.update_prediction, window, args.results, args.updates, args.seed)
+
+    print(f"legacy  {summary(legacy)}")
+    print(f"direct  {summary(direct)}")
+    print(f"speedup {sum(legacy) / sum(direct):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""Command-line batch mode for the WL Pattern Analyzer
+
+    python pattern.py analyze session1.txt session2.txt --algorithm combined --threshold 5 --max-pattern 7
+    python pattern.py sweep archive/*.txt --thresholds 1-30 --max-patterns 1-7 --jobs 8
+    python pattern.py serve --address 127.0.0.1:8765 --workers 4 --retention 5000
+    python pattern.py feed --address 127.0.0.1:8765 --tables 50 --rate 5000 --duration 10
+
+Each file goes through the engine's walk-forward pass: every result is
+predicted from the results before it, as if entered one by one, so the
+reported accuracy is an out-of-sample test of the chosen settings. sweep
+runs that test for every combination of settings on a process pool.
+serve runs the result feed server of server.py, and feed pushes random
+results to it to test it.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (AnalysisEngine, ALGORITHMS, MAX_PATTERN_LENGTH, MIN_RETENTION, DEFAULT_TREND_WINDOWS, format_count,
+                    new_prediction_stats, score_predictions, walk_forward)
+import server
+from sessions import SessionManager
+from storage import read_results
+
+
+def parse_range(text):
+    """Parses "1-20,25,30" into a sorted list of integers"""
+    values = set()
+    for part in text.split(','):
+        low, _, high = part.strip().partition('-')
+        try:
+            low = int(low)
+            high = int(high) if high else low
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid range: {text!r}")
+        values.update(range(low, high + 1))
+    if not values:
+        raise argparse.ArgumentTypeError(f"empty range: {text!r}")
+    return sorted(values)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pattern.py", description="WL Pattern Analyzer batch mode")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="analyze result files and walk-forward test predictions")
+    analyze.add_argument("files", nargs="+", help="result files with space separated W/L tokens")
+    analyze.add_argument("--algorithm", choices=ALGORITHMS, default="pattern")
+    analyze.add_argument("--threshold", type=int, default=5, help="minimum sample size (default 5)")
+    analyze.add_argument("--max-pattern", type=int, default=5, choices=range(1, MAX_PATTERN_LENGTH + 1),
+                         metavar=f"1-{MAX_PATTERN_LENGTH}", help="maximum pattern length (default 5)")
+    analyze.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_TREND_WINDOWS),
+                         help="trend window sizes for the adaptive analysis")
+    analyze.add_argument("--half-life", type=float, default=0,
+                         help="results after which a pattern outcome counts half (default 0, no decay)")
+    analyze.add_argument("--retention", type=int, default=0,
+                         help=f"most recent results kept, at least {MIN_RETENTION} (default 0, all)")
+    analyze.add_argument("--top", type=int, default=20, help="patterns to list per file, 0 for all (default 20)")
+    analyze.add_argument("--format", choices=["text", "json"], default="text",
+                         help="json prints one JSON object per file and line")
+
+    sweep = commands.add_parser("sweep", help="walk-forward test every combination of settings")
+    sweep.add_argument("files", nargs="+", help="result files with space separated W/L tokens")
+    sweep.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    sweep.add_argument("--thresholds", type=parse_range, default=parse_range("1-100"),
+                       help="minimum sample sizes, e.g. 1-20,25,30 (default 1-100)")
+    sweep.add_argument("--max-patterns", type=parse_range, default=parse_range("1-7"),
+                       help=f"maximum pattern lengths within 1-{MAX_PATTERN_LENGTH} (default 1-7)")
+    sweep.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_TREND_WINDOWS),
+                       help="trend window sizes for the adaptive analysis")
+    sweep.add_argument("--half-life", type=float, default=0,
+                       help="results after which a pattern outcome counts half (default 0, no decay)")
+    sweep.add_argument("--retention", type=int, default=0,
+                       help=f"most recent results kept, at least {MIN_RETENTION} (default 0, all)")
+    sweep.add_argument("--min-coverage", type=float, default=0,
+                       help="hide settings that predict fewer than this percent of results")
+    sweep.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes (default all cores)")
+    sweep.add_argument("--top", type=int, default=20, help="settings to list, 0 for all (default 20)")
+    sweep.add_argument("--format", choices=["text", "json"], default="text",
+                       help="json prints one JSON object per setting and line")
+    
+    serve = commands.add_parser("serve", help="serve result feeds and prediction queries as NDJSON")
+    serve.add_argument("--address", default=server.DEFAULT_ADDRESS,
+                       help=f"host:port or a Unix socket path (default {server.DEFAULT_ADDRESS})")
+    serve.add_argument("--workers", type=int, default=0, help="worker processes for the sessions (default 0, none)")
+    serve.add_argument("--algorithm", choices=ALGORITHMS, default="pattern")
+    serve.add_argument("--threshold", type=int, default=5, help="minimum sample size (default 5)")
+    serve.add_argument("--max-pattern", type=int, default=5, choices=range(1, MAX_PATTERN_LENGTH + 1),
+                       metavar=f"1-{MAX_PATTERN_LENGTH}", help="maximum pattern length (default 5)")
+    serve.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_TREND_WINDOWS),
+                       help="trend window sizes for the adaptive analysis")
+    serve.add_argument("--half-life", type=float, default=0,
+                       help="results after which a pattern outcome counts half (default 0, no decay)")
+    serve.add_argument("--retention", type=int, default=0,
+                       help=f"most recent results kept per session, at least {MIN_RETENTION} (default 0, all)")
+    
+    feed = commands.add_parser("feed", help="push random results to a server and report the latency")
+    feed.add_argument("--address", default=server.DEFAULT_ADDRESS,
+                      help=f"host:port or a Unix socket path (default {server.DEFAULT_ADDRESS})")
+    feed.add_argument("--tables", type=int, default=10, help="sessions to spread the results over (default 10)")
+    feed.add_argument("--rate", type=float, default=1000, help="results per second (default 1000)")
+    feed.add_argument("--duration", type=float, default=10, help="seconds to send for (default 10)")
+    feed.add_argument("--bias", type=float, default=0.5, help="win rate of the results (default 0.5)")
+    feed.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def analyze_file(path, args):
+    """Walk-forward tests one result file with a fresh engine, returns a report dict"""
+    results, _ = read_results(path)
+
+    engine = AnalysisEngine(significance_threshold=args.threshold, max_pattern_length=args.max_pattern,
+                            active_algorithm=args.algorithm, trend_windows=args.windows, half_life=args.half_life,
+                            retention=args.retention)
+    engine.add_results(results)
+
+    patterns = engine.ranked_patterns(args.top or None)
+
+    return {
+        "file": path,
+        "results": len(results),
+        "win_rate": results.count('W') / len(results) * 100 if results else 0,
+        "algorithm": args.algorithm,
+        "prediction_stats": engine.prediction_stats,
+        "accuracy": engine.accuracy(),
+        "next_prediction": engine.predict_next(),
+        "patterns": [
+            {
+                "pattern": pattern,
+                "total": stats["total"],
+                "win_prob": stats["win_prob"],
+                "loss_prob": stats["loss_prob"],
+                "best": "W" if stats["win_prob"] > stats["loss_prob"] else "L"
+            }
+            for pattern, stats in patterns
+        ]
+    }
+
+
+def format_report(report):
+    stats = report["prediction_stats"]
+    lines = [
+        f"== {report['file']} ==",
+        f"Results: {report['results']}  Win rate: {report['win_rate']:.1f}%",
+        f"Predictions: {stats['total_predictions']}  Correct: {stats['correct']}  "
+        f"Accuracy: {report['accuracy']:.1f}%  Max win streak: {stats['max_win_streak']}  "
+        f"Max loss streak: {stats['max_loss_streak']}",
+    ]
+
+    prediction = report["next_prediction"]
+    if prediction:
+        lines.append(f"Next: {prediction['target']} ({prediction['prob']:.1f}%, {prediction['type']} "
+                     f"{prediction['pattern']}, {format_count(prediction['samples'])} samples)")
+    else:
+        lines.append("Next: insufficient data")
+
+    if report["patterns"]:
+        width = max(10, max(len(row["pattern"]) for row in report["patterns"]) + 2)
+        lines.append(f"{'Pattern':<{width}}{'Total':>8}{'W %':>8}{'L %':>8}  Best")
+        for row in report["patterns"]:
+            lines.append(f"{row['pattern']:<{width}}{format_count(row['total']):>8}{row['win_prob']:>7.1f}%{row['loss_prob']:>7.1f}%  "
+                         f"{row['best']} ({max(row['win_prob'], row['loss_prob']):.1f}%)")
+
+    return "\n".join(lines)
+
+
+def run_analyze(args):
+    failed = 0
+    predictions = 0
+    correct = 0
+
+    for path in args.files:
+        try:
+            report = analyze_file(path, args)
+        except OSError as e:
+            print(f"Error reading {path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+
+        predictions += report["prediction_stats"]["total_predictions"]
+        correct += report["prediction_stats"]["correct"]
+
+        if args.format == "json":
+            print(json.dumps(report))
+        else:
+            print(format_report(report))
+            print()
+        sys.stdout.flush()
+
+    if args.format == "text" and len(args.files) > 1:
+        accuracy = correct / predictions * 100 if predictions else 0
+        print(f"Total: {len(args.files) - failed} files, {predictions} predictions, accuracy {accuracy:.1f}%")
+
+    return 1 if failed else 0
+
+
+@functools.lru_cache(maxsize=4)
+def load_values(path):
+    # Worker processes keep the last few files, tasks come grouped by file
+    results, _ = read_results(path)
+    return results.array
+
+
+def sweep_task(path, threshold, max_pattern, windows, algorithms, half_life=0, retention=0):
+    """Walk-forward tests all algorithms on one file with one setting, in a worker"""
+    values = load_values(path)
+    stats = {algorithm: new_prediction_stats() for algorithm in algorithms}
+    for chunk, _ in walk_forward(values, 0, max_pattern, threshold, windows, algorithms, half_life=half_life,
+                                 retention=retention):
+        for algorithm in algorithms:
+            score_predictions(stats[algorithm], chunk[algorithm], values)
+    return max(len(values) - 3, 0), stats
+
+
+def format_sweep(rows, files):
+    lines = [f"{len(rows)} settings over {files} file{'s' if files != 1 else ''}",
+             f"{'Rank':>4}  {'Algorithm':<10}{'Threshold':>11}{'Pattern':>9}{'Predictions':>13}"
+             f"{'Accuracy':>10}{'Coverage':>10}{'Max loss':>10}"]
+    for rank, row in enumerate(rows, 1):
+        lines.append(f"{rank:>4}  {row['algorithm']:<10}{row['threshold']:>11}{row['max_pattern']:>9}"
+                     f"{row['predictions']:>13}{row['accuracy']:>9.1f}%{row['coverage']:>9.1f}%"
+                     f"{row['max_loss_streak']:>10}")
+    return "\n".join(lines)
+
+
+def run_sweep(args):
+    tasks = [(path, threshold, max_pattern)
+             for path in args.files for max_pattern in args.max_patterns for threshold in args.thresholds]
+    
+    # Scores per setting, summed over the files: [results scored, predictions, correct, max loss streak]
+    totals = {}
+    failed = set()
+    with ProcessPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        futures = [pool.submit(sweep_task, path, threshold, max_pattern, args.windows, tuple(args.algorithms),
+                               args.half_life, args.retention)
+                   for path, threshold, max_pattern in tasks]
+        for (path, threshold, max_pattern), future in zip(tasks, futures):
+            try:
+                scored, stats = future.result()
+            except OSError as e:
+                if path not in failed:
+                    print(f"Error reading {path}: {e}", file=sys.stderr)
+                    failed.add(path)
+                continue
+            
+            for algorithm, algorithm_stats in stats.items():
+                total = totals.setdefault((algorithm, threshold, max_pattern), [0, 0, 0, 0])
+                total[0] += scored
+                total[1] += algorithm_stats['total_predictions']
+                total[2] += algorithm_stats['correct']
+                total[3] = max(total[3], algorithm_stats['max_loss_streak'])
+    
+    rows = []
+    for (algorithm, threshold, max_pattern), (scored, predictions, correct, max_loss_streak) in totals.items():
+        coverage = predictions / scored * 100 if scored else 0
+        if coverage < args.min_coverage:
+            continue
+        rows.append({
+            "algorithm": algorithm,
+            "threshold": threshold,
+            "max_pattern": max_pattern,
+            "predictions": predictions,
+            "accuracy": correct / predictions * 100 if predictions else 0,
+            "coverage": coverage,
+            "max_loss_streak": max_loss_streak
+        })
+    
+    # Best accuracy first, then the settings that predict more often
+    rows.sort(key=lambda row: (row["accuracy"], row["coverage"], -row["max_loss_streak"]), reverse=True)
+    if args.top:
+        rows = rows[:args.top]
+    
+    if args.format == "json":
+        for row in rows:
+            print(json.dumps(row))
+    else:
+        print(format_sweep(rows, len(args.files) - len(failed)))
+    
+    return 1 if failed else 0
+
+
+def run_serve(args):
+    settings = {"significance_threshold": args.threshold, "max_pattern_length": args.max_pattern,
+                "active_algorithm": args.algorithm, "trend_windows": args.windows, "half_life": args.half_life,
+                "retention": args.retention}
+    with SessionManager(workers=args.workers, **settings) as manager:
+        try:
+            asyncio.run(server.serve(args.address, manager,
+                                     ready=lambda _: print(f"Serving on {args.address}", file=sys.stderr)))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def run_feed(args):
+    try:
+        report = asyncio.run(server.fake_feed(args.address, args.tables, args.rate, args.duration, args.bias,
+                                              args.seed))
+    except OSError as e:
+        print(f"Error connecting to {args.address}: {e}", file=sys.stderr)
+        return 1
+    latency = report["latency_ms"]
+    print(f"{report['events']} results in {report['seconds']:.1f} s ({report['events'] / report['seconds']:.0f}/s), "
+          f"latency p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, max {latency['max']:.2f} ms")
+    return 0
+
+
+COMMANDS = {"analyze": run_analyze, "sweep": run_sweep, "serve": run_serve, "feed": run_feed}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "feed":
+        if args.tables < 1 or args.rate <= 0:
+            parser.error("feed needs at least one table and a positive rate")
+        return COMMANDS[args.command](args)
+    if min(args.windows) < 2:
+        parser.error("trend windows must be at least 2")
+    if args.half_life < 0:
+        parser.error("the half-life cannot be negative")
+    if args.retention and args.retention < MIN_RETENTION:
+        parser.error(f"the retention must be at least {MIN_RETENTION} results, or 0 to keep all")
+    if args.command == "sweep" and not set(args.max_patterns) <= set(range(1, MAX_PATTERN_LENGTH + 1)):
+        parser.error(f"pattern lengths must be within 1-{MAX_PATTERN_LENGTH}")
+    return COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,428 @@
+"""Sessions recorded result by result in a SQLite database
+
+    store = SessionStore("sessions.wldb")
+    store.save("table-1", engine)  # the session so far, then keep recording it
+    engine.add_result('W')
+    store.sync(engine)  # queues what the engine gained or lost since the last sync
+    store.close()
+
+    engine = SessionStore("sessions.wldb").load("table-1")
+
+A save file is rewritten whole; a store only appends. sync() takes the new
+results, the prediction outcomes scored on them and the loss streak records
+since the last call, and once FLUSH_RESULTS of them are queued or the
+oldest has waited FLUSH_SECONDS, flush() writes them as new rows in one
+transaction. Earlier rows are never rewritten, except for the last one when
+results are deleted, and close() merges the small rows of the session into
+rows of CHUNK_RESULTS. The database runs in WAL mode, so a crash loses at
+most the batch not written yet.
+
+Results and outcomes are stored packed 8 per byte. load() reads them into
+NumPy arrays row by row, and with a bounded history only the rows that the
+retention keeps, then recounts the statistics in one vectorized pass.
+"""
+import json
+import sqlite3
+import time
+
+import numpy as np
+
+from diagnostics import timings
+from engine import AnalysisEngine, PredictionTrace, ResultHistory
+
+STORE_EXTENSION = ".wldb"
+STORE_VERSION = 1
+FLUSH_RESULTS = 4096  # queued results and outcomes written at once
+FLUSH_SECONDS = 1.0  # longest a queued result waits for the next sync to write it
+CHUNK_RESULTS = 1 << 16  # results per row once merged
+CHUNK_RECORDS = 1 << 12  # loss streak records per row once merged
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    start INTEGER NOT NULL,  -- position of the oldest result the session keeps
+    results INTEGER NOT NULL,  -- results added since the session began
+    settings TEXT NOT NULL,
+    prediction_stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+CREATE TABLE IF NOT EXISTS chunks (
+    session INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,  -- of the first result since the session began
+    count INTEGER NOT NULL,
+    predictions INTEGER NOT NULL,  -- outcomes scored on these results
+    written REAL NOT NULL,
+    results BLOB NOT NULL,
+    targets BLOB NOT NULL,
+    actuals BLOB NOT NULL,
+    PRIMARY KEY (session, position)
+);
+CREATE TABLE IF NOT EXISTS loss_streaks (
+    session INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    number INTEGER NOT NULL,  -- of the first record since the session began
+    count INTEGER NOT NULL,
+    records TEXT NOT NULL,
+    PRIMARY KEY (session, number)
+);
+"""
+
+
+def _settings(engine):
+    return {
+        "significance_threshold": engine.significance_threshold,
+        "max_pattern_length": engine.max_pattern_length,
+        "active_algorithm": engine.active_algorithm,
+        "trend_windows": engine.trend_windows,
+        "half_life": engine.half_life,
+        "retention": engine.retention
+    }
+
+
+def _unpack(blob, count):
+    return np.unpackbits(np.frombuffer(blob, dtype=np.uint8), count=count)
+
+
+def _concatenate(arrays):
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.uint8)
+
+
+def _loss_streak_count(targets, actuals, streak):
+    # Loss streak records scoring these outcomes adds, continuing a loss
+    # streak of streak, as score_predictions counts them
+    missed = targets != actuals
+    steps = np.arange(len(missed))
+    last_hit = np.maximum.accumulate(np.where(missed, -1, steps))
+    streaks = np.where(last_hit < 0, steps + 1 + streak, steps - last_hit)
+    return int(np.count_nonzero(missed & (streaks >= 3)))
+
+
+class SessionStore:
+    """Named sessions in a SQLite database, recording one of them as it changes
+
+    The connection may move between threads, such as to the window's
+    worker for a load, but is used by one thread at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # commits reach the disk at checkpoints
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > STORE_VERSION:
+            self.connection.close()
+            raise ValueError(f"Unsupported session store version {version}")
+        self.connection.executescript(_SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={STORE_VERSION}")
+
+        self.name = None
+        self._follow(None, 0, 0, {})
+
+    def _follow(self, session, end, records, prediction_stats):
+        # Records session from here on, everything before position end and
+        # the first records loss streak records being stored
+        self.session = session  # id of the recorded session
+        self.start = self.end = end
+        self.records = records
+        self.predictions = prediction_stats.get("total_predictions", 0)
+        self.loss_streak = prediction_stats.get("current_loss_streak", 0)
+        self.prediction_stats = prediction_stats
+        self.settings = None
+        self.changed = False
+        self.replaced_from = None  # first stored row read back into the queue, replaced when it is written
+        self._clear_queue(end)
+
+    def _clear_queue(self, position):
+        self.queue_position = position
+        self.queue_results = []
+        self.queue_targets = []
+        self.queue_actuals = []
+        self.queue_records = []
+        self.queued_results = 0
+        self.queued_pairs = 0
+        self.queued_since = None
+
+    def sessions(self):
+        """Every session as a dict, the most recently updated first"""
+        rows = self.connection.execute(
+            "SELECT id, name, created, updated, results FROM sessions ORDER BY updated DESC").fetchall()
+        return [{"id": row[0], "name": row[1], "created": row[2], "updated": row[3], "results": row[4]}
+                for row in rows]
+
+    def save(self, name, engine):
+        """Stores the engine's session as name, replacing a session of that name, and records it"""
+        now = time.time()
+        with self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE name = ?", (name,))
+            session = self.connection.execute(
+                "INSERT INTO sessions (name, created, updated, start, results, settings, prediction_stats) "
+                "VALUES (?, ?, ?, 0, 0, ?, ?)",
+                (name, now, now, json.dumps(_settings(engine)), json.dumps(engine.prediction_stats))).lastrowid
+
+        self.name = name
+        self._follow(session, engine.results.start, 0, {})
+        trace = engine.prediction_history
+        self._queue(engine.results.array, trace.targets.array, trace.actuals.array,
+                    engine.loss_streak_predictions)
+        self._take_state(engine)
+        self.flush()
+
+    def load(self, name, engine=None, progress=None):
+        """Loads session name into engine (or a new one with its settings), records it and returns the engine
+
+        Only the rows holding the results the session kept when it was
+        last written are read, and no more than the engine's retention.
+        progress, if given, is called as progress(results_read,
+        results_to_read) after every row.
+        """
+        row = self.connection.execute(
+            "SELECT id, start, results, settings, prediction_stats FROM sessions WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise ValueError(f"No session {name!r} in the store")
+        session, start, end, settings, prediction_stats = row[0], row[1], row[2], json.loads(row[3]), json.loads(row[4])
+        if engine is None:
+            engine = AnalysisEngine(**settings)
+        if engine.retention:
+            start = max(start, end - engine.retention)
+
+        # Newest rows first, back to the row holding start or a gap in the history
+        rows = []
+        results = predictions = 0
+        for row in self.connection.execute(
+                "SELECT position, count, predictions, results, targets, actuals FROM chunks "
+                "WHERE session = ? ORDER BY position DESC", (session,)):
+            if rows and row[0] + row[1] != rows[-1][0]:
+                break
+            rows.append(row)
+            results += row[1]
+            predictions += row[2]
+            if progress:
+                progress(results, end - start)
+            if row[0] <= start:
+                break
+        rows.reverse()
+
+        history = ResultHistory(capacity=results)
+        targets = ResultHistory(capacity=predictions)
+        actuals = ResultHistory(capacity=predictions)
+        for position, count, pairs, result_bits, target_bits, actual_bits in rows:
+            history.extend(_unpack(result_bits, count))
+            targets.extend(_unpack(target_bits, pairs))
+            actuals.extend(_unpack(actual_bits, pairs))
+        history.start = rows[0][0] if rows else end
+        history.drop(max(start - history.start, 0))
+
+        # The latest loss streak records, as many as the retention keeps
+        records = []
+        stored_records = None
+        for number, count, chunk_records in self.connection.execute(
+                "SELECT number, count, records FROM loss_streaks WHERE session = ? ORDER BY number DESC", (session,)):
+            if stored_records is None:
+                stored_records = number + count
+            records[:0] = json.loads(chunk_records)
+            if engine.retention and len(records) >= engine.retention:
+                break
+
+        # Each pair was scored on a result and a delete takes one off with its
+        # result, so the session held no more pairs than the results it kept
+        trace = PredictionTrace(targets, actuals)
+        if len(trace) > len(history):
+            trace.drop(len(trace) - len(history))
+
+        engine.clear()
+        engine.results = history
+        engine.prediction_history = trace
+        engine.prediction_stats = prediction_stats
+        engine.loss_streak_predictions = records
+        engine.pattern_index.rebuild(history, engine.max_pattern_length, engine.half_life)
+        engine.trend_index.rebuild(history, engine.trend_windows)
+        engine.trim()
+        engine.analyze()
+
+        self.name = name
+        self._follow(session, end, stored_records or 0, dict(prediction_stats))
+        return engine
+
+    def sync(self, engine):
+        """Queues the results and outcomes the recorded session gained since the last sync
+
+        Results the engine deleted are taken off the store, and the queue is
+        written once it is due. Results evicted from a bounded history before
+        a sync are not stored, leaving a gap.
+        """
+        if self.session is None:
+            return
+        with timings.stage("store.sync"):
+            results = engine.results
+            end = results.start + len(results)
+            predictions = engine.prediction_stats["total_predictions"]
+            if end < self.end or predictions < self.predictions:
+                self._truncate(min(end, self.end), max(self.predictions - predictions, 0))
+
+            new_results = results.array[:0]
+            if end > self.end:
+                first = max(self.end, results.start)
+                if first > self.queue_position + self.queued_results:
+                    self.flush()
+                    self.queue_position = first
+                new_results = results.array[first - results.start:]
+
+            trace = engine.prediction_history
+            pairs = min(max(predictions - self.predictions, 0), len(trace))
+            targets = trace.targets.array[len(trace) - pairs:]
+            actuals = trace.actuals.array[len(trace) - pairs:]
+            records = _loss_streak_count(targets, actuals, self.loss_streak)
+            self._queue(new_results, targets, actuals,
+                        engine.loss_streak_predictions[len(engine.loss_streak_predictions) - records:])
+            self._take_state(engine)
+
+        if self.queued_results + self.queued_pairs >= FLUSH_RESULTS or (self.queued_since is not None
+                                           and time.monotonic() - self.queued_since >= FLUSH_SECONDS):
+            self.flush()
+
+    def _take_state(self, engine):
+        self.start = engine.results.start
+        self.end = self.start + len(engine.results)
+        self.predictions = engine.prediction_stats["total_predictions"]
+        self.loss_streak = engine.prediction_stats["current_loss_streak"]
+        self.prediction_stats = dict(engine.prediction_stats)
+        self.settings = _settings(engine)
+        self.changed = True
+        if self.queued_since is None:
+            self.queued_since = time.monotonic()
+
+    def _queue(self, results, targets, actuals, records):
+        if len(results):
+            self.queue_results.append(np.array(results, dtype=np.uint8))
+            self.queued_results += len(results)
+        if len(targets):
+            self.queue_targets.append(np.array(targets, dtype=np.uint8))
+            self.queue_actuals.append(np.array(actuals, dtype=np.uint8))
+            self.queued_pairs += len(targets)
+        self.queue_records.extend(records)
+
+    def _truncate(self, end, pairs):
+        # Cuts the results from position end on and the last pairs outcomes,
+        # reading stored rows back into the queue as far as the cut reaches,
+        # and one row further when no result would be left for the
+        # remaining outcomes to be written with
+        while (self.queue_position > end or self.queued_pairs < pairs
+               or (self.queue_position == end and self.queued_pairs > pairs)):
+            row = self.connection.execute(
+                "SELECT position, count, predictions, results, targets, actuals FROM chunks "
+                "WHERE session = ? AND position < ? ORDER BY position DESC LIMIT 1",
+                (self.session, self.queue_position)).fetchone()
+            if row is None or row[0] + row[1] != self.queue_position:
+                break
+            position, count, row_pairs, result_bits, target_bits, actual_bits = row
+            self.queue_results.insert(0, _unpack(result_bits, count))
+            self.queue_targets.insert(0, _unpack(target_bits, row_pairs))
+            self.queue_actuals.insert(0, _unpack(actual_bits, row_pairs))
+            self.queue_position = self.replaced_from = position
+            self.queued_results += count
+            self.queued_pairs += row_pairs
+
+        keep = self.queued_pairs - min(pairs, self.queued_pairs)
+        self.queue_results = [_concatenate(self.queue_results)[:max(end - self.queue_position, 0)]]
+        self.queue_targets = [_concatenate(self.queue_targets)[:keep]]
+        self.queue_actuals = [_concatenate(self.queue_actuals)[:keep]]
+        self.queued_results = len(self.queue_results[0])
+        self.queued_pairs = keep
+
+    def flush(self):
+        """Writes the queued results, outcomes and statistics in one transaction"""
+        if self.session is None or not self.changed:
+            return
+        with timings.stage("store.flush"), self.connection:
+            if self.replaced_from is not None:
+                self.connection.execute("DELETE FROM chunks WHERE session = ? AND position >= ?",
+                                        (self.session, self.replaced_from))
+            self._insert_results(self.queue_position, self.queue_results, self.queue_targets, self.queue_actuals,
+                                 time.time())
+            self._insert_records(self.records, self.queue_records)
+            self.connection.execute(
+                "UPDATE sessions SET updated = ?, start = ?, results = ?, settings = ?, prediction_stats = ? "
+                "WHERE id = ?", (time.time(), self.start, self.end, json.dumps(self.settings),
+                                 json.dumps(self.prediction_stats), self.session))
+        self.records += len(self.queue_records)
+        self.changed = False
+        self.replaced_from = None
+        self._clear_queue(self.end)
+
+    def _insert_results(self, position, results, targets, actuals, written):
+        # Writes results from position on as rows of up to CHUNK_RESULTS,
+        # each with the outcomes scored on its results
+        results = _concatenate(results)
+        targets = _concatenate(targets)
+        actuals = _concatenate(actuals)
+        if not len(results):
+            return  # a row is found by its results, outcomes left without any are dropped
+
+        # Outcomes are scored on the last results, so line them up from the end
+        offset = len(results) - len(targets)
+        starts = list(range(0, len(results), CHUNK_RESULTS))
+        rows = []
+        for i, start in enumerate(starts):
+            last_row = i + 1 == len(starts)
+            stop = len(results) if last_row else starts[i + 1]
+            first = 0 if i == 0 else max(start - offset, 0)
+            last = len(targets) if last_row else max(stop - offset, 0)
+            rows.append((self.session, position + start, stop - start, last - first, written,
+                         np.packbits(results[start:stop]).tobytes(), np.packbits(targets[first:last]).tobytes(),
+                         np.packbits(actuals[first:last]).tobytes()))
+        self.connection.executemany(
+            "INSERT INTO chunks (session, position, count, predictions, written, results, targets, actuals) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _insert_records(self, number, records):
+        self.connection.executemany(
+            "INSERT INTO loss_streaks (session, number, count, records) VALUES (?, ?, ?, ?)",
+            [(self.session, number + start, len(records[start:start + CHUNK_RECORDS]),
+              json.dumps(records[start:start + CHUNK_RECORDS])) for start in range(0, len(records), CHUNK_RECORDS)])
+
+    def compact(self):
+        """Merges the recorded session's rows that are not full yet into full ones"""
+        if self.session is None:
+            return
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT position, count, predictions, results, targets, actuals, written FROM chunks "
+            "WHERE session = ? AND position >= (SELECT MIN(position) FROM chunks WHERE session = ? AND count < ?) "
+            "ORDER BY position", (self.session, self.session, CHUNK_RESULTS)).fetchall()
+        record_rows = self.connection.execute(
+            "SELECT number, records FROM loss_streaks "
+            "WHERE session = ? AND number >= (SELECT MIN(number) FROM loss_streaks WHERE session = ? AND count < ?) "
+            "ORDER BY number", (self.session, self.session, CHUNK_RECORDS)).fetchall()
+        if len(rows) < 2 and len(record_rows) < 2:
+            return
+
+        # Merge each run of rows without a gap between them
+        runs = []
+        for row in rows:
+            if runs and row[0] == runs[-1][-1][0] + runs[-1][-1][1]:
+                runs[-1].append(row)
+            else:
+                runs.append([row])
+
+        with timings.stage("store.compact"), self.connection:
+            if len(rows) > 1:
+                self.connection.execute("DELETE FROM chunks WHERE session = ? AND position >= ?",
+                                        (self.session, rows[0][0]))
+                for run in runs:
+                    self._insert_results(run[0][0], [_unpack(row[3], row[1]) for row in run],
+                                         [_unpack(row[4], row[2]) for row in run],
+                                         [_unpack(row[5], row[2]) for row in run], run[-1][6])
+            if len(record_rows) > 1:
+                self.connection.execute("DELETE FROM loss_streaks WHERE session = ? AND number >= ?",
+                                        (self.session, record_rows[0][0]))
+                self._insert_records(record_rows[0][0], [record for row in record_rows
+                                                         for record in json.loads(row[1])])
+
+    def close(self):
+        """Writes what is queued, merges the recorded session's small rows and closes the database"""
+        self.compact()
+        self.connection.close()
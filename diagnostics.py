@@ -0,0 +1,144 @@
+"""Stage timings and profiling for diagnosing slow sessions
+
+The engine and the window time their stages into the shared timings
+object:
+
+    with timings.stage("engine.score"):
+        ...
+
+Operations are the top-level actions a user triggers, such as a click or a
+file load. Each one is timed as a stage too, and can be captured with
+cProfile for the next few operations with timings.profile(count, path).
+"""
+import collections
+import contextlib
+import cProfile
+import json
+import math
+import platform
+import threading
+import time
+
+WINDOW = 500  # latest timings kept per stage
+
+
+class Diagnostics:
+    """Rolling timings per stage and an optional cProfile capture"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.samples = {}  # stage name -> deque of seconds
+        self.updates = 0  # timings recorded so far, to tell when views are stale
+        self.lock = threading.Lock()  # stages are recorded from the worker thread too
+
+        self.profiler = None
+        self.profile_remaining = 0
+        self.profile_path = None
+        self.profile_lock = threading.Lock()  # one thread profiles at a time
+        self.saved_profile = None  # path of the last finished capture, until taken
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times the body of the with statement as stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def operation(self, name):
+        """Times a top-level operation, profiling it while a capture is running"""
+        # Nested operations and other threads run unprofiled while one is captured
+        profiling = self.profile_remaining > 0 and self.profile_lock.acquire(blocking=False)
+        if profiling and not self.profile_remaining:
+            self.profile_lock.release()
+            profiling = False
+        if profiling:
+            self.profiler.enable()
+        try:
+            with self.stage(name):
+                yield
+        finally:
+            if profiling:
+                self.profiler.disable()
+                self.profile_remaining -= 1
+                if not self.profile_remaining:
+                    self.profiler.dump_stats(self.profile_path)
+                    self.saved_profile = self.profile_path
+                    self.profiler = None
+                self.profile_lock.release()
+
+    def record(self, name, seconds):
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+            self.updates += 1
+
+    def stats(self, name):
+        """Returns count, last, p50, p95 and max in milliseconds for a stage, or None"""
+        with self.lock:
+            samples = list(self.samples.get(name, ()))
+        if not samples:
+            return None
+
+        ordered = sorted(samples)
+
+        def percentile(q):
+            # Nearest rank
+            return ordered[max(math.ceil(q * len(ordered)) - 1, 0)] * 1e3
+
+        return {
+            "count": len(samples),
+            "last": samples[-1] * 1e3,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": ordered[-1] * 1e3
+        }
+
+    def summary(self):
+        """Returns stats for every stage, by stage name"""
+        with self.lock:
+            names = sorted(self.samples)
+        return {name: self.stats(name) for name in names}
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.updates += 1
+
+    def profile(self, operations, path):
+        """Captures a cProfile of the next operations, written to path as pstats data"""
+        if operations < 1:
+            raise ValueError("operations must be at least 1")
+        open(path, 'wb').close()  # fail now rather than when the capture ends
+        with self.profile_lock:
+            self.profiler = cProfile.Profile()
+            self.profile_path = path
+            self.profile_remaining = operations
+            self.saved_profile = None
+
+    def take_saved_profile(self):
+        """Returns the path of a finished capture once, None if there is none"""
+        path, self.saved_profile = self.saved_profile, None
+        return path
+
+    def export(self, path, **context):
+        """Writes the stage stats and the raw timings as JSON, with context such as the session size"""
+        with self.lock:
+            samples = {name: [seconds * 1e3 for seconds in values] for name, values in self.samples.items()}
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "context": context,
+            "stages": self.summary(),
+            "samples_ms": samples
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+
+
+timings = Diagnostics()
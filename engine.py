@@ -0,0 +1,1724 @@
+"""Qt-free analysis engine behind the WL Pattern Analyzer window"""
+import copy
+from collections.abc import Mapping
+
+import numpy as np
+
+from diagnostics import timings
+from search import SuffixIndex
+
+MAX_PATTERN_LENGTH = 24
+DEFAULT_TREND_WINDOWS = (10, 20, 50)
+ALGORITHMS = ("pattern", "matrix", "adaptive", "combined")
+DENSE_CONTEXTS = 1 << 20  # walk_forward counts longer patterns sparsely
+DECAY_DECIMALS = 9  # decayed weights are rounded so sums made in a different order compare equal
+PROB_TOLERANCE = 1e-6  # decayed probabilities of bulk and per-click scoring agree to within this
+MIN_RETENTION = 100  # fewest results a bounded history keeps
+EVICT_LIMIT = 256  # results evicted one by one, more are dropped at once and the statistics recounted
+
+# Trend types by class code, as used by count_trends
+TREND_TYPES = ("Dusus", "Denge", "Yukselis")  # Falling, Balanced, Rising
+
+# Results are stored as one byte each: W=1, L=0
+RESULT_CODES = {'W': 1, 'L': 0}
+RESULT_CHARS = 'LW'
+_TO_CHARS = bytes.maketrans(b'\x00\x01', b'LW')
+
+# Byte classes for parsing result text: 0 whitespace, 1 L, 2 W, 3 anything else
+BYTE_CLASSES = np.full(256, 3, dtype=np.uint8)
+BYTE_CLASSES[list(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')] = 0
+BYTE_CLASSES[list(b'Ll')] = 1
+BYTE_CLASSES[list(b'Ww')] = 2
+
+
+def parse_results(data):
+    """Parses whitespace separated W/L tokens from bytes in one vectorized pass
+
+    Returns (values, skipped) where values is a uint8 array (W=1, L=0) and
+    skipped the number of tokens that were not a single W or L. data must not
+    start or end in the middle of a token.
+    """
+    classes = BYTE_CLASSES[np.frombuffer(data, dtype=np.uint8)]
+    token = classes != 0
+    
+    # A token starts after whitespace and ends before whitespace
+    starts = token.copy()
+    starts[1:] &= ~token[:-1]
+    ends = token.copy()
+    ends[:-1] &= ~token[1:]
+    
+    valid = starts & ends & (classes < 3)
+    values = classes[valid] - 1
+    return values, int(np.count_nonzero(starts)) - len(values)
+
+
+class ResultHistory:
+    """Compact W/L history backed by a growable NumPy byte array
+
+    drop() removes the oldest results for a bounded history: the buffer
+    becomes a sliding window that is moved back to its front only when it
+    runs out of room, so dropping and appending stay O(1) amortized and the
+    results stay one contiguous array. start counts the results dropped so
+    far, making start + i the position of result i since the history began.
+    """
+    def __init__(self, results=(), capacity=1024):
+        self._buffer = np.zeros(max(capacity, 16), dtype=np.uint8)
+        self._offset = 0  # buffer index of the oldest result
+        self._size = 0
+        self._readonly = False
+        self.start = 0
+        self.extend(results)
+
+    @classmethod
+    def _view(cls, values):
+        # Zero-copy read-only window onto another history's buffer
+        view = cls.__new__(cls)
+        view._buffer = values
+        view._offset = 0
+        view._size = len(values)
+        view._readonly = True
+        view.start = 0
+        return view
+
+    @classmethod
+    def from_text(cls, text):
+        """Parses space separated W/L tokens, ignoring anything else"""
+        values, _ = parse_results(text.encode())
+        return cls(values)
+
+    @classmethod
+    def from_packed(cls, packed, size, start=0):
+        """Restores a history saved with packbits"""
+        history = cls.__new__(cls)
+        history._buffer = np.unpackbits(np.asarray(packed, dtype=np.uint8), count=size)
+        history._offset = 0
+        history._size = size
+        history._readonly = False
+        history.start = start
+        return history
+
+    @property
+    def array(self):
+        """The results as a uint8 array view (W=1, L=0), no copy"""
+        return self._buffer[self._offset:self._offset + self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for value in self.array.tolist():
+            yield RESULT_CHARS[value]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ResultHistory._view(self.array[key])
+        return RESULT_CHARS[self.array[key]]
+
+    def _reserve(self, size):
+        if self._readonly:
+            raise ValueError("History views are read-only")
+        if self._offset + size > len(self._buffer):
+            # Move the results to the front, into a new buffer if they need
+            # more room or use little of it after a large drop
+            buffer = self._buffer
+            if size > len(buffer) // 2:
+                buffer = np.zeros(max(size, 2 * len(buffer)), dtype=np.uint8)
+            elif 8 * size < len(buffer):
+                buffer = np.zeros(max(2 * size, 16), dtype=np.uint8)
+            buffer[:self._size] = self.array
+            self._buffer = buffer
+            self._offset = 0
+
+    def append(self, result):
+        self._reserve(self._size + 1)
+        self._buffer[self._offset + self._size] = RESULT_CODES[result]
+        self._size += 1
+
+    def extend(self, results):
+        """Appends W/L strings, another history or an array of 0/1 values"""
+        if isinstance(results, ResultHistory):
+            results = results.array
+        elif not isinstance(results, np.ndarray):
+            results = np.array([RESULT_CODES[r] for r in results], dtype=np.uint8)
+        self._reserve(self._size + len(results))
+        end = self._offset + self._size
+        self._buffer[end:end + len(results)] = results
+        self._size += len(results)
+
+    def pop(self):
+        if self._readonly:
+            raise ValueError("History views are read-only")
+        if not self._size:
+            raise IndexError("pop from empty history")
+        self._size -= 1
+        return RESULT_CHARS[self._buffer[self._offset + self._size]]
+
+    def drop(self, count):
+        """Removes the oldest count results"""
+        if self._readonly:
+            raise ValueError("History views are read-only")
+        count = min(count, self._size)
+        self._offset += count
+        self._size -= count
+        self.start += count
+
+    def clear(self):
+        if self._readonly:
+            raise ValueError("History views are read-only")
+        self._offset = 0
+        self._size = 0
+        self.start = 0
+
+    def count(self, result):
+        wins = int(np.count_nonzero(self.array))
+        return wins if result == 'W' else self._size - wins
+
+    def code(self, length):
+        """Integer code of the last `length` results (W=1, oldest first)"""
+        code = 0
+        for value in self.array[max(self._size - length, 0):].tolist():
+            code = (code << 1) | value
+        return code
+
+    def pattern(self, length):
+        """The last `length` results as a W/L string"""
+        return self.array[max(self._size - length, 0):].tobytes().translate(_TO_CHARS).decode()
+
+    def packbits(self):
+        """The results packed 8 per byte"""
+        return np.packbits(self.array)
+
+    def iter_text(self, chunk_size=1 << 20):
+        """Yields the results as space separated text, chunk by chunk"""
+        for start in range(0, self._size, chunk_size):
+            chunk = self.array[start:start + chunk_size]
+            text = np.full(2 * len(chunk), ord(' '), dtype=np.uint8)
+            text[0::2] = chunk
+            text = text.tobytes().translate(_TO_CHARS)
+            yield (' ' if start else '') + text[:-1].decode()
+
+
+class PredictionTrace:
+    """Sequence of (predicted, actual) result pairs stored as two histories"""
+    def __init__(self, targets=None, actuals=None):
+        self.targets = targets if targets is not None else ResultHistory()
+        self.actuals = actuals if actuals is not None else ResultHistory()
+    
+    def __len__(self):
+        return len(self.targets)
+    
+    def __iter__(self):
+        return zip(self.targets, self.actuals)
+    
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self.targets[i], self.actuals[i]
+    
+    def __getitem__(self, i):
+        return self.targets[i], self.actuals[i]
+    
+    def append(self, prediction):
+        target, actual = prediction
+        self.targets.append(target)
+        self.actuals.append(actual)
+    
+    def pop(self):
+        return self.targets.pop(), self.actuals.pop()
+    
+    def drop(self, count):
+        """Removes the oldest count pairs"""
+        self.targets.drop(count)
+        self.actuals.drop(count)
+    
+    def clear(self):
+        self.targets.clear()
+        self.actuals.clear()
+
+
+def count_contexts(values, max_length, start=1, chunk_size=1 << 22, half_life=0):
+    """Counts pattern outcomes with NumPy, returns PatternIndex.tables format
+
+    Every position i in [start, len(values) - 2] is counted as the outcome of
+    the patterns of length 1..min(max_length, i) that end right before it.
+    Only patterns that occur are kept: for each length the sorted codes of
+    the patterns seen and their [L, W] counts. With a half_life, each length
+    also gets [L, W] weights, an outcome weighing 2 ** -(age / half_life)
+    where the last counted position has age 0.
+    """
+    values = np.asarray(values, dtype=np.uint8)
+    end = len(values) - 1
+    parts = [[] for _ in range(max_length + 1)]  # (code << 1 | outcome, count, weight) per chunk and length
+    
+    # Work through the positions in chunks to bound temporary memory
+    for chunk_start in range(max(start, 1), end, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, end)
+        outcomes = values[chunk_start:chunk_end].astype(np.int64)
+        codes = np.zeros(len(outcomes), dtype=np.int64)
+        decay = None
+        if half_life:
+            decay = np.exp2((np.arange(chunk_start, chunk_end) - (end - 1)) / half_life)
+        
+        # Roll the codes one result further back for each pattern length
+        for k in range(1, max_length + 1):
+            first = max(k - chunk_start, 0)  # positions before k have no pattern of length k
+            if first >= len(codes):
+                break
+            codes[first:] |= values[chunk_start + first - k:chunk_end - k].astype(np.int64) << (k - 1)
+            keys = (codes[first:] << 1) | outcomes[first:]
+            if (2 << k) <= 4 * len(keys):
+                # Short patterns: a dense count per code is cheaper than sorting
+                counts = np.bincount(keys, minlength=2 << k)
+                present = np.flatnonzero(counts)
+                weights = None if decay is None else np.bincount(keys, decay[first:], minlength=2 << k)[present]
+                parts[k].append((present, counts[present], weights))
+            else:
+                keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+                weights = None if decay is None else np.bincount(inverse, decay[first:], minlength=len(keys))
+                parts[k].append((keys, counts, weights))
+    
+    tables = [None]
+    for k in range(1, max_length + 1):
+        if not parts[k]:
+            empty = (np.zeros(0, dtype=np.int64), np.zeros((0, 2), dtype=np.int64))
+            tables.append(empty + ((np.zeros((0, 2)),) if half_life else ()))
+            continue
+        keys, counts, weights = parts[k][0]
+        if len(parts[k]) > 1:
+            keys, inverse = np.unique(np.concatenate([part[0] for part in parts[k]]), return_inverse=True)
+            counts = np.bincount(inverse, np.concatenate([part[1] for part in parts[k]])).astype(np.int64)
+            if half_life:
+                weights = np.bincount(inverse, np.concatenate([part[2] for part in parts[k]]))
+        codes, inverse = np.unique(keys >> 1, return_inverse=True)
+        table = np.zeros((len(codes), 2), dtype=np.int64)
+        table[inverse, keys & 1] = counts
+        if not half_life:
+            tables.append((codes, table))
+            continue
+        weight_table = np.zeros((len(codes), 2))
+        weight_table[inverse, keys & 1] = weights
+        tables.append((codes, table, weight_table))
+    
+    return tables
+
+
+def count_trends(values, window_sizes):
+    """Counts next results by window trend for every window size at once
+
+    Each window of `size` results that is followed by another result is
+    classified as Yukselis (>= 60% W), Dusus (>= 60% L) or Denge. Returns
+    {size: {trend_type: [L, W]}} built from a single prefix sum.
+    """
+    values = np.asarray(values, dtype=np.uint8)
+    cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    trend_counts = {}
+    
+    for size in window_sizes:
+        if len(values) <= size:
+            continue
+        
+        # Wins in each window ending right before a known result
+        w_count = cumulative[size:-1] - cumulative[:-size - 1]
+        classes = np.ones(len(w_count), dtype=np.int64)
+        classes[w_count / size >= 0.6] = 2
+        classes[(size - w_count) / size >= 0.6] = 0
+        
+        counts = np.bincount((classes << 1) | values[size:], minlength=6).reshape(3, 2)
+        trend_counts[size] = {trend_type: counts[code].tolist()
+                              for code, trend_type in enumerate(TREND_TYPES) if counts[code].any()}
+    
+    return trend_counts
+
+
+def _trend_class(wins, size):
+    # Class code of a window with wins W results out of size, as count_trends classifies it
+    if (size - wins) / size >= 0.6:
+        return 0
+    return 2 if wins / size >= 0.6 else 1
+
+
+class TrendIndex:
+    """count_trends of a history, kept up to date result by result
+
+    Adding, deleting or dropping a result changes one window of each size,
+    so a click costs O(sum of window sizes) however long the history is.
+    """
+    def __init__(self, window_sizes=DEFAULT_TREND_WINDOWS):
+        self.window_sizes = sorted(window_sizes)
+        self.clear()
+
+    def clear(self):
+        self.counts = {size: [[0, 0], [0, 0], [0, 0]] for size in self.window_sizes}  # [L, W] by trend class
+        self.length = 0  # results counted
+
+    def _update(self, values, y, delta):
+        # Counts values[y] after the window of each size that ends before it
+        outcome = int(values[y])
+        for size in self.window_sizes:
+            if y >= size:
+                wins = int(np.count_nonzero(values[y - size:y]))
+                self.counts[size][_trend_class(wins, size)][outcome] += delta
+
+    def append(self, history):
+        """Accounts for the result just appended to history"""
+        self._update(history.array, len(history) - 1, 1)
+        self.length = len(history)
+
+    def pop(self, history):
+        """Rolls back the counts of the last result, call before popping it"""
+        self._update(history.array, len(history) - 1, -1)
+        self.length = len(history) - 1
+
+    def evict(self, history):
+        """Removes the first window of each size, call before dropping the oldest result"""
+        values = history.array
+        for size in self.window_sizes:
+            if len(values) > size:
+                wins = int(np.count_nonzero(values[:size]))
+                self.counts[size][_trend_class(wins, size)][int(values[size])] -= 1
+        self.length = len(values) - 1
+
+    def extend(self, history, previous_length):
+        """Accounts for all results appended since history had previous_length"""
+        values = history.array
+        for size in self.window_sizes:
+            # Windows followed by a new result start at previous_length - size or later
+            added = count_trends(values[max(previous_length - size, 0):], [size]).get(size, {})
+            for code, trend_type in enumerate(TREND_TYPES):
+                l_count, w_count = added.get(trend_type, (0, 0))
+                self.counts[size][code][0] += l_count
+                self.counts[size][code][1] += w_count
+        self.length = len(values)
+
+    def rebuild(self, history, window_sizes=None):
+        """Recounts everything, for window_sizes if given"""
+        self.load(self.window_sizes if window_sizes is None else window_sizes,
+                  count_trends(history.array, window_sizes or self.window_sizes), len(history))
+
+    def load(self, window_sizes, trend_counts, length):
+        """Takes over counts in count_trends format for a history of length results"""
+        self.window_sizes = sorted(window_sizes)
+        self.counts = {size: [list(trend_counts.get(size, {}).get(trend_type, (0, 0))) for trend_type in TREND_TYPES]
+                       for size in self.window_sizes}
+        self.length = length
+
+    def stats(self):
+        """The counts in count_trends format"""
+        return {size: {trend_type: list(counts[code]) for code, trend_type in enumerate(TREND_TYPES) if any(counts[code])}
+                for size, counts in self.counts.items() if self.length > size}
+
+
+def _pattern_entry(l_count, w_count):
+    # One pattern_stats entry; decayed weights of old patterns can reach 0
+    total = w_count + l_count
+    return {
+        "W": w_count,
+        "L": l_count,
+        "total": total,
+        "win_prob": w_count / total * 100 if total else 0,
+        "loss_prob": l_count / total * 100 if total else 0,
+        "win_count": w_count,
+        "loss_count": l_count
+    }
+
+
+def _pattern_text(code, length):
+    return format(int(code), f'0{length}b').replace('1', 'W').replace('0', 'L')
+
+
+def format_count(count):
+    """A sample count for display, decayed counts with one decimal"""
+    return f"{count:.1f}" if isinstance(count, float) else str(count)
+
+
+class PatternIndex:
+    """Persistent pattern -> next result counts in an array-backed context trie
+
+    Node 0 is the empty pattern. The child of a node for a result (W=1) is
+    the node's pattern extended by that result one step further back, so a
+    walk that follows the newest results backwards passes the pattern of
+    every length in turn. Only patterns that occurred have a node; a node's
+    code is its pattern read as binary, oldest result first.
+    
+    With a half_life, each node also carries [L, W] weights that halve every
+    half_life results. They are decayed lazily: a node's weights hold as of
+    its stamp and are brought forward only when the node is updated, so an
+    update still touches one node per pattern length.
+    """
+    FREE = 255  # depth of released nodes waiting for reuse
+
+    def __init__(self, max_length=5, half_life=0):
+        self.max_length = max_length
+        self.half_life = half_life
+        self.clear()
+
+    def clear(self):
+        self.children = np.full((64, 2), -1, dtype=np.int32)
+        self.counts = np.zeros((64, 2), dtype=np.int64)  # [L, W] results after the pattern
+        self.codes = np.zeros(64, dtype=np.int64)
+        self.depths = np.zeros(64, dtype=np.uint8)
+        self.weights = np.zeros((64, 2)) if self.half_life else None  # decayed [L, W] as of stamps
+        self.stamps = np.zeros(64, dtype=np.int64) if self.half_life else None
+        self.time = 0  # position of the newest counted outcome
+        self.size = 1  # nodes in use, released ones included
+        self.free = []
+        self.level_sizes = [1] + [0] * self.max_length  # live nodes per pattern length
+
+    def _reserve(self, count):
+        capacity = len(self.codes)
+        if self.size + count <= capacity:
+            return
+        capacity = max(capacity * 2, self.size + count)
+        self.children = np.concatenate((self.children, np.full((capacity - len(self.codes), 2), -1, dtype=np.int32)))
+        self.counts = np.resize(self.counts, (capacity, 2))
+        self.codes = np.resize(self.codes, capacity)
+        self.depths = np.resize(self.depths, capacity)
+        if self.half_life:
+            self.weights = np.resize(self.weights, (capacity, 2))
+            self.stamps = np.resize(self.stamps, capacity)
+
+    def _add_nodes(self, parents, bits, codes, depth):
+        # Links new children of parents and returns their node numbers
+        count = len(codes)
+        if count == 1 and self.free:
+            nodes = np.array([self.free.pop()])
+        else:
+            self._reserve(count)
+            nodes = np.arange(self.size, self.size + count)
+            self.size += count
+        self.children[nodes] = -1
+        self.counts[nodes] = 0
+        self.codes[nodes] = codes
+        self.depths[nodes] = depth
+        if self.half_life:
+            self.weights[nodes] = 0
+            self.stamps[nodes] = self.time
+        self.children[parents, bits] = nodes
+        self.level_sizes[depth] += count
+        return nodes
+
+    def _count(self, parent, bit, node, depth, outcome, delta, time):
+        # Adds delta outcomes at position time to a node, releasing it once
+        # its pattern no longer occurs, and with it the longer ones below it
+        self.counts[node, outcome] += delta
+        if self.half_life:
+            stamp = int(self.stamps[node])
+            if time >= stamp:
+                self.weights[node] *= 2.0 ** ((stamp - time) / self.half_life)
+                self.weights[node, outcome] += delta
+                self.stamps[node] = time
+            else:
+                # An evicted outcome, older than the node's weights
+                self.weights[node, outcome] += delta * 2.0 ** ((time - stamp) / self.half_life)
+        if delta < 0 and not self.counts[node].any():
+            self.children[parent, bit] = -1
+            self.depths[node] = self.FREE
+            self.free.append(node)
+            self.level_sizes[depth] -= 1
+
+    def _update(self, history, i, delta):
+        # Record history[i] as the outcome of every pattern ending before it
+        values = history.array[max(i - self.max_length, 0):i + 1].tolist()
+        outcome = values.pop()
+        node = 0
+        code = 0
+        for depth, bit in enumerate(reversed(values), 1):
+            code |= bit << (depth - 1)
+            parent = node
+            node = int(self.children[parent, bit])
+            if node < 0:
+                node = int(self._add_nodes([parent], [bit], [code], depth)[0])
+            self._count(parent, bit, node, depth, outcome, delta, history.start + i)
+
+    def append(self, history):
+        """Accounts for the result just appended to history"""
+        # The newest result has no outcome yet, so it is the one before it
+        # that becomes countable
+        if len(history) >= 3:
+            self._update(history, len(history) - 2, 1)
+            self.time = history.start + len(history) - 2
+
+    def pop(self, history):
+        """Rolls back the counts of the last result, call before popping it"""
+        if len(history) >= 3:
+            self._update(history, len(history) - 2, -1)
+            self.time = history.start + len(history) - 3
+
+    def evict(self, history):
+        """Removes the counts of the oldest result, call before dropping it
+
+        Position i of a history counts the patterns of length i and shorter,
+        so once the oldest result goes, each position up to max_length loses
+        its longest pattern: the one that started with the oldest result.
+        """
+        values = history.array[:self.max_length + 1].tolist()
+        for length in range(1, min(self.max_length, len(history) - 2) + 1):
+            node = 0
+            for bit in reversed(values[:length]):
+                parent = node
+                node = int(self.children[parent, bit])
+            self._count(parent, values[0], node, length, values[length], -1, history.start + length)
+
+    def merge(self, tables, time):
+        """Adds counts in tables format, creating the nodes of new patterns
+
+        time is the position of the newest outcome in tables, which the
+        weights in tables are decayed to when the index has a half-life.
+        """
+        parent_codes = np.zeros(1, dtype=np.int64)
+        parent_nodes = np.zeros(1, dtype=np.int64)
+        for k in range(1, self.max_length + 1):
+            codes, counts = tables[k][:2]
+            if not len(codes):
+                break
+            
+            # Every pattern's parent, one result shorter, was counted at the same positions
+            parents = parent_nodes[np.searchsorted(parent_codes, codes & ((1 << (k - 1)) - 1))]
+            bits = codes >> (k - 1)
+            nodes = self.children[parents, bits].astype(np.int64)
+            new = np.flatnonzero(nodes < 0)
+            if len(new):
+                nodes[new] = self._add_nodes(parents[new], bits[new], codes[new], k)
+            self.counts[nodes] += counts
+            if self.half_life:
+                ages = time - self.stamps[nodes]
+                self.weights[nodes] = self.weights[nodes] * np.exp2(-ages / self.half_life)[:, None] + tables[k][2]
+                self.stamps[nodes] = time
+            parent_codes, parent_nodes = codes, nodes
+        self.time = max(self.time, time)
+
+    def extend(self, history, previous_length):
+        """Accounts for all results appended since history had previous_length"""
+        self.merge(count_contexts(history.array, self.max_length, start=max(previous_length - 1, 1),
+                                  half_life=self.half_life), history.start + len(history) - 2)
+
+    def rebuild(self, history, max_length=None, half_life=None):
+        """Recounts everything from scratch, to max_length deep and with half_life if given"""
+        if max_length is not None:
+            self.max_length = max_length
+        if half_life is not None:
+            self.half_life = half_life
+        self.clear()
+        self.merge(count_contexts(history.array, self.max_length, half_life=self.half_life),
+                   history.start + len(history) - 2)
+
+    def load(self, max_length, children, counts, codes, depths, half_life=0, weights=None, stamps=None, time=0):
+        """Takes over saved node arrays, as sliced to size"""
+        self.max_length = max_length
+        self.half_life = half_life
+        self.children = np.array(children, dtype=np.int32).reshape(-1, 2)
+        self.counts = np.array(counts, dtype=np.int64).reshape(-1, 2)
+        self.codes = np.array(codes, dtype=np.int64)
+        self.depths = np.array(depths, dtype=np.uint8)
+        self.weights = np.array(weights, dtype=np.float64).reshape(-1, 2) if half_life else None
+        self.stamps = np.array(stamps, dtype=np.int64) if half_life else None
+        self.time = time
+        self.size = len(self.codes)
+        self.free = np.flatnonzero(self.depths == self.FREE).tolist()
+        self.level_sizes = np.bincount(self.depths, minlength=self.FREE + 1)[:max_length + 1].tolist()
+
+    def walk(self, values):
+        """[L, W] counts of the patterns that end the values, for lengths 1, 2, ...
+
+        Stops at the first length that never occurred or at max_length.
+        """
+        nodes = []
+        node = 0
+        for bit in reversed(np.asarray(values[-self.max_length:]).tolist()):
+            node = int(self.children[node, bit])
+            if node < 0:
+                break
+            nodes.append(node)
+        return self.weighted(nodes).tolist()
+
+    def weighted(self, nodes):
+        """[L, W] of nodes as the statistics use them: counts, or weights decayed to now with a half-life"""
+        if not self.half_life:
+            return self.counts[nodes]
+        ages = self.time - self.stamps[nodes]
+        return np.round(self.weights[nodes] * np.exp2(-ages / self.half_life)[..., None], DECAY_DECIMALS)
+
+    def nodes(self, max_length):
+        """Live nodes of patterns up to max_length, ordered by length and code"""
+        depths = self.depths[:self.size]
+        nodes = np.flatnonzero((depths >= 1) & (depths <= max_length))
+        return nodes[np.lexsort((self.codes[nodes], depths[nodes]))]
+
+    def tables(self, max_length=None):
+        """Counts as [None, (codes, counts), ...]: sorted codes and weighted() [L, W] per length"""
+        max_length = self.max_length if max_length is None else max_length
+        nodes = self.nodes(max_length)
+        bounds = np.searchsorted(self.depths[nodes], np.arange(1, max_length + 2))
+        return [None] + [(self.codes[nodes[low:high]], self.weighted(nodes[low:high]))
+                         for low, high in zip(bounds[:-1], bounds[1:])]
+
+    def stats(self, max_length):
+        """Returns pattern statistics in the pattern_stats format"""
+        return PatternStats(self, min(max_length, self.max_length))
+
+
+class PatternStats(Mapping):
+    """pattern_stats of a PatternIndex, {pattern: stats}, with entries made on lookup"""
+    def __init__(self, index, max_length):
+        self.index = index
+        self.max_length = max_length
+
+    def __getitem__(self, pattern):
+        if not isinstance(pattern, str) or not 1 <= len(pattern) <= self.max_length:
+            raise KeyError(pattern)
+        node = 0
+        for result in reversed(pattern):
+            bit = RESULT_CODES.get(result)
+            node = -1 if bit is None else int(self.index.children[node, bit])
+            if node < 0:
+                raise KeyError(pattern)
+        return _pattern_entry(*self.index.weighted(node).tolist())
+
+    def __iter__(self):
+        index = self.index
+        nodes = index.nodes(self.max_length)
+        for code, depth in zip(index.codes[nodes].tolist(), index.depths[nodes].tolist()):
+            yield _pattern_text(code, depth)
+
+    def __len__(self):
+        return sum(self.index.level_sizes[1:self.max_length + 1])
+
+    def ranked(self, threshold, limit=None):
+        """Patterns with at least threshold samples, strongest first, as (pattern, stats)"""
+        index = self.index
+        depths = index.depths[:index.size]
+        weighted = index.weighted(slice(0, index.size))
+        losses = weighted[:, 0]
+        wins = weighted[:, 1]
+        nodes = np.flatnonzero((losses + wins >= threshold) & (depths >= 1) & (depths <= self.max_length))
+        counts = weighted[nodes]
+        totals = losses[nodes] + wins[nodes]
+        _, _, prob = _probabilities(counts[:, 1], totals)
+        
+        if limit is not None and limit < len(nodes):
+            # Only patterns as strong as the limit-th strongest can make the list
+            cutoff = np.partition(prob, len(prob) - limit)[len(prob) - limit]
+            keep = np.flatnonzero(prob >= cutoff)
+            nodes, counts, totals, prob = nodes[keep], counts[keep], totals[keep], prob[keep]
+        
+        # Highest probability, then most samples, then shortest and lowest code
+        order = np.lexsort((index.codes[nodes], index.depths[nodes], -totals, -prob))[:limit]
+        return [(_pattern_text(code, depth), _pattern_entry(l_count, w_count))
+                for code, depth, (l_count, w_count) in zip(index.codes[nodes[order]].tolist(),
+                                                           index.depths[nodes[order]].tolist(),
+                                                           counts[order].tolist())]
+
+
+class StepPredictions:
+    """The predictions one algorithm made during part of a walk-forward test
+
+    steps[i] is the position whose result was predicted and targets[i] the
+    prediction (W=1). kinds[i] and details[i] name the rule behind it: kind 0
+    is a pattern of length details[i], kind 1 the matrix line details[i]
+    (H1..H5, V1..V5) and kind 2 the trend details[i] of TREND_TYPES.
+    """
+    TYPES = ("Pattern", "Matrix", "Adaptive")
+    
+    def __init__(self, steps, targets, probs, samples, kinds, details):
+        self.steps = steps
+        self.targets = targets
+        self.probs = probs
+        self.samples = samples
+        self.kinds = kinds
+        self.details = details
+    
+    def __len__(self):
+        return len(self.steps)
+    
+    def prediction(self, i, values):
+        """The i-th prediction as a predict_next dict"""
+        t = int(self.steps[i])
+        kind = int(self.kinds[i])
+        detail = int(self.details[i])
+        
+        if kind == 0:
+            pattern = values[t - detail:t].tobytes().translate(_TO_CHARS).decode()
+        elif kind == 1:
+            # Same layout as analyze_matrix: most recent result top-left, by column
+            recent = values[t - 25:t][::-1].tobytes().translate(_TO_CHARS).decode()
+            if detail < 5:
+                pattern = f"H{detail + 1}:{recent[detail::5]}"
+            else:
+                pattern = f"V{detail - 4}:{recent[5 * (detail - 5):5 * (detail - 4)]}"
+        else:
+            pattern = f"{TREND_TYPES[detail]} + last pattern"
+        
+        return {
+            "target": RESULT_CHARS[self.targets[i]],
+            "prob": float(self.probs[i]),
+            "pattern": pattern,
+            "samples": self.samples[i].item(),
+            "type": self.TYPES[kind]
+        }
+
+
+def _candidate(has, win_prob, loss_prob, prob, samples, kind, detail):
+    # Per-step prediction arrays of one rule, before compressing to StepPredictions
+    return {"has": has, "target": (win_prob > loss_prob).astype(np.uint8), "prob": prob,
+            "samples": samples, "kind": np.broadcast_to(kind, has.shape), "detail": detail}
+
+
+def _probabilities(wins, total):
+    # Same arithmetic as the stats dicts: w / total * 100, so results compare equal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_prob = wins / total * 100
+        loss_prob = (total - wins) / total * 100
+    return win_prob, loss_prob, np.maximum(win_prob, loss_prob)
+
+
+class _ContextCounts:
+    # [L, W] counts of the patterns of one length as walk_forward carries
+    # them: a table indexed by code while that is small, otherwise the
+    # sorted codes seen so far, as long patterns mostly never occur.
+    # Decayed weights are carried the same way as float counts.
+    def __init__(self, length, codes, counts, dense):
+        self.length = length
+        self.table = None
+        dtype = np.float64 if np.asarray(counts).dtype.kind == 'f' else np.int64
+        if dense:
+            self.table = np.zeros((1 << length, 2), dtype=dtype)
+            self.table[codes] = counts
+        else:
+            self.codes = np.array(codes, dtype=np.int64)
+            self.counts = np.array(counts, dtype=dtype).reshape(-1, 2)
+
+    def lookup(self, codes):
+        if self.table is not None:
+            return self.table[codes]
+        if not len(self.codes):
+            return np.zeros((len(codes), 2), dtype=self.counts.dtype)
+        at = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        found = self.codes[at] == codes
+        return np.where(found[:, None], self.counts[at], 0)
+
+    def decay(self, factor):
+        if self.table is not None:
+            self.table *= factor
+        else:
+            self.counts *= factor
+
+    def add(self, keys, weights=None):
+        # keys are code << 1 | outcome of the positions to count, weighing 1 or weights
+        if self.table is not None:
+            self.table += np.bincount(keys, weights, minlength=2 << self.length).reshape(-1, 2)
+            return
+        keys, inverse = np.unique(keys, return_inverse=True)
+        key_counts = np.bincount(inverse, weights, minlength=len(keys)).astype(self.counts.dtype)
+        codes, inverse = np.unique(keys >> 1, return_inverse=True)
+        counts = np.zeros((len(codes), 2), dtype=self.counts.dtype)
+        counts[inverse, keys & 1] = key_counts
+        
+        # Merge into the sorted codes, inserting the new ones in place
+        at = np.searchsorted(self.codes, codes)
+        found = at < len(self.codes)
+        found[found] = self.codes[at[found]] == codes[found]
+        self.counts[at[found]] += counts[found]
+        self.codes = np.insert(self.codes, at[~found], codes[~found])
+        self.counts = np.insert(self.counts, at[~found], counts[~found], axis=0)
+
+
+def _segment_sums(values, starts):
+    # Running sums of values within the segments that begin where starts is
+    # set, by doubling steps that only ever add values of the same segment
+    sums = np.array(values, dtype=np.float64)
+    n = len(sums)
+    segment_starts = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    span = 1
+    while span < n:
+        sums[span:] += np.where(np.arange(n - span) >= segment_starts[span:], sums[:-span], 0)
+        span *= 2
+    return sums
+
+
+def _recent_pattern_counts(positions, codes, outcomes, k, steps, step_codes, retention, half_life):
+    # Totals and wins of the pattern before each step among the positions
+    # max(k, t - retention + k) .. t - 2, those an engine keeping retention
+    # results counts at step t. positions, ascending, and their codes and
+    # outcomes cover every position a step can count.
+    counted = (positions >= k) & (positions <= steps[-1] - 2)
+    order = np.flatnonzero(counted)[np.argsort(codes[counted], kind="stable")]
+    
+    # Sorted by code, then position: each step's positions are one range
+    span = len(positions)
+    keys = codes[order] * span + (positions[order] - positions[0])
+    first = np.minimum(np.maximum(steps - retention + k, k) - positions[0], span)
+    low = np.searchsorted(keys, step_codes * span + first)
+    high = np.searchsorted(keys, step_codes * span + np.maximum(steps - 2 - positions[0], first - 1), side="right")
+    high = np.maximum(high, low)
+    if not half_life:
+        wins = np.concatenate(([0], np.cumsum(outcomes[order])))
+        return high - low, wins[high] - wins[low]
+    
+    # Weights as of t - 2, summed within each pattern so small ones are kept
+    a = steps[0]
+    scale = np.exp2((positions[order] - a) / half_life)
+    sorted_codes = codes[order]
+    starts = np.concatenate(([True], sorted_codes[1:] != sorted_codes[:-1]))
+    step_decay = np.exp2(-(steps - 2 - a) / half_life)
+    sums = []
+    for values in (scale, scale * outcomes[order]):
+        running = np.concatenate(([0], _segment_sums(values, starts)))
+        # The running sum before low only belongs to the same pattern if low does not start it
+        before = np.where(np.concatenate((starts, [True]))[low], 0, running[low])
+        sums.append(np.where(high > low, running[high] - before, 0) * step_decay)
+    
+    # L and W are rounded apart, as PatternIndex.weighted rounds them
+    losses = np.round(sums[0] - sums[1], DECAY_DECIMALS)
+    wins = np.round(sums[1], DECAY_DECIMALS)
+    return losses + wins, wins
+
+
+def walk_forward(values, start=3, max_pattern_length=5, significance_threshold=5,
+                 trend_windows=DEFAULT_TREND_WINDOWS, algorithms=ALGORITHMS, chunk_size=1 << 20,
+                 pattern_counts=None, trend_counts=None, half_life=0, retention=0):
+    """Predicts every result from start on as if the results came one by one
+
+    Step t predicts values[t] from values[:t] with the statistics an engine
+    holds after analyzing exactly values[:t], which is what add_result scores.
+    Pattern and trend counts are carried from step to step instead of being
+    recounted, so all algorithms are tested together in one O(N * K) pass.
+    With a half_life the patterns use decayed weights like PatternIndex,
+    equal to the engine's up to floating point rounding. With a retention,
+    each step only sees the last retention results, like an engine that
+    keeps that many; its counts are then taken from those results directly.
+
+    Yields ({algorithm: StepPredictions}, steps done) per chunk of steps.
+    pattern_counts and trend_counts, in PatternIndex.tables and count_trends
+    format, may pass in the counts of values[:start] when already known,
+    and are not used with a retention.
+    """
+    values = np.asarray(values, dtype=np.uint8)
+    start = max(start, 3)
+    if start >= len(values):
+        return
+    
+    max_length = max_pattern_length
+    threshold = max(significance_threshold, 1)  # patterns and trends without samples have no stats
+    windows = sorted(trend_windows)
+    if half_life:
+        # Weights within a chunk span at most 2 ** 512
+        chunk_size = max(min(chunk_size, int(512 * half_life)), 1)
+    
+    # Counts of the results before the first step: patterns end at most two
+    # results before a step, trend windows are followed by a known result.
+    # Decayed weights come last in count_contexts tables.
+    # A retention counts the kept results at every step instead
+    known = 0 if retention else start
+    if pattern_counts is None or retention:
+        pattern_counts = count_contexts(values[:known], max_length, half_life=half_life)
+    dense_limit = max(min(len(values), DENSE_CONTEXTS), 1 << 8)
+    pattern_counts = [None] + [_ContextCounts(k, pattern_counts[k][0], pattern_counts[k][-1],
+                                              dense=(1 << k) <= dense_limit)
+                               for k in range(1, max_length + 1)]
+    if trend_counts is None or retention:
+        trend_counts = count_trends(values[:known], windows)
+    trend_base = {size: np.array([trend_counts.get(size, {}).get(trend_type, [0, 0]) for trend_type in TREND_TYPES],
+                                 dtype=np.int64)
+                  for size in windows}
+    
+    # Pattern lengths whose counts the algorithms look at
+    if "pattern" in algorithms or "combined" in algorithms:
+        lengths = set(range(1, max_length + 1))
+    elif "adaptive" in algorithms:
+        lengths = {3, 7} & set(range(1, max_length + 1))
+    else:
+        lengths = set()
+    
+    # Each chunk sees this many results before its first step
+    lookback = max(max_length + 1, 50, max(windows, default=0)) + retention
+    
+    for a in range(start, len(values), chunk_size):
+        b = min(a + chunk_size, len(values))
+        n = b - a
+        steps = np.arange(a, b)
+        held = np.minimum(steps, retention) if retention else steps  # results the engine has at each step
+        
+        # local[lookback + x - a] is values[x], zero padded before the first result
+        low = max(a - lookback, 0)
+        local = np.concatenate((np.zeros(lookback - (a - low), dtype=np.uint8), values[low:b]))
+        cumulative = np.concatenate(([0], np.cumsum(local, dtype=np.int64)))
+        
+        def wins_before(x, length):
+            # Wins among the `length` results before positions x
+            return cumulative[x - a + lookback] - cumulative[x - a + lookback - length]
+        
+        candidates = {}
+        
+        # Patterns: positions x = a-1 .. b-1, where step t = x looks up the
+        # pattern before it and x - 1 is the last position counted by then
+        positions = np.arange(a - 1, b)
+        outcomes = local[lookback - 1:lookback + n].astype(np.int64)
+        codes = np.zeros(n + 1, dtype=np.int64)
+        pattern_totals = {}
+        pattern_wins = {}
+        if retention:
+            # Codes of every position since the oldest result a step of the chunk sees
+            kept_positions = np.arange(a - retention, b)
+            kept_outcomes = local[lookback - retention:lookback + n].astype(np.int64)
+            kept_codes = np.zeros(n + retention, dtype=np.int64)
+        if half_life:
+            # Position x weighs 2 ** ((x - a) / half_life) within the chunk; at
+            # step t the weights are decayed to t - 2, the carried ones from a - 2
+            scale = np.exp2((positions - a) / half_life)
+            step_decay = np.exp2(-(steps - 2 - a) / half_life)
+            carried_decay = np.exp2(-(steps - a) / half_life)
+        for k in range(1, max(lengths, default=0) + 1):
+            codes |= local[lookback - 1 - k:lookback + n - k].astype(np.int64) << (k - 1)
+            if retention:
+                kept_codes |= local[lookback - retention - k:lookback + n - k].astype(np.int64) << (k - 1)
+            if k not in lengths:
+                continue
+            if retention:
+                valid = steps >= k
+                total, wins = _recent_pattern_counts(kept_positions, kept_codes, kept_outcomes, k, steps,
+                                                     codes[1:], retention, half_life)
+                pattern_totals[k] = np.where(valid, total, 0)
+                pattern_wins[k] = np.where(valid, wins, 0)
+                continue
+            valid = positions >= k
+            group = np.where(valid, codes, 1 << k)  # positions without a pattern get their own group
+            
+            # Earlier positions of the same pattern in this chunk, by a stable sort on the code
+            order = np.argsort(group.astype(np.uint16 if k < 16 else np.uint32 if k < 32 else np.uint64),
+                               kind="stable")
+            rank = np.empty(n + 1, dtype=np.int64)
+            rank[order] = np.arange(n + 1)
+            sorted_group = group[order]
+            starts = np.concatenate(([True], sorted_group[1:] != sorted_group[:-1]))
+            first = np.maximum.accumulate(np.where(starts, np.arange(n + 1), 0))[rank]
+            
+            # The position right before a step is only counted one step later;
+            # if it has the step's pattern, it is the last earlier one in order
+            repeat = valid[:-1] & (group[:-1] == group[1:])
+            counted_rank = rank[1:] - repeat
+            step_codes = np.where(valid[1:], codes[1:], 0)
+            base = pattern_counts[k].lookup(step_codes)
+            if half_life:
+                # Sums within each pattern only, as differences of running
+                # sums over all patterns would lose the small weights
+                sorted_totals = _segment_sums(scale[order], starts)
+                sorted_wins = _segment_sums(scale[order] * outcomes[order], starts)
+                earlier = counted_rank > first[1:]
+                total = np.where(earlier, sorted_totals[counted_rank - 1], 0) * step_decay
+                wins = np.where(earlier, sorted_wins[counted_rank - 1], 0) * step_decay
+                wins = wins + base[:, 1] * carried_decay
+                losses = np.round(total + base.sum(axis=1) * carried_decay - wins, DECAY_DECIMALS)
+                wins = np.round(wins, DECAY_DECIMALS)
+                total = losses + wins
+            else:
+                sorted_wins = np.concatenate(([0], np.cumsum(outcomes[order])))
+                total = counted_rank - first[1:] + base.sum(axis=1)
+                wins = sorted_wins[counted_rank] - sorted_wins[first[1:]] + base[:, 1]
+            pattern_totals[k] = np.where(valid[1:], total, 0)
+            pattern_wins[k] = np.where(valid[1:], wins, 0)
+            
+            counted = valid[:-1]
+            keys = (codes[:-1][counted] << 1) | outcomes[:-1][counted]
+            if half_life:
+                # Carried weights move on from a - 2 to b - 2
+                pattern_counts[k].decay(2.0 ** (-n / half_life))
+                pattern_counts[k].add(keys, np.exp2((positions[:-1][counted] - (b - 2)) / half_life))
+            else:
+                pattern_counts[k].add(keys)
+        
+        if "pattern" in algorithms or "combined" in algorithms:
+            # Longest pattern first, a shorter one wins with a higher
+            # probability or the same probability and more samples
+            best = _candidate(np.zeros(n, dtype=bool), np.zeros(n), np.zeros(n), np.zeros(n),
+                              np.zeros(n, dtype=np.int64), 0, np.zeros(n, dtype=np.int64))
+            for k in range(max_length, 0, -1):
+                total = pattern_totals[k]
+                win_prob, loss_prob, prob = _probabilities(pattern_wins[k], total)
+                better = (total >= threshold) & ((prob > best["prob"]) |
+                                                 ((prob == best["prob"]) & (total > best["samples"])))
+                best["has"] = best["has"] | better
+                best["target"] = np.where(better, win_prob > loss_prob, best["target"]).astype(np.uint8)
+                best["prob"] = np.where(better, prob, best["prob"])
+                best["samples"] = np.where(better, total, best["samples"])
+                best["detail"] = np.where(better, k, best["detail"])
+            candidates["pattern"] = best
+        
+        if "matrix" in algorithms or "combined" in algorithms:
+            # The strongest line of the last 25 results, first line on ties
+            recent = [local[lookback - 1 - j:lookback - 1 - j + n] for j in range(25)]
+            line_wins = [sum(recent[5 * c + r] for c in range(5)) for r in range(5)]
+            line_wins += [sum(recent[5 * c + r] for r in range(5)) for c in range(5)]
+            line_wins = np.array(line_wins, dtype=np.int8)
+            
+            # max(w, 5 - w) grows with |2w - 5|, so the strongest line is found on integers
+            line = np.argmax(np.abs(2 * line_wins - 5), axis=0)
+            win_prob, loss_prob, prob = _probabilities(
+                np.take_along_axis(line_wins, line[None], axis=0)[0].astype(np.int64), 5)
+            has = (held >= 25) & (5 >= threshold)
+            candidates["matrix"] = _candidate(has, win_prob, loss_prob, prob, np.full(n, 5), 1, line)
+        
+        if "adaptive" in algorithms or "combined" in algorithms:
+            # Trend counts of the windows before positions a .. t-1, for every
+            # window size; each trend uses the largest size with enough samples
+            trend_totals = np.zeros((3, n), dtype=np.int64)
+            trend_wins = np.zeros((3, n), dtype=np.int64)
+            won = local[lookback:lookback + n] == 1
+            if retention:
+                kept = np.arange(a - retention, b)
+                kept_won = local[lookback - retention:lookback + n] == 1
+            for size in windows:
+                if retention:
+                    # Windows inside the last retention results: followed by
+                    # positions max(size, t - retention + size) .. t - 1
+                    w_count = wins_before(kept, size)
+                    classes = np.ones(len(kept), dtype=np.int64)
+                    classes[w_count / size >= 0.6] = 2
+                    classes[(size - w_count) / size >= 0.6] = 0
+                    classes[kept < size] = 3
+                    first = np.minimum(np.maximum(steps - retention + size, size), steps) - (a - retention)
+                    last = steps - (a - retention)
+                    for code in range(3):
+                        in_class = np.concatenate(([0], np.cumsum(classes == code)))
+                        won_in_class = np.concatenate(([0], np.cumsum((classes == code) & kept_won)))
+                        total = in_class[last] - in_class[first]
+                        wins = won_in_class[last] - won_in_class[first]
+                        enough = total >= threshold
+                        trend_totals[code] = np.where(enough, total, trend_totals[code])
+                        trend_wins[code] = np.where(enough, wins, trend_wins[code])
+                    continue
+                
+                w_count = wins_before(steps, size)
+                classes = np.ones(n, dtype=np.int64)
+                classes[w_count / size >= 0.6] = 2
+                classes[(size - w_count) / size >= 0.6] = 0
+                classes[steps < size] = 3  # no full window yet
+                
+                for code in range(3):
+                    in_class = np.cumsum(classes == code)
+                    won_in_class = np.cumsum((classes == code) & won)
+                    total = np.concatenate(([0], in_class[:-1])) + trend_base[size][code].sum()
+                    wins = np.concatenate(([0], won_in_class[:-1])) + trend_base[size][code, 1]
+                    enough = total >= threshold
+                    trend_totals[code] = np.where(enough, total, trend_totals[code])
+                    trend_wins[code] = np.where(enough, wins, trend_wins[code])
+                    trend_base[size][code] += [in_class[-1] - won_in_class[-1], won_in_class[-1]]
+            
+            # The trend of the last 50 results picks which trend statistics apply
+            recent = np.minimum(held, 50)
+            w_recent = wins_before(steps, recent)
+            l_recent = recent - w_recent
+            trend = np.where(2 * w_recent > 3 * l_recent, 2, np.where(2 * l_recent > 3 * w_recent, 0, 1))
+            total = np.take_along_axis(trend_totals, trend[None], axis=0)[0]
+            wins = np.take_along_axis(trend_wins, trend[None], axis=0)[0]
+            
+            # Weighted like predict_next_adaptive, adding in the same order
+            none = np.zeros(n, dtype=np.int64)
+            w_prob = np.zeros(n)
+            l_prob = np.zeros(n)
+            for weight, part_wins, part_total, use in (
+                    (0.3, wins, total, total > 0),
+                    (0.4, pattern_wins.get(3, none), pattern_totals.get(3, none), pattern_totals.get(3, none) >= threshold),
+                    (0.3, pattern_wins.get(7, none), pattern_totals.get(7, none), pattern_totals.get(7, none) >= threshold)):
+                win_part, loss_part, _ = _probabilities(part_wins, part_total)
+                w_prob = w_prob + np.where(use, win_part * weight, 0)
+                l_prob = l_prob + np.where(use, loss_part * weight, 0)
+            
+            has = (held >= 20) & (trend_totals > 0).any(axis=0) & (np.maximum(w_prob, l_prob) > 50)
+            candidates["adaptive"] = _candidate(has, w_prob, l_prob, np.maximum(w_prob, l_prob), total, 2, trend)
+        
+        if "combined" in algorithms:
+            # Highest probability, then most samples, earlier algorithm on ties
+            best = dict(candidates["pattern"])
+            for other in (candidates["matrix"], candidates["adaptive"]):
+                better = other["has"] & (~best["has"] | (other["prob"] > best["prob"]) |
+                                         ((other["prob"] == best["prob"]) & (other["samples"] > best["samples"])))
+                for key in best:
+                    best[key] = np.where(better, other[key], best[key])
+            candidates["combined"] = best
+        
+        chunk = {}
+        for algorithm in algorithms:
+            candidate = candidates[algorithm]
+            has = candidate["has"]
+            chunk[algorithm] = StepPredictions(steps[has], candidate["target"][has].astype(np.uint8),
+                                               candidate["prob"][has], candidate["samples"][has],
+                                               candidate["kind"][has], candidate["detail"][has])
+        yield chunk, b - start
+
+
+def new_prediction_stats():
+    return {
+        'total_predictions': 0,
+        'correct': 0,
+        'incorrect': 0,
+        'current_win_streak': 0,
+        'max_win_streak': 0,
+        'current_loss_streak': 0,
+        'max_loss_streak': 0
+    }
+
+
+def score_predictions(prediction_stats, predictions, values, trace=None, loss_streak_predictions=None):
+    """Scores StepPredictions against the actual results in values
+
+    Updates prediction_stats in place, continuing its current streaks, and
+    appends to trace and loss_streak_predictions when given, exactly like
+    AnalysisEngine.update_prediction_stats scoring one prediction at a time.
+    """
+    if not len(predictions):
+        return
+    
+    actuals = values[predictions.steps]
+    correct = predictions.targets == actuals
+    
+    # Streak length at every prediction; the first run continues the current streak
+    run_starts = np.flatnonzero(np.concatenate(([True], correct[1:] != correct[:-1])))
+    run_lengths = np.diff(np.append(run_starts, len(correct)))
+    streaks = np.arange(len(correct)) - np.repeat(run_starts, run_lengths) + 1
+    streaks[:run_lengths[0]] += prediction_stats['current_win_streak' if correct[0] else 'current_loss_streak']
+    
+    hits = int(np.count_nonzero(correct))
+    prediction_stats['total_predictions'] += len(correct)
+    prediction_stats['correct'] += hits
+    prediction_stats['incorrect'] += len(correct) - hits
+    if hits:
+        prediction_stats['max_win_streak'] = max(prediction_stats['max_win_streak'], int(streaks[correct].max()))
+    if hits < len(correct):
+        prediction_stats['max_loss_streak'] = max(prediction_stats['max_loss_streak'], int(streaks[~correct].max()))
+    
+    last = int(streaks[-1])
+    prediction_stats['current_win_streak'] = last if correct[-1] else 0
+    prediction_stats['current_loss_streak'] = 0 if correct[-1] else last
+    
+    if trace is not None:
+        trace.targets.extend(predictions.targets)
+        trace.actuals.extend(actuals)
+    
+    if loss_streak_predictions is not None:
+        for i in np.flatnonzero(~correct & (streaks >= 3)).tolist():
+            prediction = predictions.prediction(i, values)
+            loss_streak_predictions.append({
+                "loss_streak": int(streaks[i]),
+                "pattern": prediction["pattern"],
+                "algorithm": prediction["type"],
+                "prob": prediction["prob"]
+            })
+
+
+def same_loss_streak_records(records, other):
+    """True if two lists of loss streak records match
+
+    With a half-life, bulk and per-click scoring sum the decayed weights in
+    a different order, and a weight that lands on the other side of its
+    rounding moves a probability in its last digits. Probabilities are
+    compared to within PROB_TOLERANCE, everything else exactly.
+    """
+    if len(records) != len(other):
+        return False
+    for record, other_record in zip(records, other):
+        if record.keys() != other_record.keys():
+            return False
+        for key, value in record.items():
+            if key == "prob":
+                if abs(value - other_record[key]) > PROB_TOLERANCE:
+                    return False
+            elif value != other_record[key]:
+                return False
+    return True
+
+
+class AnalysisEngine:
+    """Analysis state and prediction algorithms, independent of any UI"""
+    def __init__(self, significance_threshold=5, max_pattern_length=5,
+                 active_algorithm="pattern", trend_windows=DEFAULT_TREND_WINDOWS, half_life=0, retention=0):
+        self.results = ResultHistory()
+        self.pattern_index = PatternIndex(max_pattern_length, half_life)
+        self.suffix_index = SuffixIndex()
+        self.pattern_stats = {}
+        self.matrix_stats = {}
+        self.matrix = []
+        self.adaptive_stats = {}
+        self.adaptive_window_stats = {}
+        self.trend_index = TrendIndex(trend_windows)
+        self.prediction_stats = new_prediction_stats()
+        self.prediction_history = PredictionTrace()
+        self.loss_streak_predictions = []
+        self.significance_threshold = significance_threshold
+        self.max_pattern_length = max_pattern_length
+        self.active_algorithm = active_algorithm
+        self.trend_windows = sorted(trend_windows)
+        self.half_life = half_life  # results after which a pattern outcome counts half, 0 to count all equally
+        self.retention = retention  # most results kept, older ones are evicted from all statistics; 0 keeps all
+    
+    def add_result(self, result):
+        """Adds a new result and updates the analysis"""
+        if len(self.results) >= 3:
+            with timings.stage("engine.score"):
+                self.update_prediction_stats(result)
+        
+        with timings.stage("engine.index"):
+            self.sync_trend_index()
+            self.results.append(result)
+            self.pattern_index.append(self.results)
+            self.trend_index.append(self.results)
+            self.trim()
+        self.analyze()
+    
+    def add_results(self, results, progress=None):
+        """Adds multiple results, scoring a prediction for each one
+
+        Scores exactly what calling add_result for every result would, each
+        prediction made from the statistics of the results before it, but in
+        one walk-forward pass; with a half-life the probabilities recorded
+        in loss_streak_predictions may differ in their last digits, see
+        same_loss_streak_records. progress, if given, is called as
+        progress(done, total) after every chunk of results.
+        """
+        start = len(self.results)
+        self.sync_pattern_index()
+        self.sync_trend_index()
+        known_counts = {}
+        if start >= 3 and not self.retention:
+            known_counts = {"pattern_counts": self.pattern_index.tables(self.max_pattern_length),
+                            "trend_counts": self.trend_counts()}
+        self.results.extend(results)
+        
+        values = self.results.array
+        total = len(values) - max(start, 3)
+        with timings.stage("engine.walk_forward"):
+            for chunk, done in walk_forward(values, start, self.max_pattern_length, self.significance_threshold,
+                                            self.trend_windows, (self.active_algorithm,), half_life=self.half_life,
+                                            retention=self.retention, **known_counts):
+                score_predictions(self.prediction_stats, chunk[self.active_algorithm], values,
+                                  self.prediction_history, self.loss_streak_predictions)
+                if progress:
+                    progress(done, total)
+        
+        # Count the new patterns in one vectorized pass, unless most of them
+        # are evicted again right away and the rest is recounted anyway
+        with timings.stage("engine.index"):
+            if not self.retention or len(self.results) - self.retention <= EVICT_LIMIT:
+                self.pattern_index.extend(self.results, start)
+                self.trend_index.extend(self.results, start)
+            self.trim()
+        self.analyze()
+    
+    def delete_last_result(self):
+        """Deletes the last result, returns it or None if there was none"""
+        if not self.results:
+            return None
+        
+        self.sync_trend_index()
+        self.pattern_index.pop(self.results)
+        self.trend_index.pop(self.results)
+        deleted = self.results.pop()
+        self.suffix_index.truncate(self.results)
+        
+        # Also remove last prediction if it exists
+        if self.prediction_history:
+            last_prediction = self.prediction_history.pop()
+            
+            # Update prediction stats
+            if last_prediction[0] == last_prediction[1]:  # Correct prediction
+                self.prediction_stats['correct'] -= 1
+            else:  # Incorrect prediction
+                self.prediction_stats['incorrect'] -= 1
+                
+            self.prediction_stats['total_predictions'] -= 1
+            
+            # Recalculate streaks (simplified)
+            if self.prediction_stats['total_predictions'] > 0:
+                last_correct = 0
+                for pred, actual in reversed(self.prediction_history):
+                    if pred == actual:
+                        last_correct += 1
+                    else:
+                        break
+                self.prediction_stats['current_win_streak'] = last_correct
+            else:
+                self.prediction_stats['current_win_streak'] = 0
+                self.prediction_stats['current_loss_streak'] = 0
+        
+        self.analyze()
+        return deleted
+    
+    def trim(self):
+        """Evicts the results beyond retention, oldest first, and the predictions scored on them
+
+        The statistics lose exactly what the evicted results contributed.
+        A large excess, such as after loading a long session, is dropped at
+        once and the statistics of the remaining results are recounted.
+        """
+        if not self.retention:
+            return
+        
+        excess = len(self.results) - self.retention
+        if excess > EVICT_LIMIT:
+            self.results.drop(excess)
+            self.pattern_index.rebuild(self.results, max(self.pattern_index.max_length, self.max_pattern_length),
+                                       self.half_life)
+            self.trend_index.rebuild(self.results, self.trend_windows)
+        elif excess > 0:
+            self.sync_pattern_index()
+            self.sync_trend_index()
+            for _ in range(excess):
+                self.pattern_index.evict(self.results)
+                self.trend_index.evict(self.results)
+                self.results.drop(1)
+        
+        if len(self.prediction_history) > self.retention:
+            self.prediction_history.drop(len(self.prediction_history) - self.retention)
+        del self.loss_streak_predictions[:-self.retention]
+    
+    def copy(self):
+        """An independent copy of the engine and all of its state"""
+        # Loss streak records are never changed once made, so the copy shares
+        # them rather than copying every dict of a long session
+        memo = {id(record): record for record in self.loss_streak_predictions}
+        return copy.deepcopy(self, memo)
+    
+    def clear(self):
+        """Clears all results and analysis"""
+        self.results.clear()
+        self.pattern_index.clear()
+        self.suffix_index.clear()
+        self.trend_index.clear()
+        self.prediction_history.clear()
+        self.loss_streak_predictions.clear()
+        self.prediction_stats = new_prediction_stats()
+        self.clear_analysis()
+    
+    def clear_analysis(self):
+        self.pattern_stats = {}
+        self.matrix_stats = {}
+        self.matrix = []
+        self.adaptive_stats = {}
+        self.adaptive_window_stats = {}
+    
+    def analyze(self):
+        """Performs all analyses
+
+        Each analysis is cleared while there are too few results for it, so
+        the statistics always describe exactly the current results.
+        """
+        with timings.stage("engine.analyze.patterns"):
+            self.analyze_patterns()
+        with timings.stage("engine.analyze.matrix"):
+            self.analyze_matrix()
+        with timings.stage("engine.analyze.adaptive"):
+            self.analyze_adaptive()
+    
+    def analyze_patterns(self):
+        """Analyzes patterns in the results"""
+        self.pattern_stats = {}
+        if len(self.results) < 3:
+            return
+        
+        # Counts are kept up to date by pattern_index as results come in
+        self.sync_pattern_index()
+        self.pattern_stats = self.pattern_index.stats(self.max_pattern_length)
+    
+    def sync_pattern_index(self):
+        # The index counts patterns as long as the longest length used so
+        # far, decayed with the current half-life
+        index = self.pattern_index
+        if index.max_length < self.max_pattern_length or index.half_life != self.half_life:
+            index.rebuild(self.results, max(index.max_length, self.max_pattern_length), self.half_life)
+    
+    def analyze_matrix(self):
+        """Analyzes the last 25 results laid out in a 5x5 matrix"""
+        self.matrix_stats = {}
+        self.matrix = []
+        if len(self.results) < 25:
+            return
+        
+        rows = 5
+        cols = 5
+        
+        # Most recent result at top-left, filled column by column
+        matrix = [[None for _ in range(cols)] for _ in range(rows)]
+        for i, result in enumerate(reversed(self.results[-rows * cols:])):
+            matrix[i % rows][i // rows] = result
+        self.matrix = matrix
+        
+        lines = [(f"H{r+1}", {"row": r}, ''.join(matrix[r])) for r in range(rows)]
+        lines += [(f"V{c+1}", {"col": c}, ''.join(matrix[r][c] for r in range(rows))) for c in range(cols)]
+        
+        for position, stats, pattern in lines:
+            w_count = pattern.count('W')
+            l_count = pattern.count('L')
+            total = w_count + l_count
+            stats.update({
+                "pattern": pattern,
+                "total": total,
+                "win_prob": w_count / total * 100,
+                "loss_prob": l_count / total * 100
+            })
+            self.matrix_stats[f"{position}:{pattern}"] = stats
+    
+    def sync_trend_index(self):
+        # Recount the trends when the windows changed or results were
+        # replaced behind the index's back
+        index = self.trend_index
+        if index.window_sizes != self.trend_windows or index.length != len(self.results):
+            index.rebuild(self.results, self.trend_windows)
+    
+    def trend_counts(self):
+        """count_trends for the current results and windows, kept up to date by trend_index"""
+        self.sync_trend_index()
+        return self.trend_index.stats()
+    
+    def analyze_adaptive(self):
+        """Analyzes which results follow rising, falling and balanced windows"""
+        self.adaptive_stats = {}
+        self.adaptive_window_stats = {}
+        if len(self.results) < 20:
+            return
+        
+        # Analyze trends in all window sizes in one pass, keeping the
+        # statistics of every window size
+        trend_counts = self.trend_counts()
+        
+        for size, counts in trend_counts.items():
+            window_stats = {}
+            for trend_type, (l_count, w_count) in counts.items():
+                total = w_count + l_count
+                if total >= self.significance_threshold:
+                    window_stats[trend_type] = {
+                        "window": size,
+                        "total": total,
+                        "win_prob": w_count / total * 100,
+                        "loss_prob": l_count / total * 100,
+                        "win_count": w_count,
+                        "loss_count": l_count
+                    }
+            self.adaptive_window_stats[size] = window_stats
+            
+            # Predictions use the largest window that has enough samples
+            self.adaptive_stats.update(window_stats)
+    
+    def predict_next_pattern(self, history):
+        """Makes pattern-based prediction"""
+        if len(history) < 3 or not self.pattern_stats:
+            return None
+        
+        best_strat = None
+        max_prob = 0
+        max_samples = 0
+        
+        # One walk from the newest result finds the counts of every length;
+        # check from longest pattern
+        contexts = self.pattern_index.walk(history.array[-self.max_pattern_length:])
+        for length in range(len(contexts), 0, -1):
+            stats = _pattern_entry(*contexts[length - 1])
+            if stats["total"] >= self.significance_threshold:
+                current_prob = max(stats["win_prob"], stats["loss_prob"])
+                if current_prob > max_prob or (current_prob == max_prob and stats["total"] > max_samples):
+                    max_prob = current_prob
+                    max_samples = stats["total"]
+                    best_strat = {
+                        "target": "W" if stats["win_prob"] > stats["loss_prob"] else "L",
+                        "prob": current_prob,
+                        "pattern": history.pattern(length),
+                        "samples": stats["total"],
+                        "type": "Pattern"
+                    }
+        
+        return best_strat
+    
+    def predict_next_matrix(self, history):
+        """Makes matrix-based prediction"""
+        if len(history) < 10 or not self.matrix_stats:
+            return None
+        
+        best_strat = None
+        max_prob = 0
+        
+        # Take the strongest row or column of the matrix
+        for matrix_key, stats in self.matrix_stats.items():
+            if stats["total"] >= self.significance_threshold:
+                current_prob = max(stats["win_prob"], stats["loss_prob"])
+                if current_prob > max_prob:
+                    max_prob = current_prob
+                    best_strat = {
+                        "target": "W" if stats["win_prob"] > stats["loss_prob"] else "L",
+                        "prob": current_prob,
+                        "pattern": matrix_key,
+                        "samples": stats["total"],
+                        "type": "Matrix"
+                    }
+        
+        return best_strat
+    
+    def predict_next_adaptive(self, history):
+        """Makes adaptive (weighted) prediction"""
+        if len(history) < 5 or not self.adaptive_stats:
+            return None
+        
+        # Count Ws and Ls in the last 50 results (or all if fewer)
+        recent_history = history[-min(50, len(history)):]
+        w_count = recent_history.count('W')
+        l_count = recent_history.count('L')
+        
+        # Trend analysis
+        if w_count > l_count * 1.5:
+            trend = "Yukselis"
+        elif l_count > w_count * 1.5:
+            trend = "Dusus"
+        else:
+            trend = "Denge"
+        
+        # Counts of the last 3 and last 7 results, from one walk back
+        contexts = []
+        if self.pattern_stats:
+            contexts = self.pattern_index.walk(history.array[-min(self.max_pattern_length, 7):])
+        
+        # Calculate W and L probabilities
+        w_prob = 0
+        l_prob = 0
+        
+        # Weight by trend
+        if trend in self.adaptive_stats:
+            trend_stats = self.adaptive_stats[trend]
+            if trend_stats["total"] >= self.significance_threshold:
+                w_prob += trend_stats["win_prob"] * 0.3  # 30% weight
+                l_prob += trend_stats["loss_prob"] * 0.3
+        
+        # Weight by recent patterns
+        if len(contexts) >= 3:
+            pattern_stats = _pattern_entry(*contexts[2])
+            if pattern_stats["total"] >= self.significance_threshold:
+                w_prob += pattern_stats["win_prob"] * 0.4  # 40% weight
+                l_prob += pattern_stats["loss_prob"] * 0.4
+        
+        # Weight by longer pattern (if available)
+        if len(contexts) >= 7:
+            pattern_stats = _pattern_entry(*contexts[6])
+            if pattern_stats["total"] >= self.significance_threshold:
+                w_prob += pattern_stats["win_prob"] * 0.3  # 30% weight
+                l_prob += pattern_stats["loss_prob"] * 0.3
+        
+        # Make prediction if probability is over 50%
+        if max(w_prob, l_prob) > 50:
+            return {
+                "target": "W" if w_prob > l_prob else "L",
+                "prob": max(w_prob, l_prob),
+                "pattern": f"{trend} + last pattern",
+                "samples": self.adaptive_stats.get(trend, {"total": 0})["total"],
+                "type": "Adaptive"
+            }
+        
+        return None
+    
+    def predict_next(self, history=None):
+        """Makes a prediction with the active algorithm, None if there is none"""
+        if history is None:
+            history = self.results
+        if len(history) < 3:
+            return None
+        
+        if self.active_algorithm == "pattern":
+            return self.predict_next_pattern(history)
+        elif self.active_algorithm == "matrix":
+            return self.predict_next_matrix(history)
+        elif self.active_algorithm == "adaptive":
+            return self.predict_next_adaptive(history)
+        elif self.active_algorithm == "combined":
+            predictions = [p for p in [self.predict_next_pattern(history),
+                                       self.predict_next_matrix(history),
+                                       self.predict_next_adaptive(history)] if p is not None]
+            if not predictions:
+                return None
+            
+            # Return prediction with highest probability and most samples
+            return max(predictions, key=lambda x: (x["prob"], x["samples"]))
+        
+        return None
+    
+    def update_prediction_stats(self, actual):
+        """Scores the current prediction against the result that came next
+
+        Call before adding actual, so the prediction is the one made from the
+        results and statistics that were available before it.
+        """
+        # Ensure we have at least 3 results
+        if len(self.results) < 3:
+            return
+        
+        # Make a prediction
+        predicted = self.predict_next()
+        
+        if predicted is None:
+            return
+        
+        # Add to prediction history
+        self.prediction_history.append((predicted["target"], actual))
+        
+        self.prediction_stats['total_predictions'] += 1
+        
+        if predicted["target"] == actual:
+            self.prediction_stats['correct'] += 1
+            self.prediction_stats['current_win_streak'] += 1
+            self.prediction_stats['current_loss_streak'] = 0
+            if self.prediction_stats['current_win_streak'] > self.prediction_stats['max_win_streak']:
+                self.prediction_stats['max_win_streak'] = self.prediction_stats['current_win_streak']
+        else:
+            self.prediction_stats['incorrect'] += 1
+            self.prediction_stats['current_loss_streak'] += 1
+            self.prediction_stats['current_win_streak'] = 0
+            if self.prediction_stats['current_loss_streak'] > self.prediction_stats['max_loss_streak']:
+                self.prediction_stats['max_loss_streak'] = self.prediction_stats['current_loss_streak']
+        
+        # Add data for loss streak analysis
+        if self.prediction_stats['current_loss_streak'] >= 3:
+            self.loss_streak_predictions.append({
+                "loss_streak": self.prediction_stats['current_loss_streak'],
+                "pattern": predicted["pattern"],
+                "algorithm": predicted["type"],
+                "prob": predicted["prob"]
+            })
+    
+    def accuracy(self):
+        """Prediction accuracy in percent"""
+        if self.prediction_stats['total_predictions'] == 0:
+            return 0
+        return self.prediction_stats['correct'] / self.prediction_stats['total_predictions'] * 100
+    
+    def result_streak(self):
+        """Returns (length, result) of the current run of equal results"""
+        if not self.results:
+            return 0, None
+        values = self.results.array
+        changes = np.flatnonzero(values != values[-1])
+        return len(values) - (int(changes[-1]) + 1 if changes.size else 0), self.results[-1]
+    
+    def search(self, query, latest=1):
+        """Finds a W/L sequence of any length in the whole history
+
+        Returns {"count", "positions", "W", "L"}: the number of occurrences,
+        the sorted start positions of the latest ones (all if latest is None)
+        and how often a W or an L came next.
+        """
+        sequence = ''.join(query.upper().split())
+        if not sequence or sequence.strip('WL'):
+            raise ValueError("search for a sequence of W and L")
+        return self.suffix_index.search(self.results, [RESULT_CODES[result] for result in sequence], latest)
+    
+    def ranked_patterns(self, limit=None):
+        """Patterns with enough samples, strongest first, as (pattern, stats)
+
+        Equal patterns keep the shorter, then the lower coded one first.
+        limit, if given, is the number of patterns to return.
+        """
+        if not self.pattern_stats:
+            return []
+        return self.pattern_stats.ranked(self.significance_threshold, limit)
+    
+    def best_pattern(self):
+        """Returns (pattern, outcome, probability) of the strongest pattern"""
+        ranked = self.ranked_patterns(limit=1)
+        if not ranked:
+            return None
+        
+        pattern, stats = ranked[0]
+        outcome = "W" if stats["win_prob"] > stats["loss_prob"] else "L"
+        return pattern, outcome, max(stats["win_prob"], stats["loss_prob"])
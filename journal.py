@@ -0,0 +1,258 @@
+"""Append-only journal of the window's edits, to restore the session after a crash
+
+    journal = Journal(directory)
+    engine = journal.recover()  # the session as it was left, or None
+    journal.add_results(['W', 'L'])
+    journal.delete_last_result()
+    journal.settings(engine)
+    journal.snapshot(engine)  # the whole session, written in the background
+    journal.close()
+
+Edits are bytes: W or L for an added result, D for a deleted one, C for a
+clear, and S with a line of JSON for changed settings. They are appended
+to a buffer, and a background thread writes the buffer out and fsyncs it
+every SYNC_SECONDS, so an edit costs no disk access and a crash loses at
+most that much.
+
+A snapshot is a session file of the whole state, from storage.save_session.
+Files are numbered by generation: journal-N.wlj holds the edits made after
+snapshot-N.wls. snapshot() starts generation N+1 at once and writes its
+snapshot in the background, and the files of older generations are deleted
+once it is on disk. recover() loads the newest snapshot that is complete and
+replays the journals from its generation on, adding each run of results in
+one add_results call, which scores what the clicks did one by one (see
+engine.same_loss_streak_records for the one difference).
+"""
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from engine import AnalysisEngine
+from storage import load_session, save_session
+
+SYNC_SECONDS = 0.5  # longest an edit waits to be written and synced
+COMPACT_EDITS = 100000  # edits in the journal that call for a snapshot
+_FILE_NAME = re.compile(r"(snapshot|journal)-(\d+)\.(?:wls|wlj)$")
+_SETTINGS = ("significance_threshold", "max_pattern_length", "active_algorithm", "trend_windows", "half_life",
+             "retention")
+
+
+def _fsync_directory(directory):
+    # Makes a rename durable; not possible on every platform
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def replay(engine, data):
+    """Applies journal bytes to engine
+
+    Returns (length, edits): the length of data up to its last complete
+    edit, which is where a crash may have cut it, and the edits applied.
+    """
+    values = np.frombuffer(data, dtype=np.uint8)
+    marks = np.flatnonzero((values != ord('W')) & (values != ord('L'))).tolist()
+    position = 0
+    edits = 0
+    for mark in marks + [len(values)]:
+        if mark < position:
+            continue  # inside a settings record
+
+        # The results before the next edit of another kind, in one batch
+        if mark == position + 1:
+            engine.add_result(chr(values[position]))
+            edits += 1
+        elif mark > position:
+            engine.add_results((values[position:mark] == ord('W')).astype(np.uint8))
+            edits += mark - position
+        if mark == len(values):
+            position = mark
+            break
+
+        kind = values[mark]
+        if kind == ord('D'):
+            engine.delete_last_result()
+        elif kind == ord('C'):
+            engine.clear()
+        elif kind == ord('S'):
+            end = data.find(b"\n", mark)
+            if end < 0:
+                position = mark
+                break
+            settings = json.loads(data[mark + 1:end])
+            for name in _SETTINGS:
+                setattr(engine, name, settings[name])
+            engine.trim()
+            engine.analyze()
+            mark = end
+        else:
+            position = mark
+            break  # not an edit, the rest cannot be trusted
+        edits += 1
+        position = mark + 1
+    return position, edits
+
+
+class Journal:
+    """Journal and snapshots of one session in directory, see the module docstring
+
+    Only one Journal may use a directory at a time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.generation = max(self._generations("snapshot") + self._generations("journal"), default=0)
+        self.edits = 0  # edits since the last snapshot
+        self.error = None  # the last error of the writer thread, until taken
+        self.files = {}  # generation -> open journal file
+        self.tasks = []  # ["edits", generation, bytearray] or ["snapshot", generation, engine], oldest first
+        self.closing = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self.thread.start()
+
+    def _path(self, kind, generation):
+        return os.path.join(self.directory, f"{kind}-{generation}.{'wls' if kind == 'snapshot' else 'wlj'}")
+
+    def _generations(self, kind):
+        generations = []
+        for name in os.listdir(self.directory):
+            match = _FILE_NAME.match(name)
+            if match and match.group(1) == kind:
+                generations.append(int(match.group(2)))
+        return sorted(generations)
+
+    def recover(self):
+        """The journaled session, or None if nothing was journaled yet
+
+        Raises ValueError if no complete snapshot the journals build on is left.
+        """
+        engine = None
+        snapshots = self._generations("snapshot")
+        for generation in reversed(snapshots):
+            try:
+                engine = load_session(self._path("snapshot", generation))
+            except (OSError, ValueError, KeyError):
+                continue
+            base = generation
+            break
+
+        journals = self._generations("journal")
+        if engine is None:
+            if snapshots or (journals and journals[0] != 0):
+                raise ValueError("the autosave has no complete snapshot left")
+            if not journals:
+                return None
+            engine = AnalysisEngine()
+            base = 0
+
+        # Drop what a crash cut off at the end, so new edits follow complete ones
+        for generation in journals:
+            if generation < base:
+                continue
+            path = self._path("journal", generation)
+            with open(path, 'rb') as file:
+                data = file.read()
+            length, edits = replay(engine, data)
+            self.edits += edits
+            if length < len(data):
+                os.truncate(path, length)
+        return engine
+
+    def _append(self, data, edits):
+        with self.condition:
+            if self.tasks and self.tasks[-1][0] == "edits" and self.tasks[-1][1] == self.generation:
+                self.tasks[-1][2].extend(data)
+            else:
+                self.tasks.append(["edits", self.generation, bytearray(data)])
+            self.edits += edits
+
+    def add_results(self, results):
+        """Journals results added, W/L strings"""
+        self._append(''.join(results).encode(), len(results))
+
+    def delete_last_result(self):
+        self._append(b"D", 1)
+
+    def clear(self):
+        self._append(b"C", 1)
+
+    def settings(self, engine):
+        """Journals the engine's settings after one of them changed"""
+        settings = {name: getattr(engine, name) for name in _SETTINGS}
+        self._append(b"S" + json.dumps(settings).encode() + b"\n", 1)
+
+    def snapshot(self, engine):
+        """Starts a new generation from a copy of engine, written in the background"""
+        engine = engine.copy()
+        with self.condition:
+            self.generation += 1
+            self.tasks.append(["snapshot", self.generation, engine])
+            self.edits = 0
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.closing:
+                    self.condition.wait(SYNC_SECONDS)
+                tasks, self.tasks = self.tasks, []
+                closing = self.closing
+            try:
+                self._write(tasks)
+            except OSError as e:
+                self.error = e
+            if closing:
+                break
+        for file in self.files.values():
+            file.close()
+
+    def _write(self, tasks):
+        # Edits first, each into its generation's journal, then the newest snapshot
+        written = set()
+        for kind, generation, payload in tasks:
+            if kind == "edits":
+                if generation not in self.files:
+                    self.files[generation] = open(self._path("journal", generation), 'ab')
+                self.files[generation].write(payload)
+                written.add(generation)
+        for generation in written:
+            self.files[generation].flush()
+            os.fsync(self.files[generation].fileno())
+
+        snapshots = [task for task in tasks if task[0] == "snapshot"]
+        if not snapshots:
+            return
+        _, generation, engine = snapshots[-1]
+        path = self._path("snapshot", generation)
+        save_session(path, engine)
+        with open(path, 'rb') as file:
+            os.fsync(file.fileno())
+        _fsync_directory(self.directory)
+
+        # The new snapshot and the journals after it hold everything now
+        for name in os.listdir(self.directory):
+            match = _FILE_NAME.match(name.removesuffix(".tmp"))
+            if match and int(match.group(2)) < generation:
+                old_generation = int(match.group(2))
+                if old_generation in self.files:
+                    self.files.pop(old_generation).close()
+                os.remove(os.path.join(self.directory, name))
+
+    def close(self):
+        """Writes out everything journaled and stops the writer thread"""
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        self.thread.join()
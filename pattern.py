@@ -1,35 +1,314 @@
+import os
 import sys
+import json
+import sqlite3
+import time
 import itertools
-import numpy as np
+import contextlib
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, 
                            QWidget, QLabel, QTextEdit, QScrollArea, QTabWidget, QGridLayout, 
                            QFrame, QStatusBar, QTableWidget, QTableWidgetItem, QComboBox,
-                           QCheckBox, QSpinBox, QFileDialog, QProgressBar, QSplitter)
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QFont, QColor, QPalette
+                           QCheckBox, QSpinBox, QFileDialog, QProgressBar, QSplitter,
+                           QLineEdit, QTableView, QHeaderView, QAbstractItemView, QInputDialog)
+from PyQt5.QtCore import (Qt, QSize, QTimer, QAbstractTableModel, QModelIndex, QThread,
+                          QObject, QLockFile, pyqtSignal)
+from PyQt5.QtGui import QFont, QColor, QPalette, QPainter
+from PyQt5.QtNetwork import QLocalSocket, QTcpSocket
+
+import cli
+from database import FLUSH_SECONDS, STORE_EXTENSION, SessionStore
+from diagnostics import timings
+from engine import ALGORITHMS, AnalysisEngine, MAX_PATTERN_LENGTH, MIN_RETENTION, format_count
+from journal import COMPACT_EDITS, Journal
+from server import DEFAULT_ADDRESS, parse_address
+from storage import (SESSION_EXTENSION, load_session, read_results, save_session,
+                     write_results)
+
+FILE_FILTERS = "WL Sessions (*.wls);;WL Session Stores (*.wldb);;Text Files (*.txt);;All Files (*)"
+RECENT_RESULTS = 20  # cells in the recent results grid, 10 per row
+PATTERN_ROWS = 254  # rows in the pattern analysis, every pattern up to length 7
+SEARCH_IN_BACKGROUND = 100000  # results above which the search index is built by a worker
+AUTOSAVE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".wl", "autosave")  # journal of the window's session
+
+class ResultHistoryModel(QAbstractTableModel):
+    """Table model showing the result history ten results per row
+    
+    Cells are read straight from the engine's history, so the view only lays
+    out the rows on screen, and sync() reports appended or deleted results as
+    row changes instead of rebuilding the whole view.
+    """
+    COLUMNS = 10
+    COLORS = {"W": QColor("#4CAF50"), "L": QColor("#F44336")}
+    HIGHLIGHT = QColor("#2d3154")
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results = ()
+        self.size = 0
+        self.start = 0  # results.start as last shown
+        self.highlight = range(0)
+    
+    def rows(self, size):
+        return (size + self.COLUMNS - 1) // self.COLUMNS
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows(self.size)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.COLUMNS
+    
+    def data(self, index, role=Qt.DisplayRole):
+        i = index.row() * self.COLUMNS + index.column()
+        if not index.isValid() or i >= self.size:
+            return None
+        
+        if role == Qt.DisplayRole:
+            return self.results[i]
+        if role == Qt.ForegroundRole:
+            return self.COLORS[self.results[i]]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.BackgroundRole and i in self.highlight:
+            return self.HIGHLIGHT
+        return None
+    
+    def set_highlight(self, start, length):
+        """Highlights results start .. start + length - 1, such as a search match"""
+        old, self.highlight = self.highlight, range(start, start + length)
+        for marked in (old, self.highlight):
+            if marked:
+                self.dataChanged.emit(self.index(marked[0] // self.COLUMNS, 0),
+                                      self.index(marked[-1] // self.COLUMNS, self.COLUMNS - 1))
+    
+    def sync(self, results):
+        """Brings the model up to date with a result history"""
+        size = len(results)
+        if results is not self.results:
+            self.beginResetModel()
+            self.results = results
+            self.size = size
+            self.start = results.start
+            self.highlight = range(0)
+            self.endResetModel()
+            return
+        
+        old_size = self.size
+        shift = results.start - self.start
+        if size == old_size and not shift:
+            return
+        
+        old_rows, rows = self.rows(old_size), self.rows(size)
+        if rows > old_rows:
+            self.beginInsertRows(QModelIndex(), old_rows, rows - 1)
+            self.size = size
+            self.endInsertRows()
+        elif rows < old_rows:
+            self.beginRemoveRows(QModelIndex(), rows, old_rows - 1)
+            self.size = size
+            self.endRemoveRows()
+        else:
+            self.size = size
+        
+        # The row where the old and new histories part may have changed as
+        # well, or every row once evicted results moved the rest forward
+        row = min(old_size, size) // self.COLUMNS
+        if shift:
+            self.start = results.start
+            self.highlight = range(self.highlight.start - shift, self.highlight.stop - shift)
+            row = 0
+        if row < rows:
+            self.dataChanged.emit(self.index(row, 0), self.index(rows - 1 if shift else row, self.COLUMNS - 1))
+
+class ResultCell(QWidget):
+    """One square of the recent results grid
+    
+    Cells are created once and repainted with precomputed colours, so showing
+    a new result does not create widgets or parse stylesheets.
+    """
+    COLORS = {"W": QColor("#2e7d32"), "L": QColor("#c62828")}
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.result = ""
+        self.setFixedSize(18, 18)
+        self.hide()
+    
+    def set_result(self, result):
+        """Shows a result, or hides the cell for an empty one"""
+        if result == self.result:
+            return
+        self.result = result
+        self.setVisible(bool(result))
+        self.update()
+    
+    def paintEvent(self, event):
+        if not self.result:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.COLORS[self.result])
+        painter.drawRoundedRect(self.rect(), 2, 2)
+        
+        font = painter.font()
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(Qt.white)
+        painter.drawText(self.rect(), Qt.AlignCenter, self.result)
+
+class PredictionPanel:
+    """View-model for the CURRENT PREDICTION panel
+    
+    Keeps direct references to the value labels and remembers what each one
+    shows, so an update only writes the texts and styles that changed.
+    """
+    ALGORITHM_NAMES = {
+        "pattern": "Pattern Analysis",
+        "matrix": "Matrix Analysis",
+        "adaptive": "Adaptive Analysis",
+        "combined": "Combined Analysis"
+    }
+    RECOMMEND_STYLES = {
+        "W": "color: #4CAF50; font-size: 12pt; font-weight: bold;",
+        "L": "color: #F44336; font-size: 12pt; font-weight: bold;",
+        None: "color: #c5cee0; font-size: 12pt; font-weight: bold;"
+    }
+    
+    def __init__(self, algorithm, pattern, success, recommendation):
+        self.algorithm = algorithm
+        self.pattern = pattern
+        self.success = success
+        self.recommendation = recommendation
+        self.shown = {}
+    
+    def set(self, label, text, style=None):
+        if self.shown.get(label) == (text, style):
+            return
+        label.setText(text)
+        if style is not None:
+            label.setStyleSheet(style)
+        self.shown[label] = (text, style)
+    
+    def set_algorithm(self, algorithm):
+        self.set(self.algorithm, self.ALGORITHM_NAMES.get(algorithm, "Pattern Analysis"))
+    
+    def set_prediction(self, prediction):
+        self.set(self.pattern, prediction["pattern"])
+        self.set(self.success, f"{prediction['prob']:.1f}% ({format_count(prediction['samples'])} samples)")
+        self.set(self.recommendation, prediction["target"], self.RECOMMEND_STYLES[prediction["target"]])
+    
+    def clear(self, recommendation="-"):
+        self.set(self.pattern, "-")
+        self.set(self.success, "-")
+        self.set(self.recommendation, recommendation, self.RECOMMEND_STYLES[None])
+
+class WorkerCancelled(Exception):
+    """Raised from a worker's progress callback once Cancel was pressed"""
+
+class AnalysisWorker(QThread):
+    """Runs a bulk operation on a copy of the engine in the background
+    
+    task(engine, reporter) works on the copy and returns a status message;
+    reporter(stage) makes a progress(done, total) callback for one stage.
+    The task is timed as diagnostics operation `operation`.
+    The window keeps its own engine until the copy is handed back through
+    `done`, so a cancelled or failed task leaves the session as it was.
+    """
+    progress = pyqtSignal(str, int)  # stage, per mille done
+    done = pyqtSignal(object, str)  # engine copy with the work applied, status message
+    failed = pyqtSignal(str)
+    
+    def __init__(self, engine, task, operation, parent=None):
+        super().__init__(parent)
+        self.engine = engine.copy()
+        self.task = task
+        self.operation = operation
+        self.cancelled = False
+    
+    def cancel(self):
+        # Qt forgets interruption requests once the thread ends, so remember it here too
+        self.cancelled = True
+        self.requestInterruption()
+    
+    def reporter(self, stage):
+        def progress(done, total):
+            if self.isInterruptionRequested():
+                raise WorkerCancelled()
+            self.progress.emit(stage, done * 1000 // max(total, 1))
+        return progress
+    
+    def run(self):
+        try:
+            with timings.operation(self.operation):
+                message = self.task(self.engine, self.reporter)
+        except WorkerCancelled:
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.done.emit(self.engine, message)
+
+class FeedClient(QObject):
+    """Connection of the window to a feed server (server.py), in the GUI thread
+    
+    Requests go out as JSON lines; the replies and events that arrive
+    together are handed over as one list so a busy feed is shown in batches.
+    """
+    connected = pyqtSignal()
+    messages = pyqtSignal(list)
+    failed = pyqtSignal(str)
+    disconnected = pyqtSignal()
+    
+    def __init__(self, address, parent=None):
+        super().__init__(parent)
+        self.kind, self.where = parse_address(address)
+        self.socket = QTcpSocket(self) if self.kind == "tcp" else QLocalSocket(self)
+        self.socket.connected.connect(self.connected)
+        self.socket.disconnected.connect(self.disconnected)
+        self.socket.errorOccurred.connect(lambda error: self.failed.emit(self.socket.errorString()))
+        self.socket.readyRead.connect(self.read_messages)
+    
+    def open(self):
+        # A local socket may connect at once, so only once the signals are connected
+        if self.kind == "tcp":
+            self.socket.connectToHost(*self.where)
+        else:
+            self.socket.connectToServer(self.where)
+    
+    def send(self, request):
+        self.socket.write(json.dumps(request).encode() + b"\n")
+    
+    def read_messages(self):
+        messages = []
+        while self.socket.canReadLine():
+            messages.append(json.loads(bytes(self.socket.readLine())))
+        if messages:
+            self.messages.emit(messages)
+    
+    def close(self):
+        # Without the disconnected signal, the window has already let go
+        self.socket.blockSignals(True)
+        self.socket.abort()
 
 class ModernBaccaratAnalyzer(QMainWindow):
-    def __init__(self):
+    def __init__(self, autosave_directory=None):
         super().__init__()
-        self.results = []
-        self.pattern_stats = {}
-        self.matrix_stats = {}
-        self.adaptive_stats = {}
-        self.prediction_stats = {
-            'total_predictions': 0,
-            'correct': 0,
-            'incorrect': 0,
-            'current_win_streak': 0,
-            'max_win_streak': 0,
-            'current_loss_streak': 0,
-            'max_loss_streak': 0
-        }
-        self.prediction_history = []  
-        self.loss_streak_predictions = []  
-        self.significance_threshold = 5  
-        self.active_algorithm = "pattern"  
+        self.engine = AnalysisEngine()
+        self.dirty_views = set()  # analysis views waiting to be rendered
+        self.render_scheduled = False
+        self.worker = None  # AnalysisWorker of the running bulk operation
+        self.diagnostics_updates = None  # timings.updates when the diagnostics were last rendered
+        self.feed = None  # FeedClient while attached to a feed server
+        self.feed_session = None
+        self.feed_pending = None  # results pushed while a worker runs on a copy of the engine
+        self.store = None  # SessionStore recording the session as it changes
+        self.journal = None  # Journal autosaving the session, see journal.py
+        self.journal_lock = None
+        message = self.open_journal(autosave_directory) if autosave_directory else None
         self.initUI()
+        if message:
+            self.statusBar.showMessage(message)
         
     def initUI(self):
         # Set main window properties
@@ -78,7 +357,7 @@ class ModernBaccaratAnalyzer(QMainWindow):
                 color: white;
                 font-weight: bold;
             }
-            QComboBox, QSpinBox {
+            QComboBox, QSpinBox, QLineEdit {
                 background-color: #16182c;
                 border: 1px solid #2d3154;
                 border-radius: 3px;
@@ -97,7 +376,7 @@ class ModernBaccaratAnalyzer(QMainWindow):
                 background-color: #1d203a;
                 width: 16px;
             }
-            QTextEdit {
+            QTextEdit, QTableView {
                 background-color: #16182c;
                 border: 1px solid #2d3154;
                 border-radius: 3px;
@@ -167,6 +446,7 @@ class ModernBaccaratAnalyzer(QMainWindow):
         
         self.algo_combo = QComboBox()
         self.algo_combo.addItems(["Pattern Analysis", "Matrix Analysis", "Adaptive Analysis", "Combined Analysis"])
+        self.algo_combo.setCurrentIndex(ALGORITHMS.index(self.engine.active_algorithm))
         self.algo_combo.currentIndexChanged.connect(self.change_algorithm)
         left_layout.addWidget(self.algo_combo)
         
@@ -176,7 +456,7 @@ class ModernBaccaratAnalyzer(QMainWindow):
         
         self.sample_spin = QSpinBox()
         self.sample_spin.setRange(1, 100)
-        self.sample_spin.setValue(5)
+        self.sample_spin.setValue(self.engine.significance_threshold)
         self.sample_spin.valueChanged.connect(self.update_significance_threshold)
         left_layout.addWidget(self.sample_spin)
         
@@ -185,8 +465,9 @@ class ModernBaccaratAnalyzer(QMainWindow):
         left_layout.addWidget(pattern_label)
         
         self.pattern_spin = QSpinBox()
-        self.pattern_spin.setRange(3, 7)
-        self.pattern_spin.setValue(5)
+        self.pattern_spin.setRange(3, MAX_PATTERN_LENGTH)
+        self.pattern_spin.setValue(self.engine.max_pattern_length)
+        self.pattern_spin.valueChanged.connect(self.update_pattern_length)
         left_layout.addWidget(self.pattern_spin)
         
         # Win/Loss buttons
@@ -217,26 +498,26 @@ class ModernBaccaratAnalyzer(QMainWindow):
         self.bulk_input.setPlaceholderText("Enter W L W W L L...")
         left_layout.addWidget(self.bulk_input)
         
-        bulk_button = QPushButton('ADD BULK RESULTS')
-        bulk_button.setObjectName("add")
-        bulk_button.setFixedHeight(24)
-        bulk_button.clicked.connect(self.add_bulk_results)
-        left_layout.addWidget(bulk_button)
+        self.bulk_button = QPushButton('ADD BULK RESULTS')
+        self.bulk_button.setObjectName("add")
+        self.bulk_button.setFixedHeight(24)
+        self.bulk_button.clicked.connect(self.add_bulk_results)
+        left_layout.addWidget(self.bulk_button)
         
         # Control buttons
         control_layout1 = QHBoxLayout()
         control_layout1.setSpacing(8)
         
-        delete_button = QPushButton('DELETE')
-        delete_button.setFixedHeight(24)
-        delete_button.clicked.connect(self.delete_last_result)
+        self.delete_button = QPushButton('DELETE')
+        self.delete_button.setFixedHeight(24)
+        self.delete_button.clicked.connect(self.delete_last_result)
         
-        clear_button = QPushButton('CLEAR')
-        clear_button.setFixedHeight(24)
-        clear_button.clicked.connect(self.clear_all_results)
+        self.clear_button = QPushButton('CLEAR')
+        self.clear_button.setFixedHeight(24)
+        self.clear_button.clicked.connect(self.clear_all_results)
         
-        control_layout1.addWidget(delete_button)
-        control_layout1.addWidget(clear_button)
+        control_layout1.addWidget(self.delete_button)
+        control_layout1.addWidget(self.clear_button)
         
         left_layout.addLayout(control_layout1)
         
@@ -244,25 +525,37 @@ class ModernBaccaratAnalyzer(QMainWindow):
         file_layout = QHBoxLayout()
         file_layout.setSpacing(8)
         
-        load_button = QPushButton('LOAD')
-        load_button.setFixedHeight(24)
-        load_button.clicked.connect(self.load_results)
+        self.load_button = QPushButton('LOAD')
+        self.load_button.setFixedHeight(24)
+        self.load_button.clicked.connect(self.load_results)
         
-        save_button = QPushButton('SAVE')
-        save_button.setFixedHeight(24)
-        save_button.clicked.connect(self.save_results)
+        self.save_button = QPushButton('SAVE')
+        self.save_button.setFixedHeight(24)
+        self.save_button.clicked.connect(self.save_results)
         
-        file_layout.addWidget(load_button)
-        file_layout.addWidget(save_button)
+        file_layout.addWidget(self.load_button)
+        file_layout.addWidget(self.save_button)
         
         left_layout.addLayout(file_layout)
         
-        # Progress bar
+        # Progress bar, with a cancel button while a bulk operation runs
+        progress_layout = QHBoxLayout()
+        progress_layout.setSpacing(8)
+        
         self.progress_bar = QProgressBar()
         self.progress_bar.setFixedHeight(12)
         self.progress_bar.setTextVisible(False)
+        self.progress_bar.setRange(0, 1000)
         self.progress_bar.setValue(0)
-        left_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.progress_bar)
+        
+        self.cancel_button = QPushButton('CANCEL')
+        self.cancel_button.setFixedHeight(18)
+        self.cancel_button.clicked.connect(self.cancel_worker)
+        self.cancel_button.hide()
+        progress_layout.addWidget(self.cancel_button)
+        
+        left_layout.addLayout(progress_layout)
         
         # Add left panel to main layout
         main_layout.addWidget(left_panel)
@@ -295,10 +588,10 @@ class ModernBaccaratAnalyzer(QMainWindow):
         
         # Algorithm label and value
         algo_label_pred = QLabel("Algorithm:")
-        algo_value_pred = QLabel("Pattern Analysis")
-        algo_value_pred.setStyleSheet("color: #c5cee0;")
+        self.algo_value_pred = QLabel("Pattern Analysis")
+        self.algo_value_pred.setStyleSheet("color: #c5cee0;")
         prediction_grid.addWidget(algo_label_pred, 0, 0)
-        prediction_grid.addWidget(algo_value_pred, 0, 1)
+        prediction_grid.addWidget(self.algo_value_pred, 0, 1)
         
         # Pattern label and value
         pattern_label_pred = QLabel("Pattern:")
@@ -322,6 +615,8 @@ class ModernBaccaratAnalyzer(QMainWindow):
         prediction_grid.addWidget(self.recommend_value_pred, 3, 1)
         
         prediction_layout_inner.addLayout(prediction_grid)
+        self.prediction_panel = PredictionPanel(self.algo_value_pred, self.pattern_value_pred,
+                                                self.success_value_pred, self.recommend_value_pred)
         prediction_layout.addWidget(prediction_frame)
         
         # Recent results box
@@ -337,6 +632,11 @@ class ModernBaccaratAnalyzer(QMainWindow):
         self.recent_grid.setSpacing(5)
         recent_layout.addLayout(self.recent_grid)
         
+        # A fixed pool of result cells that are repainted, never recreated
+        self.recent_cells = [ResultCell() for _ in range(RECENT_RESULTS)]
+        for i, cell in enumerate(self.recent_cells):
+            self.recent_grid.addWidget(cell, i // 10, i % 10)
+        
         prediction_layout.addWidget(recent_frame)
         
         # Stats box
@@ -406,16 +706,43 @@ class ModernBaccaratAnalyzer(QMainWindow):
         history_header.setObjectName("header")
         history_inner_layout.addWidget(history_header)
         
-        self.results_display = QTextEdit()
-        self.results_display.setReadOnly(True)
-        self.results_display.setStyleSheet("border: none;")
+        self.history_model = ResultHistoryModel(self)
+        self.results_display = QTableView()
+        self.results_display.setModel(self.history_model)
+        self.results_display.setStyleSheet("border: none; font-weight: bold;")
+        self.results_display.horizontalHeader().hide()
+        self.results_display.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.results_display.verticalHeader().hide()
+        self.results_display.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.results_display.verticalHeader().setDefaultSectionSize(22)
+        self.results_display.setShowGrid(False)
+        self.results_display.setSelectionMode(QAbstractItemView.NoSelection)
+        self.results_display.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_display.setFocusPolicy(Qt.NoFocus)
         history_inner_layout.addWidget(self.results_display)
         
+        # Sequence search over the whole history
+        search_layout = QHBoxLayout()
+        search_layout.setSpacing(6)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Find a sequence, e.g. W W L W L")
+        self.search_input.returnPressed.connect(self.search_history)
+        search_layout.addWidget(self.search_input)
+        self.search_button = QPushButton("FIND")
+        self.search_button.clicked.connect(self.search_history)
+        search_layout.addWidget(self.search_button)
+        history_inner_layout.addLayout(search_layout)
+        
+        self.search_result = QLabel("")
+        self.search_result.setWordWrap(True)
+        self.search_result.setStyleSheet("color: #c5cee0;")
+        history_inner_layout.addWidget(self.search_result)
+        
         history_layout.addWidget(history_frame)
         
         # Tab 3: Analysis
-        analysis_tab = QWidget()
-        analysis_layout = QVBoxLayout(analysis_tab)
+        self.analysis_tab = QWidget()
+        analysis_layout = QVBoxLayout(self.analysis_tab)
         analysis_layout.setContentsMargins(8, 8, 8, 8)
         
         analysis_scroll = QScrollArea()
@@ -481,10 +808,126 @@ class ModernBaccaratAnalyzer(QMainWindow):
         analysis_scroll.setWidget(analysis_content)
         analysis_layout.addWidget(analysis_scroll)
         
+        # Tab 4: Settings
+        settings_tab = QWidget()
+        settings_layout = QVBoxLayout(settings_tab)
+        settings_layout.setContentsMargins(8, 8, 8, 8)
+        
+        settings_frame = QFrame()
+        settings_frame.setObjectName("content")
+        self.settings_grid = QGridLayout(settings_frame)
+        self.settings_grid.setVerticalSpacing(6)
+        self.settings_grid.setHorizontalSpacing(10)
+        
+        settings_header = QLabel("SETTINGS")
+        settings_header.setObjectName("header")
+        self.settings_grid.addWidget(settings_header, 0, 0, 1, 2)
+        
+        # Trend window sizes used by the adaptive analysis
+        trend_windows_label = QLabel("Trend Windows:")
+        self.trend_windows_input = QLineEdit(' '.join(str(size) for size in self.engine.trend_windows))
+        self.trend_windows_input.setPlaceholderText("e.g. 10 20 50")
+        self.trend_windows_input.editingFinished.connect(self.update_trend_windows)
+        self.settings_grid.addWidget(trend_windows_label, 1, 0)
+        self.settings_grid.addWidget(self.trend_windows_input, 1, 1)
+        
+        # Half-life of the pattern statistics, Off counts every result alike
+        half_life_label = QLabel("Pattern Half-life:")
+        self.half_life_spin = QSpinBox()
+        self.half_life_spin.setRange(0, 100000)
+        self.half_life_spin.setSpecialValueText("Off")
+        self.half_life_spin.setSuffix(" results")
+        self.half_life_spin.setKeyboardTracking(False)
+        self.half_life_spin.setValue(self.engine.half_life)
+        self.half_life_spin.valueChanged.connect(self.update_half_life)
+        self.settings_grid.addWidget(half_life_label, 2, 0)
+        self.settings_grid.addWidget(self.half_life_spin, 2, 1)
+        
+        # Most results kept, the oldest are evicted from the statistics
+        retention_label = QLabel("Max History:")
+        self.retention_spin = QSpinBox()
+        self.retention_spin.setRange(MIN_RETENTION - 1, 100000000)
+        self.retention_spin.setSpecialValueText("Unlimited")
+        self.retention_spin.setSuffix(" results")
+        self.retention_spin.setSingleStep(100)
+        self.retention_spin.setKeyboardTracking(False)
+        self.retention_spin.setValue(self.engine.retention or MIN_RETENTION - 1)
+        self.retention_spin.valueChanged.connect(self.update_retention)
+        self.settings_grid.addWidget(retention_label, 3, 0)
+        self.settings_grid.addWidget(self.retention_spin, 3, 1)
+        
+        # A feed server session to follow; results then go through the server
+        feed_address_label = QLabel("Feed Server:")
+        self.feed_address_input = QLineEdit(DEFAULT_ADDRESS)
+        self.feed_address_input.setPlaceholderText("host:port or socket path")
+        self.settings_grid.addWidget(feed_address_label, 4, 0)
+        self.settings_grid.addWidget(self.feed_address_input, 4, 1)
+        
+        feed_session_label = QLabel("Feed Session:")
+        feed_session_layout = QHBoxLayout()
+        feed_session_layout.setSpacing(6)
+        self.feed_session_input = QLineEdit("table-1")
+        self.feed_session_input.returnPressed.connect(self.toggle_feed)
+        feed_session_layout.addWidget(self.feed_session_input)
+        self.feed_button = QPushButton('ATTACH')
+        self.feed_button.setFixedHeight(24)
+        self.feed_button.clicked.connect(self.toggle_feed)
+        feed_session_layout.addWidget(self.feed_button)
+        self.settings_grid.addWidget(feed_session_label, 5, 0)
+        self.settings_grid.addLayout(feed_session_layout, 5, 1)
+        
+        settings_layout.addWidget(settings_frame)
+        
+        # Rolling stage timings, with export and a profiler capture
+        diagnostics_frame = QFrame()
+        diagnostics_frame.setObjectName("content")
+        diagnostics_layout = QVBoxLayout(diagnostics_frame)
+        
+        diagnostics_header = QLabel("DIAGNOSTICS")
+        diagnostics_header.setObjectName("header")
+        diagnostics_layout.addWidget(diagnostics_header)
+        
+        self.diagnostics_text = QTextEdit()
+        self.diagnostics_text.setReadOnly(True)
+        self.diagnostics_text.setStyleSheet("border: none;")
+        diagnostics_layout.addWidget(self.diagnostics_text)
+        
+        diagnostics_buttons = QHBoxLayout()
+        diagnostics_buttons.setSpacing(6)
+        
+        export_button = QPushButton('EXPORT')
+        export_button.setFixedHeight(24)
+        export_button.clicked.connect(self.export_diagnostics)
+        diagnostics_buttons.addWidget(export_button)
+        
+        reset_button = QPushButton('RESET')
+        reset_button.setFixedHeight(24)
+        reset_button.clicked.connect(self.reset_diagnostics)
+        diagnostics_buttons.addWidget(reset_button)
+        
+        self.profile_spin = QSpinBox()
+        self.profile_spin.setRange(1, 1000)
+        self.profile_spin.setValue(20)
+        self.profile_spin.setSuffix(" ops")
+        self.profile_spin.setToolTip("Operations to capture with the profiler")
+        diagnostics_buttons.addWidget(self.profile_spin)
+        
+        self.profile_button = QPushButton('PROFILE')
+        self.profile_button.setFixedHeight(24)
+        self.profile_button.clicked.connect(self.start_profile)
+        diagnostics_buttons.addWidget(self.profile_button)
+        
+        diagnostics_layout.addLayout(diagnostics_buttons)
+        settings_layout.addWidget(diagnostics_frame)
+        
         # Add tabs to the tab widget
         self.tab_widget.addTab(prediction_tab, "PREDICTION")
         self.tab_widget.addTab(history_tab, "HISTORY")
-        self.tab_widget.addTab(analysis_tab, "ANALYSIS")
+        self.tab_widget.addTab(self.analysis_tab, "ANALYSIS")
+        self.tab_widget.addTab(settings_tab, "SETTINGS")
+        self.settings_tab = settings_tab
+        self.tab_widget.currentChanged.connect(lambda index: self.render_analysis())
+        self.tab_widget.currentChanged.connect(lambda index: self.render_diagnostics())
         
         # Create a layout for the right panel
         right_layout = QVBoxLayout(right_panel)
@@ -500,6 +943,27 @@ class ModernBaccaratAnalyzer(QMainWindow):
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage("Ready. Click 'WIN' or 'LOSS' to start recording results.")
         
+        # Latency of the last operation
+        self.timing_label = QLabel("")
+        self.timing_label.setStyleSheet("color: #6c7293;")
+        self.statusBar.addPermanentWidget(self.timing_label)
+        
+        # Background operations are timed off the main thread, so pick up
+        # their timings and finished profiles now and then
+        self.diagnostics_timer = QTimer(self)
+        self.diagnostics_timer.timeout.connect(self.poll_diagnostics)
+        self.diagnostics_timer.start(1000)
+        
+        # Results recorded to a session store are written in batches
+        self.store_timer = QTimer(self)
+        self.store_timer.timeout.connect(self.flush_store)
+        self.store_timer.start(int(FLUSH_SECONDS * 1000))
+        
+        # The autosave journal is compacted into a snapshot once it grows long
+        self.journal_timer = QTimer(self)
+        self.journal_timer.timeout.connect(self.check_journal)
+        self.journal_timer.start(1000)
+        
         # Initialize display
         self.update_display()
         self.show()
@@ -507,391 +971,68 @@ class ModernBaccaratAnalyzer(QMainWindow):
     def change_algorithm(self, index):
         # Changes the active prediction algorithm
         algorithms = ["pattern", "matrix", "adaptive", "combined"]
-        self.active_algorithm = algorithms[index]
+        self.engine.active_algorithm = algorithms[index]
+        self.journal_settings()
         self.statusBar.showMessage(f"Algorithm changed to: {self.algo_combo.currentText()}")
         self.update_prediction()
 
     def update_significance_threshold(self, value):
         """Updates the minimum sample threshold"""
-        self.significance_threshold = value
+        self.engine.significance_threshold = value
+        self.journal_settings()
         self.statusBar.showMessage(f"Minimum sample size updated to {value}")
         self.analyze_data()
     
-    def predict_next_pattern(self, history):
-        """Makes pattern-based prediction"""
-        max_pattern_length = self.pattern_spin.value()
-        if len(history) < 3 or not self.pattern_stats:
-            return None
-        
-        best_strat = None
-        max_prob = 0
-        max_samples = 0
-        
-        # Check from longest pattern
-        for length in range(min(max_pattern_length, len(history)), 0, -1):
-            current_pattern = ''.join(history[-length:])
-            
-            if current_pattern in self.pattern_stats:
-                stats = self.pattern_stats[current_pattern]
-                if stats["total"] >= self.significance_threshold:
-                    current_prob = max(stats["win_prob"], stats["loss_prob"])
-                    if current_prob > max_prob or (current_prob == max_prob and stats["total"] > max_samples):
-                        max_prob = current_prob
-                        max_samples = stats["total"]
-                        best_strat = {
-                            "target": "W" if stats["win_prob"] > stats["loss_prob"] else "L",
-                            "prob": current_prob,
-                            "pattern": current_pattern,
-                            "samples": stats["total"],
-                            "type": "Pattern"
-                        }
-        
-        return best_strat
-    
-    def predict_next_matrix(self, history):
-        # Makes matrix-based prediction
-        if len(history) < 10 or not self.matrix_stats:
-            return None
-        
-        # Last 10 results' matrix positions
-        positions = []
-        for i in range(min(10, len(history))):
-            pos = (i % 5, i // 5)  # (row, column)
-            positions.append((pos, history[-(i+1)]))  # Recent results first
-        
-        best_strat = None
-        max_prob = 0
-        
-        # Predict based on matrix positions
-        for matrix_key, stats in self.matrix_stats.items():
-            # Ensure 'total' key exists
-            if 'total' not in stats:
-                pattern = stats.get('pattern', '')
-                if pattern:
-                    w_count = pattern.count('W')
-                    l_count = pattern.count('L')
-                    total = w_count + l_count
-                    win_prob = (w_count / total * 100) if total > 0 else 0
-                    loss_prob = (l_count / total * 100) if total > 0 else 0
-                    
-                    # Add required values
-                    stats['total'] = total
-                    stats['win_prob'] = win_prob
-                    stats['loss_prob'] = loss_prob
-                else:
-                    # Skip if no pattern
-                    continue
-            
-            # Check significance threshold
-            if stats["total"] >= self.significance_threshold:
-                current_prob = max(stats.get("win_prob", 0), stats.get("loss_prob", 0))
-                if current_prob > max_prob:
-                    max_prob = current_prob
-                    target = "W" if stats.get("win_prob", 0) > stats.get("loss_prob", 0) else "L"
-                    best_strat = {
-                        "target": target,
-                        "prob": current_prob,
-                        "pattern": matrix_key,
-                        "samples": stats["total"],
-                        "type": "Matrix"
-                    }
-        
-        return best_strat
-    
-    def predict_next_adaptive(self, history):
-        # Makes adaptive (weighted) prediction
-        if len(history) < 5 or not self.adaptive_stats:
-            return None
-        
-        # Use last 50 results (or all if fewer)
-        recent_window = min(50, len(history))
-        recent_history = history[-recent_window:]
-        
-        # Count Ws and Ls
-        w_count = recent_history.count('W')
-        l_count = recent_history.count('L')
-        
-        # Trend analysis
-        trend = None
-        if w_count > l_count * 1.5:
-            trend = "Yukselis"
-        elif l_count > w_count * 1.5:
-            trend = "Dusus"
-        else:
-            trend = "Denge"
-        
-        # Last 3 and last 7 results
-        last_3 = ''.join(history[-3:]) if len(history) >= 3 else None
-        last_7 = ''.join(history[-7:]) if len(history) >= 7 else None
-        
-        # Calculate W and L probabilities
-        w_prob = 0
-        l_prob = 0
-        
-        # Weight by trend
-        if trend in self.adaptive_stats:
-            trend_stats = self.adaptive_stats[trend]
-            if trend_stats["total"] >= self.significance_threshold:
-                w_prob += trend_stats["win_prob"] * 0.3  # 30% weight
-                l_prob += trend_stats["loss_prob"] * 0.3
-        
-        # Weight by recent patterns
-        if last_3 in self.pattern_stats:
-            pattern_stats = self.pattern_stats[last_3]
-            if pattern_stats["total"] >= self.significance_threshold:
-                w_prob += pattern_stats["win_prob"] * 0.4  # 40% weight
-                l_prob += pattern_stats["loss_prob"] * 0.4
-        
-        # Weight by longer pattern (if available)
-        if last_7 in self.pattern_stats:
-            pattern_stats = self.pattern_stats[last_7]
-            if pattern_stats["total"] >= self.significance_threshold:
-                w_prob += pattern_stats["win_prob"] * 0.3  # 30% weight
-                l_prob += pattern_stats["loss_prob"] * 0.3
-        
-        # Make prediction if probability is over 50%
-        if max(w_prob, l_prob) > 50:
-            return {
-                "target": "W" if w_prob > l_prob else "L",
-                "prob": max(w_prob, l_prob),
-                "pattern": f"{trend} + last pattern",
-                "samples": self.adaptive_stats.get(trend, {"total": 0})["total"],
-                "type": "Adaptive"
-            }
-        
-        return None
-        
-        # Use last 50 results (or all if fewer)
-        recent_window = min(50, len(history))
-        recent_history = history[-recent_window:]
-        
-        # Count Ws and Ls
-        w_count = recent_history.count('W')
-        l_count = recent_history.count('L')
-        
-        # Trend analysis
-        trend = None
-        if w_count > l_count * 1.5:
-            trend = "Yukselis"
-        elif l_count > w_count * 1.5:
-            trend = "Dusus"
-        else:
-            trend = "Denge"
-        
-        # Last 3 and last 7 results
-        last_3 = ''.join(history[-3:]) if len(history) >= 3 else None
-        last_7 = ''.join(history[-7:]) if len(history) >= 7 else None
-        
-        # Calculate W and L probabilities
-        w_prob = 0
-        l_prob = 0
-        
-        # Weight by trend
-        if trend in self.adaptive_stats:
-            trend_stats = self.adaptive_stats[trend]
-            if trend_stats["total"] >= self.significance_threshold:
-                w_prob += trend_stats["win_prob"] * 0.3  # 30% weight
-                l_prob += trend_stats["loss_prob"] * 0.3
-        
-        # Weight by recent patterns
-        if last_3 in self.pattern_stats:
-            pattern_stats = self.pattern_stats[last_3]
-            if pattern_stats["total"] >= self.significance_threshold:
-                w_prob += pattern_stats["win_prob"] * 0.4  # 40% weight
-                l_prob += pattern_stats["loss_prob"] * 0.4
-        
-        # Weight by longer pattern (if available)
-        if last_7 in self.pattern_stats:
-            pattern_stats = self.pattern_stats[last_7]
-            if pattern_stats["total"] >= self.significance_threshold:
-                w_prob += pattern_stats["win_prob"] * 0.3  # 30% weight
-                l_prob += pattern_stats["loss_prob"] * 0.3
-        
-        # Make prediction if probability is over 50%
-        if max(w_prob, l_prob) > 50:
-            return {
-                "target": "W" if w_prob > l_prob else "L",
-                "prob": max(w_prob, l_prob),
-                "pattern": f"{trend} + last pattern",
-                "samples": self.adaptive_stats.get(trend, {"total": 0})["total"],
-                "type": "Adaptive"
-            }
-        
-        return None
-        
-        # Use last 50 results (or all if fewer)
-        recent_window = min(50, len(history))
-        recent_history = history[-recent_window:]
-        
-        # Count Ws and Ls
-        w_count = recent_history.count('W')
-        l_count = recent_history.count('L')
-        
-        # Trend analysis
-        trend = None
-        if w_count > l_count * 1.5:
-            trend = "Yukselis"
-        elif l_count > w_count * 1.5:
-            trend = "Dusus"
-        else:
-            trend = "Denge"
-        
-        # Last 3 and last 7 results
-        last_3 = ''.join(history[-3:]) if len(history) >= 3 else None
-        last_7 = ''.join(history[-7:]) if len(history) >= 7 else None
-        
-        # Calculate W and L probabilities
-        w_prob = 0
-        l_prob = 0
-        
-        # Weight by trend
-        if trend in self.adaptive_stats:
-            trend_stats = self.adaptive_stats[trend]
-            if trend_stats["total"] >= self.significance_threshold:
-                w_prob += trend_stats["win_prob"] * 0.3  # 30% weight
-                l_prob += trend_stats["loss_prob"] * 0.3
-        
-        # Weight by recent patterns
-        if last_3 in self.pattern_stats:
-            pattern_stats = self.pattern_stats[last_3]
-            if pattern_stats["total"] >= self.significance_threshold:
-                w_prob += pattern_stats["win_prob"] * 0.4  # 40% weight
-                l_prob += pattern_stats["loss_prob"] * 0.4
-        
-        # Weight by longer pattern (if available)
-        if last_7 in self.pattern_stats:
-            pattern_stats = self.pattern_stats[last_7]
-            if pattern_stats["total"] >= self.significance_threshold:
-                w_prob += pattern_stats["win_prob"] * 0.3  # 30% weight
-                l_prob += pattern_stats["loss_prob"] * 0.3
-        
-        # Make prediction if probability is over 50%
-        if max(w_prob, l_prob) > 50:
-            return {
-                "target": "W" if w_prob > l_prob else "L",
-                "prob": max(w_prob, l_prob),
-                "pattern": f"{trend} + last pattern",
-                "samples": self.adaptive_stats.get(trend, {"total": 0})["total"],
-                "type": "Adaptive"
-            }
-        
-        return None
-    
-    def predict_next(self, history):
-        # Makes a prediction based on the active algorithm
-        if len(history) < 3:
-            return None
-            
-        # Use the specific prediction method based on active algorithm
-        if self.active_algorithm == "pattern":
-            return self.predict_next_pattern(history)
-        elif self.active_algorithm == "matrix":
-            return self.predict_next_matrix(history)
-        elif self.active_algorithm == "adaptive":
-            return self.predict_next_adaptive(history)
-        elif self.active_algorithm == "combined":
-            # Get all predictions
-            pattern_pred = self.predict_next_pattern(history)
-            matrix_pred = self.predict_next_matrix(history)
-            adaptive_pred = self.predict_next_adaptive(history)
-            
-            # Take the one with highest probability
-            predictions = [p for p in [pattern_pred, matrix_pred, adaptive_pred] if p is not None]
-            if not predictions:
-                return None
-            
-            # Return prediction with highest probability and most samples
-            return max(predictions, key=lambda x: (x["prob"], x["samples"]))
-        
-        return None
-            
-        # Use the specific prediction method based on active algorithm
-        if self.active_algorithm == "pattern":
-            return self.predict_next_pattern(history)
-        elif self.active_algorithm == "matrix":
-            return self.predict_next_matrix(history)
-        elif self.active_algorithm == "adaptive":
-            return self.predict_next_adaptive(history)
-        elif self.active_algorithm == "combined":
-            # Get all predictions
-            pattern_pred = self.predict_next_pattern(history)
-            matrix_pred = self.predict_next_matrix(history)
-            adaptive_pred = self.predict_next_adaptive(history)
-            
-            # Take the one with highest probability
-            predictions = [p for p in [pattern_pred, matrix_pred, adaptive_pred] if p is not None]
-            if not predictions:
-                return None
-            
-            # Return prediction with highest probability and most samples
-            return max(predictions, key=lambda x: (x["prob"], x["samples"]))
-        
-        return None
-        
-        if self.active_algorithm == "pattern":
-            return self.predict_next_pattern(history)
-        elif self.active_algorithm == "matrix":
-            return self.predict_next_matrix(history)
-        elif self.active_algorithm == "adaptive":
-            return self.predict_next_adaptive(history)
-        elif self.active_algorithm == "combined":
-            # Get all predictions
-            pattern_pred = self.predict_next_pattern(history)
-            matrix_pred = self.predict_next_matrix(history)
-            adaptive_pred = self.predict_next_adaptive(history)
-            
-            # Take the one with highest probability
-            predictions = [p for p in [pattern_pred, matrix_pred, adaptive_pred] if p is not None]
-            if not predictions:
-                return None
-            
-            # Return prediction with highest probability and most samples
-            return max(predictions, key=lambda x: (x["prob"], x["samples"]))
-        
-        return None
+    def update_pattern_length(self, value):
+        """Updates the maximum pattern length"""
+        self.engine.max_pattern_length = value
+        self.journal_settings()
+        self.statusBar.showMessage(f"Pattern length updated to {value}")
+        self.analyze_data()
     
-    def update_prediction_stats(self, actual):
-        """Updates prediction statistics after a new result"""
-        # Ensure we have at least 3 results
-        if len(self.results) < 3:
-            return
-        
-        # Make a prediction
-        predicted = self.predict_next(self.results[:-1])
+    def update_trend_windows(self):
+        """Updates the window sizes used by the adaptive analysis"""
+        try:
+            window_sizes = sorted({int(size) for size in self.trend_windows_input.text().replace(',', ' ').split()})
+        except ValueError:
+            window_sizes = []
         
-        if predicted is None:
+        if not window_sizes or window_sizes[0] < 2:
+            self.trend_windows_input.setText(' '.join(str(size) for size in self.engine.trend_windows))
+            self.statusBar.showMessage("Trend windows must be whole numbers of at least 2")
             return
         
-        # Add to prediction history
-        self.prediction_history.append((predicted["target"], actual))
-        
-        self.prediction_stats['total_predictions'] += 1
-        
-        if predicted["target"] == actual:
-            self.prediction_stats['correct'] += 1
-            self.prediction_stats['current_win_streak'] += 1
-            self.prediction_stats['current_loss_streak'] = 0
-            if self.prediction_stats['current_win_streak'] > self.prediction_stats['max_win_streak']:
-                self.prediction_stats['max_win_streak'] = self.prediction_stats['current_win_streak']
-        else:
-            self.prediction_stats['incorrect'] += 1
-            self.prediction_stats['current_loss_streak'] += 1
-            self.prediction_stats['current_win_streak'] = 0
-            if self.prediction_stats['current_loss_streak'] > self.prediction_stats['max_loss_streak']:
-                self.prediction_stats['max_loss_streak'] = self.prediction_stats['current_loss_streak']
-        
-        # Add data for loss streak analysis
-        if self.prediction_stats['current_loss_streak'] >= 3:
-            self.loss_streak_predictions.append({
-                "loss_streak": self.prediction_stats['current_loss_streak'],
-                "pattern": predicted["pattern"],
-                "algorithm": predicted["type"],
-                "prob": predicted["prob"]
-            })
+        if window_sizes != self.engine.trend_windows:
+            self.engine.trend_windows = window_sizes
+            self.journal_settings()
+            self.statusBar.showMessage(f"Trend windows updated to {', '.join(str(size) for size in window_sizes)}")
+            self.analyze_data()
+    
+    def update_half_life(self, value):
+        """Updates the half-life of the pattern statistics, 0 for plain counts"""
+        self.engine.half_life = value
+        self.journal_settings()
+        self.statusBar.showMessage(f"Pattern half-life updated to {value} results" if value
+                                   else "Pattern half-life off")
+        self.analyze_data()
+        self.update_prediction()
+    
+    def update_retention(self, value):
+        """Updates how many results are kept, evicting the oldest ones beyond it"""
+        self.engine.retention = value if value >= MIN_RETENTION else 0
+        self.journal_settings()
+        with self.timed("update_retention"):
+            self.engine.trim()
+            self.engine.analyze()
+            self.update_display()
+            self.invalidate_analysis()
+        self.statusBar.showMessage(f"Keeping the last {value} results" if self.engine.retention
+                                   else "Keeping all results")
     
     def update_stats_display(self):
         """Updates the statistics display"""
-        if not self.results:
+        results = self.engine.results
+        if not results:
             self.total_value.setText("0")
             self.win_rate_value.setText("0%")
             self.streak_value.setText("-")
@@ -900,274 +1041,84 @@ class ModernBaccaratAnalyzer(QMainWindow):
             self.best_pattern_value.setText("-")
             return
             
-        total_games = len(self.results)
-        wins = self.results.count('W')
-        losses = self.results.count('L')
-        win_rate = (wins / total_games * 100) if total_games > 0 else 0
-        
-        # Calculate result streaks
-        current_consecutive_wins = 0
-        max_consecutive_wins = 0
-        current_consecutive_losses = 0
-        max_consecutive_losses = 0
-        
-        for result in self.results:
-            if result == 'W':
-                current_consecutive_wins += 1
-                current_consecutive_losses = 0
-                if current_consecutive_wins > max_consecutive_wins:
-                    max_consecutive_wins = current_consecutive_wins
-            else:
-                current_consecutive_losses += 1
-                current_consecutive_wins = 0
-                if current_consecutive_losses > max_consecutive_losses:
-                    max_consecutive_losses = current_consecutive_losses
-        
-        # Prediction accuracy
-        prediction_accuracy = 0
-        if self.prediction_stats['total_predictions'] > 0:
-            prediction_accuracy = (self.prediction_stats['correct'] / self.prediction_stats['total_predictions'] * 100)
+        total_games = len(results)
+        win_rate = results.count('W') / total_games * 100
         
         # Update displayed values
         self.total_value.setText(str(total_games))
         self.win_rate_value.setText(f"{win_rate:.1f}%")
         
         # Current streak
-        if current_consecutive_wins > 0:
-            self.streak_value.setText(f"{current_consecutive_wins}W")
-            self.streak_value.setStyleSheet("color: #4CAF50;")
-        elif current_consecutive_losses > 0:
-            self.streak_value.setText(f"{current_consecutive_losses}L")
-            self.streak_value.setStyleSheet("color: #F44336;")
+        streak, result = self.engine.result_streak()
+        self.streak_value.setText(f"{streak}{result}")
+        self.streak_value.setStyleSheet("color: #4CAF50;" if result == 'W' else "color: #F44336;")
+        
+        self.predictions_value.setText(str(self.engine.prediction_stats['total_predictions']))
+        self.accuracy_value.setText(f"{self.engine.accuracy():.1f}%")
+        
+        # Best pattern
+        best_pattern_item = self.engine.best_pattern()
+        if best_pattern_item:
+            pattern, outcome, probability = best_pattern_item
+            self.best_pattern_value.setText(f"{pattern} → {outcome}")
         else:
-            self.streak_value.setText("-")
-            self.streak_value.setStyleSheet("color: #c5cee0;")
-        
-        self.predictions_value.setText(str(self.prediction_stats['total_predictions']))
-        self.accuracy_value.setText(f"{prediction_accuracy:.1f}%")
-        
-        # Find best pattern
-        best_pattern = "-"
-        if self.pattern_stats:
-            best_pattern_item = None
-            best_probability = 0
-            best_samples = 0
-            
-            for pattern, stats in self.pattern_stats.items():
-                if stats["total"] >= self.significance_threshold:
-                    probability = max(stats["win_prob"], stats["loss_prob"])
-                    if probability > best_probability or (probability == best_probability and stats["total"] > best_samples):
-                        best_probability = probability
-                        best_samples = stats["total"]
-                        outcome = "W" if stats["win_prob"] > stats["loss_prob"] else "L"
-                        best_pattern_item = (pattern, outcome, probability)
-            
-            if best_pattern_item:
-                pattern, outcome, probability = best_pattern_item
-                best_pattern = f"{pattern} → {outcome}"
-        
-        self.best_pattern_value.setText(best_pattern)
+            self.best_pattern_value.setText("-")
     
     def update_recent_results(self):
         """Updates the visual display of recent results"""
-        # Clear current grid
-        for i in range(self.recent_grid.count()):
-            item = self.recent_grid.itemAt(i)
-            if item:
-                widget = item.widget()
-                if widget:
-                    widget.deleteLater()
-        
-        # Show the last 20 results (or fewer if not available)
-        results_to_show = min(20, len(self.results))
-        if results_to_show == 0:
-            return
-            
-        recent_results = self.results[-results_to_show:]
-        
-        # Create a grid of result squares (10 per row)
-        row, col = 0, 0
-        for result in recent_results:
-            result_label = QLabel(result)
-            result_label.setAlignment(Qt.AlignCenter)
-            result_label.setFixedSize(18, 18)
-            result_label.setStyleSheet(
-                f"background-color: {'#2e7d32' if result == 'W' else '#c62828'}; "
-                f"color: white; font-weight: bold; border-radius: 2px;"
-            )
-            self.recent_grid.addWidget(result_label, row, col)
-            
-            col += 1
-            if col >= 10:
-                col = 0
-                row += 1
+        # Show the last 20 results (or fewer if not available), touching only changed cells
+        recent_results = self.engine.results[-RECENT_RESULTS:]
+        for i, cell in enumerate(self.recent_cells):
+            cell.set_result(recent_results[i] if i < len(recent_results) else "")
+    
     
     def update_prediction(self):
         # Updates the prediction display
-        if len(self.results) < 3:
-            self.pattern_value_pred.setText("-")
-            self.success_value_pred.setText("-")
-            self.recommend_value_pred.setText("-")
-            self.recommend_value_pred.setStyleSheet("color: #c5cee0; font-size: 12pt; font-weight: bold;")
-            return
-        
-        # Get prediction based on current algorithm
-        current_prediction = self.predict_next(self.results)
-        
-        # Find all QLabel widgets in the prediction grid that show the algorithm
-        algorithm_names = {
-            "pattern": "Pattern Analysis",
-            "matrix": "Matrix Analysis", 
-            "adaptive": "Adaptive Analysis",
-            "combined": "Combined Analysis"
-        }
-        
-        # Find all children of the window
-        for widget in self.findChildren(QLabel):
-            # Look for QLabels with "Algorithm:" text
-            if widget.text() == "Algorithm:":
-                parent = widget.parent()
-                if parent:
-                    # Find next QLabel in same row of grid layout
-                    for w in parent.findChildren(QLabel):
-                        if w != widget and "Analysis" in w.text():
-                            # This is the algorithm value label
-                            w.setText(algorithm_names.get(self.active_algorithm, "Pattern Analysis"))
-        
-        if current_prediction:
-            self.pattern_value_pred.setText(current_prediction["pattern"])
-            self.success_value_pred.setText(f"{current_prediction['prob']:.1f}% ({current_prediction['samples']} samples)")
-            
-            # Set the recommendation
-            self.recommend_value_pred.setText(current_prediction["target"])
-            if current_prediction["target"] == "W":
-                self.recommend_value_pred.setStyleSheet("color: #4CAF50; font-size: 12pt; font-weight: bold;")
-            else:
-                self.recommend_value_pred.setStyleSheet("color: #F44336; font-size: 12pt; font-weight: bold;")
-            return
-        
-        # Get prediction based on current algorithm
-        current_prediction = self.predict_next(self.results)
-        
-        # Update algorithm display in prediction tab
-        algorithm_names = {
-            "pattern": "Pattern Analysis",
-            "matrix": "Matrix Analysis", 
-            "adaptive": "Adaptive Analysis",
-            "combined": "Combined Analysis"
-        }
-        
-        # Find all QLabel widgets that might be showing the algorithm info
-        for child in self.findChildren(QLabel):
-            if child.text() == "Algorithm:":
-                # Find the sibling label that shows the algorithm value
-                parent_layout = child.parent().layout()
-                if parent_layout:
-                    # Try to find the value label in the same row of grid layout
-                    for i in range(parent_layout.count()):
-                        item = parent_layout.itemAt(i)
-                        if item and item.widget():
-                            if isinstance(item.widget(), QLabel) and item.widget() != child:
-                                # Update the algorithm name in the UI
-                                item.widget().setText(algorithm_names.get(self.active_algorithm, "Pattern Analysis"))
-                                break
-        
-        if current_prediction:
-            self.pattern_value_pred.setText(current_prediction["pattern"])
-            self.success_value_pred.setText(f"{current_prediction['prob']:.1f}% ({current_prediction['samples']} samples)")
-            
-            # Set the recommendation
-            self.recommend_value_pred.setText(current_prediction["target"])
-            if current_prediction["target"] == "W":
-                self.recommend_value_pred.setStyleSheet("color: #4CAF50; font-size: 12pt; font-weight: bold;")
-            else:
-                self.recommend_value_pred.setStyleSheet("color: #F44336; font-size: 12pt; font-weight: bold;")
+        self.prediction_panel.set_algorithm(self.engine.active_algorithm)
+        if len(self.engine.results) < 3:
+            self.prediction_panel.clear()
             return
         
         # Get prediction based on current algorithm
-        current_prediction = self.predict_next(self.results)
-        
-        # Update algorithm display in prediction tab
-        algorithm_names = {
-            "pattern": "Pattern Analysis",
-            "matrix": "Matrix Analysis", 
-            "adaptive": "Adaptive Analysis",
-            "combined": "Combined Analysis"
-        }
-        
-        # Find all QLabel widgets that might be showing the algorithm info
-        for child in self.findChildren(QLabel):
-            if child.text() == "Algorithm:":
-                # Find the sibling label that shows the algorithm value
-                parent_layout = child.parent().layout()
-                if parent_layout:
-                    # Try to find the value label in the same row of grid layout
-                    for i in range(parent_layout.count()):
-                        item = parent_layout.itemAt(i)
-                        if item and item.widget():
-                            if isinstance(item.widget(), QLabel) and item.widget() != child:
-                                # Update the algorithm name in the UI
-                                item.widget().setText(algorithm_names.get(self.active_algorithm, "Pattern Analysis"))
-                                break
-        
+        current_prediction = self.engine.predict_next()
         if current_prediction:
-            self.pattern_value_pred.setText(current_prediction["pattern"])
-            self.success_value_pred.setText(f"{current_prediction['prob']:.1f}% ({current_prediction['samples']} samples)")
-            
-            # Set the recommendation
-            self.recommend_value_pred.setText(current_prediction["target"])
-            if current_prediction["target"] == "W":
-                self.recommend_value_pred.setStyleSheet("color: #4CAF50; font-size: 12pt; font-weight: bold;")
-            else:
-                self.recommend_value_pred.setStyleSheet("color: #F44336; font-size: 12pt; font-weight: bold;")
-            return
-        
-        current_prediction = self.predict_next(self.results)
-        
-        if current_prediction:
-            self.pattern_value_pred.setText(current_prediction["pattern"])
-            self.success_value_pred.setText(f"{current_prediction['prob']:.1f}% ({current_prediction['samples']} samples)")
-            
-            # Set the recommendation
-            self.recommend_value_pred.setText(current_prediction["target"])
-            if current_prediction["target"] == "W":
-                self.recommend_value_pred.setStyleSheet("color: #4CAF50; font-size: 12pt; font-weight: bold;")
-            else:
-                self.recommend_value_pred.setStyleSheet("color: #F44336; font-size: 12pt; font-weight: bold;")
+            self.prediction_panel.set_prediction(current_prediction)
         else:
-            self.pattern_value_pred.setText("-")
-            self.success_value_pred.setText("-")
-            self.recommend_value_pred.setText("Insufficient data")
-            self.recommend_value_pred.setStyleSheet("color: #c5cee0; font-size: 12pt; font-weight: bold;")
+            self.prediction_panel.clear("Insufficient data")
     
     def update_display(self):
         """Updates all UI elements"""
-        self.update_stats_display()
-        self.update_recent_results()
-        self.update_prediction()
-        
-        # Update history display
-        history_html = ""
-        
-        for i, result in enumerate(self.results):
-            color = "#4CAF50" if result == "W" else "#F44336"
-            history_html += f"<span style='color: {color}; font-weight: bold;'>{result}</span> "
-            
-            if (i + 1) % 10 == 0:
-                history_html += "<br>"
-        
-        self.results_display.setHtml(history_html)
+        with timings.stage("display.stats"):
+            self.update_stats_display()
+        with timings.stage("display.recent"):
+            self.update_recent_results()
+        with timings.stage("display.prediction"):
+            self.update_prediction()
+        
+        # Update history display, following new results when scrolled to the end
+        with timings.stage("display.history"):
+            scrollbar = self.results_display.verticalScrollBar()
+            at_end = scrollbar.value() == scrollbar.maximum()
+            self.history_model.sync(self.engine.results)
+            if at_end:
+                self.results_display.scrollToBottom()
     
     def add_result(self, result):
         """Adds a new result and updates everything"""
-        if len(self.results) >= 3:
-            self.update_prediction_stats(result)
+        if self.feed:
+            # The server sends it back to every attached window, this one included
+            self.feed.send({"op": "add", "session": self.feed_session, "result": result})
+            return
         
-        self.results.append(result)
-        self.update_display()
-        self.analyze_data()
+        with self.timed("add_result"):
+            self.engine.add_result(result)
+            self.record_session()
+            if self.journal:
+                self.journal.add_results(result)
+            self.update_display()
+            self.invalidate_analysis()
         
-        self.statusBar.showMessage(f"Added {result}. Total results: {len(self.results)}")
+        self.statusBar.showMessage(f"Added {result}. Total results: {len(self.engine.results)}")
     
     def add_bulk_results(self):
         """Adds multiple results from the bulk input field"""
@@ -1182,88 +1133,255 @@ class ModernBaccaratAnalyzer(QMainWindow):
         if len(valid_results) != len(bulk_results):
             self.statusBar.showMessage("Invalid characters found! Use only W and L.")
             return
+        
+        if self.feed:
+            self.feed.send({"op": "add", "session": self.feed_session, "results": ''.join(valid_results)})
+            self.bulk_input.clear()
+            return
             
-        # Show progress bar for large data sets
+        # Large data sets are added in the background with a progress bar
         if len(valid_results) > 50:
-            self.progress_bar.setRange(0, len(valid_results))
-            self.progress_bar.setValue(0)
-        
-        # Add each result one by one for prediction calculations
-        for i, result in enumerate(valid_results):
-            if len(self.results) >= 3:
-                self.update_prediction_stats(result)
+            def task(engine, reporter):
+                engine.add_results(valid_results, reporter(f"Adding {len(valid_results)} results..."))
+                return f"Added {len(valid_results)} results. Total: {len(engine.results)}"
+            
+            def added():
+                self.bulk_input.clear()
+                if self.journal:
+                    self.journal.add_results(valid_results)
             
-            self.results.append(result)
+            self.start_worker("add_bulk_results.background", task, "Error adding results: ", on_done=added)
+            return
+        
+        with self.timed("add_bulk_results"):
+            self.engine.add_results(valid_results)
+            self.record_session()
+            if self.journal:
+                self.journal.add_results(valid_results)
             
-            # Update progress bar
-            if len(valid_results) > 50 and i % (len(valid_results) // 50) == 0:
-                self.progress_bar.setValue(i)
-                QApplication.processEvents()  # Allow UI to update
+            # Update UI once
+            self.update_display()
+            self.invalidate_analysis()
+        self.bulk_input.clear()
+        
+        self.statusBar.showMessage(f"Added {len(valid_results)} results. Total: {len(self.engine.results)}")
+    
+    def start_worker(self, operation, task, error_prefix, on_done=None):
+        """Runs task(engine, reporter) on a copy of the engine, see AnalysisWorker"""
+        # The copy misses what the feed pushes meanwhile, it waits in feed_pending
+        if self.feed and self.feed_pending is None:
+            self.feed_pending = []
+        self.worker = AnalysisWorker(self.engine, task, operation, self)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.done.connect(lambda engine, message: self.finish_worker(engine, message, on_done))
+        self.worker.failed.connect(lambda message: self.statusBar.showMessage(error_prefix + message))
+        self.worker.finished.connect(self.worker_stopped)
+        self.set_busy(True)
+        self.worker.start()
+    
+    def show_progress(self, stage, done):
+        """Shows a background stage and its progress in per mille"""
+        self.progress_bar.setValue(done)
+        self.statusBar.showMessage(stage)
+    
+    def finish_worker(self, engine, message, on_done):
+        """Adopts the engine copy of a finished background operation"""
+        if self.worker.cancelled:
+            return
         
-        # Reset progress bar
+        with self.timed(self.worker.operation + ".display"):
+            self.engine = engine
+            self.flush_feed()
+            if on_done:
+                on_done()
+            self.record_session()
+            
+            self.clear_analysis()
+            self.update_display()
+            self.invalidate_analysis()
+        self.statusBar.showMessage(message)
+    
+    def cancel_worker(self):
+        """Stops the background operation, keeping the session as it was"""
+        if self.worker:
+            self.worker.cancel()
+            self.statusBar.showMessage("Cancelling...")
+    
+    def worker_stopped(self):
+        operation = self.worker.operation
+        if self.worker.cancelled:
+            self.statusBar.showMessage("Cancelled, session unchanged")
+        self.worker.deleteLater()
+        self.worker = None
         self.progress_bar.setValue(0)
+        self.set_busy(False)
         
-        # Update UI once
-        self.update_display()
-        self.analyze_data()
-        self.bulk_input.clear()
+        # The engine copy was not adopted. An attached session whose history
+        # did not load cannot follow the feed, otherwise the results pushed
+        # meanwhile still belong to the session as it is.
+        if self.feed_pending is None:
+            return
+        if operation == "attach_feed":
+            self.feed_pending = None
+            self.detach_feed("Detached, the feed session's history was not loaded")
+        elif self.feed_pending:
+            self.flush_feed()
+            self.update_display()
+            self.invalidate_analysis()
+        else:
+            self.feed_pending = None
+    
+    def set_busy(self, busy):
+        """Locks the controls that change the session while a worker runs"""
+        for widget in (self.algo_combo, self.sample_spin, self.pattern_spin, self.win_button,
+                       self.loss_button, self.bulk_button, self.save_button, self.trend_windows_input,
+                       self.half_life_spin, self.retention_spin, self.search_input, self.search_button,
+                       self.feed_button):
+            widget.setEnabled(not busy)
+        
+        # The server has no delete, and loading or attaching elsewhere would
+        # part the window from the feed session
+        for widget in (self.delete_button, self.clear_button, self.load_button,
+                       self.feed_address_input, self.feed_session_input):
+            widget.setEnabled(not busy and not self.feed)
+        self.cancel_button.setVisible(busy)
+    
+    def closeEvent(self, event):
+        # Stop a running worker before the window and its thread go away
+        if self.worker:
+            self.worker.cancel()
+            self.worker.wait()
+        if self.feed:
+            self.feed.close()
+        self.close_store()
+        self.close_journal()
+        super().closeEvent(event)
+    
+    def toggle_feed(self):
+        """Attaches to the feed server session in the settings, or detaches"""
+        if self.feed:
+            self.detach_feed("Detached from the feed server")
+            return
+        
+        address = self.feed_address_input.text().strip()
+        session = self.feed_session_input.text().strip()
+        if not address or not session:
+            self.statusBar.showMessage("Enter a feed server address and session to attach to")
+            return
+        
+        self.feed = FeedClient(address, self)
+        self.feed_session = session
+        self.feed.connected.connect(lambda: self.feed.send({"op": "subscribe", "session": session, "id": "subscribe"}))
+        self.feed.messages.connect(self.feed_messages)
+        self.feed.failed.connect(lambda error: self.detach_feed(f"Feed server error: {error}"))
+        self.feed.disconnected.connect(lambda: self.detach_feed("The feed server closed the connection"))
+        self.feed_button.setText('DETACH')
+        self.set_busy(bool(self.worker))
+        self.statusBar.showMessage(f"Connecting to {address}...")
+        self.feed.open()
+    
+    def detach_feed(self, message):
+        """Stops following the feed server, keeping the results received so far"""
+        if not self.feed:
+            return
+        self.feed.close()
+        self.feed.deleteLater()
+        self.feed = None
+        self.feed_session = None
+        self.feed_button.setText('ATTACH')
+        self.set_busy(bool(self.worker))
+        self.statusBar.showMessage(message)
+    
+    def feed_messages(self, messages):
+        """Handles the replies and pushed results that arrived from the feed server"""
+        results = []
+        for message in messages:
+            if message.get("event") == "result":
+                if message["session"] == self.feed_session:
+                    results.extend(message["results"])
+            elif not message["ok"]:
+                self.statusBar.showMessage(f"Feed server error: {message['error']}")
+            elif message.get("id") == "subscribe":
+                self.load_feed_session(message["results"])
+                if not self.feed:
+                    return
+        
+        if not results:
+            return
+        if self.feed_pending is not None:
+            self.feed_pending.extend(results)
+            return
+        
+        with self.timed("feed_results"):
+            if len(results) == 1:
+                self.engine.add_result(results[0])
+            else:
+                self.engine.add_results(results)
+            self.record_session()
+            if self.journal:
+                self.journal.add_results(results)
+            self.update_display()
+            self.invalidate_analysis()
+        self.statusBar.showMessage(f"{self.feed_session}: added {results[-1] if len(results) == 1 else len(results)}. "
+                                   f"Total results: {len(self.engine.results)}")
+    
+    def load_feed_session(self, history):
+        """Replaces the session with the attached one's history from the server"""
+        session = self.feed_session
+        self.close_store()
+        if not history:
+            self.engine.clear()
+            if self.journal:
+                self.journal.clear()
+            self.clear_analysis()
+            self.update_display()
+            self.statusBar.showMessage(f"Attached to {session}, no results yet")
+            return
+        if self.worker:
+            self.detach_feed("Detached, wait for the running operation before attaching")
+            return
+        
+        def task(engine, reporter):
+            engine.clear()
+            engine.add_results(list(history), reporter(f"Loading {len(history)} results of {session}..."))
+            return f"Attached to {session} with {len(history)} results"
         
-        self.statusBar.showMessage(f"Added {len(valid_results)} results. Total: {len(self.results)}")
+        # Results pushed meanwhile wait in feed_pending and follow the history
+        self.start_worker("attach_feed", task, "Error loading the feed session: ", on_done=self.snapshot_journal)
+    
+    def flush_feed(self):
+        """Adds the results the feed pushed while a worker ran"""
+        pending, self.feed_pending = self.feed_pending, None
+        if not pending:
+            return
+        self.engine.add_results(pending)
+        self.record_session()
+        if self.journal:
+            self.journal.add_results(pending)
     
     def delete_last_result(self):
         """Deletes the last result"""
-        if self.results:
-            deleted = self.results.pop()
-            
-            # Also remove last prediction if it exists
-            if self.prediction_history:
-                last_prediction = self.prediction_history.pop()
-                
-                # Update prediction stats
-                if last_prediction[0] == last_prediction[1]:  # Correct prediction
-                    self.prediction_stats['correct'] -= 1
-                else:  # Incorrect prediction
-                    self.prediction_stats['incorrect'] -= 1
-                    
-                self.prediction_stats['total_predictions'] -= 1
-                
-                # Recalculate streaks (simplified)
-                if self.prediction_stats['total_predictions'] > 0:
-                    last_correct = 0
-                    for pred, actual in reversed(self.prediction_history):
-                        if pred == actual:
-                            last_correct += 1
-                        else:
-                            break
-                    self.prediction_stats['current_win_streak'] = last_correct
-                else:
-                    self.prediction_stats['current_win_streak'] = 0
-                    self.prediction_stats['current_loss_streak'] = 0
-            
-            self.update_display()
-            self.analyze_data()
-            
+        with self.timed("delete_last_result"):
+            deleted = self.engine.delete_last_result()
+            if deleted:
+                self.record_session()
+                if self.journal:
+                    self.journal.delete_last_result()
+                self.update_display()
+                self.invalidate_analysis()
+        
+        if deleted:
             self.statusBar.showMessage(f"Deleted last result ({deleted})")
         else:
             self.statusBar.showMessage("No results to delete")
     
     def clear_all_results(self):
         """Clears all results and resets everything"""
-        if self.results:
-            self.results.clear()
-            self.prediction_history.clear()
-            self.loss_streak_predictions.clear()
-            
-            # Reset prediction stats
-            self.prediction_stats = {
-                'total_predictions': 0,
-                'correct': 0,
-                'incorrect': 0,
-                'current_win_streak': 0,
-                'max_win_streak': 0,
-                'current_loss_streak': 0,
-                'max_loss_streak': 0
-            }
+        if self.engine.results:
+            self.engine.clear()
+            self.close_store()  # the stored session is kept as it was
+            if self.journal:
+                self.journal.clear()
             
             self.update_display()
             self.clear_analysis()
@@ -1272,149 +1390,129 @@ class ModernBaccaratAnalyzer(QMainWindow):
         else:
             self.statusBar.showMessage("No results to clear")
     
+    def search_history(self):
+        """Finds the sequence in the search box in the whole history
+        
+        Shows how often it occurred and what followed it, and scrolls to the
+        latest occurrence. A large history is indexed in the background first.
+        """
+        query = self.search_input.text()
+        if not query.strip():
+            self.search_result.setText("")
+            self.history_model.set_highlight(0, 0)
+            return
+        
+        size = len(self.engine.results)
+        if size > SEARCH_IN_BACKGROUND and self.engine.suffix_index.needs_rebuild(self.engine.results):
+            def task(engine, reporter):
+                reporter(f"Indexing {size} results for search...")(0, 1)
+                engine.search(query)
+                return f"Indexed {size} results for search"
+            
+            self.start_worker("search_history.index", task, "Error searching: ", on_done=self.search_history)
+            return
+        
+        with self.timed("search_history"):
+            try:
+                found = self.engine.search(query)
+            except ValueError as e:
+                self.statusBar.showMessage(f"Invalid search: {e}")
+                return
+            
+            if not found["count"]:
+                self.history_model.set_highlight(0, 0)
+                self.search_result.setText("Not found")
+                return
+            
+            last = int(found["positions"][-1])
+            text = f"{found['count']} occurrences, latest at result {last + 1}"
+            followed = found["W"] + found["L"]
+            if followed:
+                text += (f" · followed by W {found['W'] / followed * 100:.1f}% ({found['W']}), "
+                         f"L {found['L'] / followed * 100:.1f}% ({found['L']})")
+            self.search_result.setText(text)
+            
+            self.history_model.set_highlight(last, len(''.join(query.split())))
+            self.results_display.scrollTo(self.history_model.index(last // ResultHistoryModel.COLUMNS, 0),
+                                          QAbstractItemView.PositionAtCenter)
+    
     def clear_analysis(self):
-        """Clears all analysis data"""
+        """Clears all analysis views"""
         self.pattern_text.setText("")
         self.matrix_text.setText("")
         self.adaptive_text.setText("")
-        
-        # Reset stored analysis data
-        self.pattern_stats = {}
-        self.matrix_stats = {}
-        self.adaptive_stats = {}
+        self.dirty_views.clear()
     
-    def analyze_patterns(self):
-        """Analyzes patterns in the results"""
-        self.pattern_stats = {}
-        max_pattern_length = self.pattern_spin.value()
-        
-        if len(self.results) < 3:
-            self.pattern_text.setText("Need at least 3 results for pattern analysis.")
+    def analyze_data(self):
+        """Performs all analyses"""
+        with self.timed("analyze_data"):
+            self.engine.analyze()
+            self.invalidate_analysis()
+    
+    def invalidate_analysis(self):
+        """Marks the analysis views out of date and schedules one render"""
+        self.dirty_views.update(("pattern", "matrix", "adaptive"))
+        if not self.render_scheduled:
+            self.render_scheduled = True
+            QTimer.singleShot(0, self.render_analysis)
+    
+    def render_analysis(self):
+        """Renders the out of date analysis views, if the analysis tab is showing"""
+        self.render_scheduled = False
+        if self.tab_widget.currentWidget() is not self.analysis_tab or not self.dirty_views:
             return
         
-        # For each pattern length
-        for pattern_length in range(1, min(max_pattern_length + 1, len(self.results))):
-            # Look at each position in results
-            for i in range(len(self.results) - 1):
-                if i >= pattern_length:
-                    pattern = ''.join(self.results[i-pattern_length:i])
-                    next_result = self.results[i]
-                    
-                    if pattern not in self.pattern_stats:
-                        self.pattern_stats[pattern] = {"W": 0, "L": 0}
-                    
-                    self.pattern_stats[pattern][next_result] += 1
-        
-        # Convert counts to probabilities
-        for pattern, outcomes in self.pattern_stats.items():
-            total = outcomes["W"] + outcomes["L"]
-            win_rate = (outcomes["W"] / total * 100) if total > 0 else 0
-            loss_rate = (outcomes["L"] / total * 100) if total > 0 else 0
-            
-            self.pattern_stats[pattern]["total"] = total
-            self.pattern_stats[pattern]["win_prob"] = win_rate
-            self.pattern_stats[pattern]["loss_prob"] = loss_rate
-            self.pattern_stats[pattern]["win_count"] = outcomes["W"]
-            self.pattern_stats[pattern]["loss_count"] = outcomes["L"]
-        
+        # Views wait for enough results, as the analyses do
+        results_count = len(self.engine.results)
+        renderers = {
+            "pattern": (3, self.render_pattern_analysis),
+            "matrix": (25, self.render_matrix_analysis),
+            "adaptive": (20, self.render_adaptive_analysis)
+        }
+        for view in self.dirty_views:
+            min_results, render = renderers[view]
+            if results_count >= min_results:
+                with timings.stage("render." + view):
+                    render()
+        self.dirty_views.clear()
+    
+    def render_pattern_analysis(self):
+        """Renders the pattern statistics table"""
         # Display pattern analysis
         pattern_html = "<style>table { border-collapse: collapse; } td, th { padding: 4px 8px; border: 1px solid #2d3154; }</style>"
         pattern_html += "<table width='100%'>"
         pattern_html += "<tr><th>Pattern</th><th>Total</th><th>W %</th><th>L %</th><th>Best</th></tr>"
         
-        # Sort patterns by highest probability
-        sorted_patterns = sorted(
-            self.pattern_stats.items(),
-            key=lambda x: (max(x[1]["win_prob"], x[1]["loss_prob"]), x[1]["total"]),
-            reverse=True
-        )
-        
-        # Show only patterns with enough samples
-        for pattern, stats in sorted_patterns:
-            if stats["total"] >= self.significance_threshold:
-                best = "W" if stats["win_prob"] > stats["loss_prob"] else "L"
-                best_prob = max(stats["win_prob"], stats["loss_prob"])
-                
-                pattern_html += f"""
-                <tr>
-                    <td>{pattern}</td>
-                    <td>{stats["total"]}</td>
-                    <td style='color: {'#4CAF50' if stats["win_prob"] > 55 else '#c5cee0'};'>
-                        {stats["win_prob"]:.1f}%
-                    </td>
-                    <td style='color: {'#F44336' if stats["loss_prob"] > 55 else '#c5cee0'};'>
-                        {stats["loss_prob"]:.1f}%
-                    </td>
-                    <td style='color: {'#4CAF50' if best == 'W' else '#F44336'}; font-weight: bold;'>
-                        {best} ({best_prob:.1f}%)
-                    </td>
-                </tr>
-                """
+        # Patterns with enough samples, highest probability first; long
+        # patterns can number millions, so only the strongest are listed
+        for pattern, stats in self.engine.ranked_patterns(PATTERN_ROWS):
+            best = "W" if stats["win_prob"] > stats["loss_prob"] else "L"
+            best_prob = max(stats["win_prob"], stats["loss_prob"])
+            
+            pattern_html += f"""
+            <tr>
+                <td>{pattern}</td>
+                <td>{format_count(stats["total"])}</td>
+                <td style='color: {'#4CAF50' if stats["win_prob"] > 55 else '#c5cee0'};'>
+                    {stats["win_prob"]:.1f}%
+                </td>
+                <td style='color: {'#F44336' if stats["loss_prob"] > 55 else '#c5cee0'};'>
+                    {stats["loss_prob"]:.1f}%
+                </td>
+                <td style='color: {'#4CAF50' if best == 'W' else '#F44336'}; font-weight: bold;'>
+                    {best} ({best_prob:.1f}%)
+                </td>
+            </tr>
+            """
         
         pattern_html += "</table>"
         
         self.pattern_text.setHtml(pattern_html)
     
-    def analyze_matrix(self):
-        """Analyzes results in a matrix format"""
-        if len(self.results) < 25:  # Need at least 5x5 matrix
-            self.matrix_text.setText("Need at least 25 results for matrix analysis.")
-            return
-        
-        # Matrix dimensions
-        rows = 5
-        cols = 5
-        
-        # Create matrix
-        matrix = [[None for _ in range(cols)] for _ in range(rows)]
-        
-        # Fill matrix with last 25 results (or fewer if not available)
-        matrix_size = min(rows * cols, len(self.results))
-        recent_results = self.results[-matrix_size:]
-        
-        for i, result in enumerate(reversed(recent_results)):  # Most recent at top-left
-            row = i % rows
-            col = i // rows
-            matrix[row][col] = result
-        
-        # Analyze patterns in matrix
-        self.matrix_stats = {}
-        
-        # Horizontal rows
-        for r in range(rows):
-            if all(matrix[r][c] is not None for c in range(cols)):
-                pattern = ''.join(matrix[r][c] for c in range(cols))
-                w_count = pattern.count('W')
-                l_count = pattern.count('L')
-                total = w_count + l_count
-                win_prob = (w_count / total * 100) if total > 0 else 0
-                loss_prob = (l_count / total * 100) if total > 0 else 0
-                
-                self.matrix_stats[f"H{r+1}:{pattern}"] = {
-                    "row": r, 
-                    "pattern": pattern,
-                    "total": total,
-                    "win_prob": win_prob,
-                    "loss_prob": loss_prob
-                }
-        
-        # Vertical columns
-        for c in range(cols):
-            if all(matrix[r][c] is not None for r in range(rows)):
-                pattern = ''.join(matrix[r][c] for r in range(rows))
-                w_count = pattern.count('W')
-                l_count = pattern.count('L')
-                total = w_count + l_count
-                win_prob = (w_count / total * 100) if total > 0 else 0
-                loss_prob = (l_count / total * 100) if total > 0 else 0
-                
-                self.matrix_stats[f"V{c+1}:{pattern}"] = {
-                    "col": c, 
-                    "pattern": pattern,
-                    "total": total,
-                    "win_prob": win_prob,
-                    "loss_prob": loss_prob
-                }
+    def render_matrix_analysis(self):
+        """Renders the 5x5 matrix and its row/column statistics"""
+        matrix = self.engine.matrix
+        matrix_stats = self.engine.matrix_stats
         
         # Display matrix visualization
         matrix_html = "<style>table { border-collapse: collapse; } td, th { padding: 4px 8px; border: 1px solid #2d3154; }</style>"
@@ -1437,7 +1535,7 @@ class ModernBaccaratAnalyzer(QMainWindow):
         matrix_html += "<table width='100%'>"
         matrix_html += "<tr><th>Position</th><th>Pattern</th><th>Best</th><th>Probability</th></tr>"
         
-        for key, stats in self.matrix_stats.items():
+        for key, stats in matrix_stats.items():
             win_prob = stats.get("win_prob", 0)
             loss_prob = stats.get("loss_prob", 0)
             best = "W" if win_prob > loss_prob else "L"
@@ -1455,69 +1553,16 @@ class ModernBaccaratAnalyzer(QMainWindow):
         
         self.matrix_text.setHtml(matrix_html)
     
-    def analyze_adaptive(self):
-        """Performs adaptive analysis"""
-        if len(self.results) < 20:
-            self.adaptive_text.setText("Need at least 20 results for adaptive analysis.")
-            return
-        
-        # Analyze trends in different window sizes
-        window_sizes = [10, 20, 50]
-        trend_stats = {}
-        
-        for size in window_sizes:
-            if len(self.results) >= size:
-                # Look at each window
-                for i in range(size, len(self.results) + 1):
-                    window = self.results[i-size:i]
-                    w_count = window.count("W")
-                    l_count = window.count("L")
-                    
-                    # Determine trend type
-                    if w_count / size >= 0.6:
-                        trend_type = "Yukselis"  # Rising
-                    elif l_count / size >= 0.6:
-                        trend_type = "Dusus"  # Falling
-                    else:
-                        trend_type = "Denge"  # Balanced
-                    
-                    # Create key for this window size and trend
-                    key = f"{size}_{trend_type}"
-                    if key not in trend_stats:
-                        trend_stats[key] = {"W": 0, "L": 0}
-                    
-                    # If there's a next result after this window, record it
-                    if i < len(self.results):
-                        next_result = self.results[i]
-                        trend_stats[key][next_result] += 1
-        
-        # Convert to probabilities
-        self.adaptive_stats = {}
-        
-        for key, outcomes in trend_stats.items():
-            total = outcomes["W"] + outcomes["L"]
-            if total >= self.significance_threshold:
-                win_rate = (outcomes["W"] / total * 100) if total > 0 else 0
-                loss_rate = (outcomes["L"] / total * 100) if total > 0 else 0
-                
-                # Extract trend information
-                size, trend_type = key.split('_')
-                
-                self.adaptive_stats[trend_type] = {
-                    "window": int(size),
-                    "total": total,
-                    "win_prob": win_rate,
-                    "loss_prob": loss_rate,
-                    "win_count": outcomes["W"],
-                    "loss_count": outcomes["L"]
-                }
+    def render_adaptive_analysis(self):
+        """Renders the current trend and the per-window trend statistics"""
+        results = self.engine.results
         
         # Display adaptive analysis
         adaptive_html = "<style>table { border-collapse: collapse; } td, th { padding: 4px 8px; border: 1px solid #2d3154; }</style>"
         
         # Current trend
-        if len(self.results) >= 10:
-            last_10 = self.results[-10:]
+        if len(results) >= 10:
+            last_10 = results[-10:]
             w_count = last_10.count("W")
             l_count = last_10.count("L")
             
@@ -1535,9 +1580,11 @@ class ModernBaccaratAnalyzer(QMainWindow):
         
         # Trend analysis table
         adaptive_html += "<table width='100%'>"
-        adaptive_html += "<tr><th>Trend Type</th><th>Total</th><th>W Prob.</th><th>L Prob.</th><th>Recommendation</th></tr>"
+        adaptive_html += "<tr><th>Window</th><th>Trend Type</th><th>Total</th><th>W Prob.</th><th>L Prob.</th><th>Recommendation</th></tr>"
         
-        for trend_type, stats in self.adaptive_stats.items():
+        window_stats = [(trend_type, stats) for stats_by_trend in self.engine.adaptive_window_stats.values()
+                        for trend_type, stats in stats_by_trend.items()]
+        for trend_type, stats in window_stats:
             best = "W" if stats["win_prob"] > stats["loss_prob"] else "L"
             best_prob = max(stats["win_prob"], stats["loss_prob"])
             
@@ -1551,6 +1598,7 @@ class ModernBaccaratAnalyzer(QMainWindow):
             
             adaptive_html += f"""
             <tr>
+                <td>{stats["window"]}</td>
                 <td>{trend_name}</td>
                 <td>{stats["total"]}</td>
                 <td style='color: {'#4CAF50' if stats["win_prob"] > 55 else '#c5cee0'};'>
@@ -1569,72 +1617,338 @@ class ModernBaccaratAnalyzer(QMainWindow):
         
         self.adaptive_text.setHtml(adaptive_html)
     
-    def analyze_data(self):
-        """Performs all analyses"""
-        if len(self.results) < 3:
+    @contextlib.contextmanager
+    def timed(self, operation):
+        """Times an operation for the diagnostics and shows its latency
+        
+        The time until the event loop is back, running the deferred
+        rendering and the layout the operation queued, is recorded as
+        stage "<operation>.event_loop".
+        """
+        with timings.operation(operation):
+            yield
+        start = time.perf_counter()
+        QTimer.singleShot(0, lambda: timings.record(operation + ".event_loop", time.perf_counter() - start))
+        self.show_timing(operation)
+    
+    def show_timing(self, operation):
+        stats = timings.stats(operation)
+        if stats:
+            self.timing_label.setText(f"{operation} {stats['last']:.1f} ms (p95 {stats['p95']:.1f})")
+        self.render_diagnostics()
+    
+    def render_diagnostics(self):
+        """Renders the stage timings table, if the settings tab is showing and timings changed"""
+        if self.tab_widget.currentWidget() is not self.settings_tab or self.diagnostics_updates == timings.updates:
+            return
+        self.diagnostics_updates = timings.updates
+        
+        summary = timings.summary()
+        if not summary:
+            self.diagnostics_text.setHtml("No timings yet")
+            return
+        
+        diagnostics_html = "<style>table { border-collapse: collapse; } td, th { padding: 2px 6px; border: 1px solid #2d3154; }</style>"
+        diagnostics_html += "<table width='100%'>"
+        diagnostics_html += "<tr><th>Stage (ms)</th><th>N</th><th>Last</th><th>p50</th><th>p95</th><th>Max</th></tr>"
+        for stage, stats in summary.items():
+            diagnostics_html += f"""
+            <tr>
+                <td>{stage}</td>
+                <td align='right'>{stats['count']}</td>
+                <td align='right'>{stats['last']:.2f}</td>
+                <td align='right'>{stats['p50']:.2f}</td>
+                <td align='right'>{stats['p95']:.2f}</td>
+                <td align='right'>{stats['max']:.2f}</td>
+            </tr>
+            """
+        diagnostics_html += "</table>"
+        
+        # Keep the scroll position while timings come in
+        scrollbar = self.diagnostics_text.verticalScrollBar()
+        position = scrollbar.value()
+        self.diagnostics_text.setHtml(diagnostics_html)
+        scrollbar.setValue(position)
+    
+    def poll_diagnostics(self):
+        """Picks up timings and profiles that finished on the worker thread"""
+        profile_path = timings.take_saved_profile()
+        if profile_path:
+            self.profile_button.setEnabled(True)
+            self.statusBar.showMessage(f"Profile saved to {profile_path} (view it with python -m pstats)")
+        self.render_diagnostics()
+    
+    def export_diagnostics(self):
+        """Saves the stage timings with the session settings as JSON"""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Diagnostics", "diagnostics.json",
+                                                   "JSON Files (*.json);;All Files (*)")
+        if not file_path:
+            return
+        
+        try:
+            timings.export(file_path, results=len(self.engine.results), algorithm=self.engine.active_algorithm,
+                           significance_threshold=self.engine.significance_threshold,
+                           max_pattern_length=self.engine.max_pattern_length,
+                           trend_windows=self.engine.trend_windows)
+        except OSError as e:
+            self.statusBar.showMessage(f"Error exporting diagnostics: {str(e)}")
             return
         
-        # Analyze patterns
-        self.analyze_patterns()
+        self.statusBar.showMessage(f"Diagnostics exported to {file_path}")
+    
+    def reset_diagnostics(self):
+        timings.clear()
+        self.timing_label.setText("")
+        self.render_diagnostics()
+        self.statusBar.showMessage("Diagnostics reset")
+    
+    def start_profile(self):
+        """Captures a cProfile of the next operations into a file"""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "profile.prof",
+                                                   "Profiles (*.prof);;All Files (*)")
+        if not file_path:
+            return
         
-        # Analyze matrix if enough data
-        if len(self.results) >= 25:
-            self.analyze_matrix()
+        operations = self.profile_spin.value()
+        try:
+            timings.profile(operations, file_path)
+        except OSError as e:
+            self.statusBar.showMessage(f"Error starting profile: {str(e)}")
+            return
         
-        # Analyze adaptive trends if enough data
-        if len(self.results) >= 20:
-            self.analyze_adaptive()
+        self.profile_button.setEnabled(False)
+        self.statusBar.showMessage(f"Profiling the next {operations} operations...")
     
     def load_results(self):
         """Loads results from a file"""
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open Results File", "", "Text Files (*.txt);;All Files (*)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Results File", "", FILE_FILTERS)
         
         if not file_path:
             return
         
-        try:
-            with open(file_path, 'r') as file:
-                content = file.read().strip()
-                results = [r for r in content.upper().split() if r in ['W', 'L']]
-                
-                if not results:
-                    self.statusBar.showMessage("No valid results found!")
-                    return
-                
-                # Clear current results
-                self.clear_all_results()
-                
-                # Add new results to bulk input and process
-                self.bulk_input.setText(' '.join(results))
-                self.add_bulk_results()
-                
-                self.statusBar.showMessage(f"Loaded {len(results)} results successfully.")
+        if file_path.endswith(SESSION_EXTENSION):
+            self.load_session(file_path)
+            return
         
+        if file_path.endswith(STORE_EXTENSION):
+            self.load_from_store(file_path)
+            return
+        
+        def task(engine, reporter):
+            # Stream the file straight into a history, reporting read progress
+            results, skipped = read_results(file_path, reporter("Reading results..."))
+            if not results:
+                raise ValueError("no valid results found")
+            
+            # Replace the current results with the new ones
+            engine.clear()
+            engine.add_results(results, reporter(f"Analyzing {len(results)} results..."))
+            
+            message = f"Loaded {len(results)} results successfully."
+            if skipped:
+                message += f" Skipped {skipped} invalid entries."
+            return message
+        
+        def loaded():
+            self.close_store()
+            self.snapshot_journal()
+        
+        self.start_worker("load_results", task, "Error loading file: ", on_done=loaded)
+    
+    def load_session(self, file_path):
+        """Loads a saved session with its prediction history and statistics"""
+        try:
+            load_session(file_path, self.engine)
         except Exception as e:
-            self.statusBar.showMessage(f"Error loading file: {str(e)}")
+            self.statusBar.showMessage(f"Error loading session: {str(e)}")
+            return
+        
+        self.close_store()
+        self.snapshot_journal()
+        self.clear_analysis()
+        self.update_display()
+        self.invalidate_analysis()
+        self.statusBar.showMessage(f"Loaded session with {len(self.engine.results)} results.")
     
     def save_results(self):
         """Saves results to a file"""
-        if not self.results:
+        if not self.engine.results:
             self.statusBar.showMessage("No results to save!")
             return
         
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save Results", "", "Text Files (*.txt);;All Files (*)")
+        file_path, selected_filter = QFileDialog.getSaveFileName(self, "Save Results", "", FILE_FILTERS)
         
         if not file_path:
             return
         
+        if selected_filter.startswith("WL Sessions") and "." not in os.path.basename(file_path):
+            file_path += SESSION_EXTENSION
+        elif selected_filter.startswith("WL Session Stores") and "." not in os.path.basename(file_path):
+            file_path += STORE_EXTENSION
+        
+        if file_path.endswith(STORE_EXTENSION):
+            self.save_to_store(file_path)
+            return
+        
         try:
-            with open(file_path, 'w') as file:
-                file.write(' '.join(self.results))
+            if file_path.endswith(SESSION_EXTENSION):
+                save_session(file_path, self.engine)
+            else:
+                write_results(file_path, self.engine.results)
             
-            self.statusBar.showMessage(f"Saved {len(self.results)} results successfully.")
+            self.statusBar.showMessage(f"Saved {len(self.engine.results)} results successfully.")
         
         except Exception as e:
             self.statusBar.showMessage(f"Error saving file: {str(e)}")
+    
+    def save_to_store(self, file_path):
+        """Saves the session into a session store and keeps recording it there"""
+        default_name = self.store.name if self.store else datetime.now().strftime("session-%Y%m%d-%H%M%S")
+        name, ok = QInputDialog.getText(self, "Save to Session Store", "Session name:", text=default_name)
+        name = name.strip()
+        if not ok or not name:
+            return
+        
+        # The session may be the one being recorded, so let go of it first
+        self.close_store()
+        try:
+            store = SessionStore(file_path)
+            store.save(name, self.engine)
+        except (sqlite3.Error, ValueError) as e:
+            self.statusBar.showMessage(f"Error saving to session store: {str(e)}")
+            return
+        
+        self.store = store
+        self.statusBar.showMessage(f"Saved {len(self.engine.results)} results as {name}, recording new results")
+    
+    def load_from_store(self, file_path):
+        """Loads a session from a session store and keeps recording it there"""
+        try:
+            store = SessionStore(file_path)
+            sessions = store.sessions()
+        except (sqlite3.Error, ValueError) as e:
+            self.statusBar.showMessage(f"Error opening session store: {str(e)}")
+            return
+        if not sessions:
+            store.close()
+            self.statusBar.showMessage("No sessions in the session store")
+            return
+        
+        labels = [f"{session['name']}  ({session['results']} results, "
+                  f"{datetime.fromtimestamp(session['updated']):%Y-%m-%d %H:%M})" for session in sessions]
+        label, ok = QInputDialog.getItem(self, "Open Stored Session", "Session:", labels, 0, False)
+        if not ok:
+            store.close()
+            return
+        name = sessions[labels.index(label)]["name"]
+        
+        # Write out what the current session has queued, it may be this one
+        self.close_store()
+        
+        def task(engine, reporter):
+            store.load(name, engine, reporter(f"Loading {name}..."))
+            return f"Loaded {name} with {len(engine.results)} results, recording new results"
+        
+        def record():
+            self.store = store
+            self.snapshot_journal()
+        
+        self.start_worker("load_from_store", task, "Error loading stored session: ", on_done=record)
+    
+    def record_session(self):
+        """Queues what changed for the session store, if the session is recorded"""
+        if not self.store:
+            return
+        try:
+            self.store.sync(self.engine)
+        except sqlite3.Error as e:
+            self.store = None
+            self.statusBar.showMessage(f"Session store error, recording stopped: {str(e)}")
+    
+    def flush_store(self):
+        # The store is busy loading while a worker runs
+        if not self.store or self.worker:
+            return
+        try:
+            self.store.flush()
+        except sqlite3.Error as e:
+            self.store = None
+            self.statusBar.showMessage(f"Session store error, recording stopped: {str(e)}")
+    
+    def close_store(self):
+        """Writes out and stops recording the session to its store"""
+        if not self.store:
+            return
+        store, self.store = self.store, None
+        try:
+            store.close()
+        except sqlite3.Error as e:
+            self.statusBar.showMessage(f"Session store error: {str(e)}")
+    
+    def open_journal(self, directory):
+        """Restores the session autosaved in directory and keeps autosaving to it
+        
+        Returns a message for the status bar.
+        """
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            return f"Autosave is off, its folder cannot be created: {str(e)}"
+        
+        # A second window must not write into the same journal
+        self.journal_lock = QLockFile(os.path.join(directory, "lock"))
+        if not self.journal_lock.tryLock(0):
+            self.journal_lock = None
+            return "Autosave is off, another window is autosaving"
+        
+        self.journal = Journal(directory)
+        try:
+            engine = self.journal.recover()
+        except (OSError, ValueError) as e:
+            # Start over from an empty session, the snapshot replaces the damaged files
+            self.journal.snapshot(self.engine)
+            return f"The autosaved session could not be restored: {str(e)}"
+        if engine is None:
+            return None
+        self.engine = engine
+        return f"Restored the autosaved session with {len(engine.results)} results"
+    
+    def journal_settings(self):
+        if self.journal:
+            self.journal.settings(self.engine)
+    
+    def snapshot_journal(self):
+        """Autosaves the whole session, after it was replaced rather than edited"""
+        if self.journal:
+            with self.timed("journal.snapshot"):
+                self.journal.snapshot(self.engine)
+    
+    def check_journal(self):
+        if not self.journal:
+            return
+        if self.journal.error:
+            # Whatever failed to be written is in the next snapshot
+            error, self.journal.error = self.journal.error, None
+            self.statusBar.showMessage(f"Autosave error: {str(error)}")
+            self.snapshot_journal()
+        elif self.journal.edits >= COMPACT_EDITS:
+            self.snapshot_journal()
+    
+    def close_journal(self):
+        """Writes out the autosave journal and releases its folder"""
+        if not self.journal:
+            return
+        self.journal.close()
+        self.journal = None
+        self.journal_lock.unlock()
+        self.journal_lock = None
 
 
 def main():
+    # Batch commands run without building the window
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMMANDS:
+        sys.exit(cli.main(sys.argv[1:]))
+    
     app = QApplication(sys.argv)
     
     # Apply dark theme to entire application
@@ -1655,7 +1969,7 @@ def main():
     app.setPalette(dark_palette)
     
     # Create and show the application
-    ex = ModernBaccaratAnalyzer()
+    ex = ModernBaccaratAnalyzer(AUTOSAVE_DIRECTORY)
     sys.exit(app.exec_())
 
 
@@ -0,0 +1,156 @@
+"""Substring search over the full result history
+
+SuffixIndex answers how often any W/L sequence occurred, where, and what
+followed it. It keeps a suffix array of a snapshot of the history; results
+appended since the snapshot, or the part of it a delete invalidated, are
+searched directly, and the snapshot is rebuilt once that part grows.
+Results evicted from a bounded history are left out of the snapshot's
+counts the same way.
+"""
+import bisect
+
+import numpy as np
+
+REBUILD_MIN = 1 << 16  # results searched directly before the snapshot is rebuilt
+
+
+def suffix_array(values):
+    """Start positions of all suffixes of values (W=1, L=0) in sorted order
+
+    Prefix doubling with NumPy: suffixes are ranked by their first 32
+    results, then by rank pairs for 64, 128, ... results until all ranks
+    differ. A suffix that ends sorts before the longer ones it starts.
+    """
+    values = np.asarray(values, dtype=np.uint8)
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # First 32 results as base 3 digits, 0 past the end, L=1, W=2
+    digits = np.concatenate((values.astype(np.int64) + 1, np.zeros(32, dtype=np.int64)))
+    keys = np.zeros(n, dtype=np.int64)
+    for j in range(32):
+        keys = keys * 3 + digits[j:j + n]
+
+    span = 32
+    while True:
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        ranks = np.empty(n, dtype=np.int64)
+        ranks[order] = np.concatenate(([0], np.cumsum(sorted_keys[1:] != sorted_keys[:-1])))
+        if ranks[order[-1]] == n - 1 or span >= n:
+            return order
+
+        # Order by the rank of the first span results, then of the next span
+        following = np.zeros(n, dtype=np.int64)
+        following[:n - span] = ranks[span:] + 1
+        keys = ranks * (n + 1) + following
+        span *= 2
+
+
+def _occurrences(values, query):
+    # Positions where query occurs in values, by a direct scan: the positions
+    # of its first value, narrowed down by each following value in turn
+    m = len(query)
+    if len(values) < m:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.flatnonzero(values[:len(values) - m + 1] == query[0])
+    for offset in range(1, m):
+        if not candidates.size:
+            break
+        candidates = candidates[values[candidates + offset] == query[offset]]
+    return candidates
+
+
+class SuffixIndex:
+    """Occurrences of any result sequence in a history, see search()"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.text = b""  # snapshot of the history the suffix array sorts
+        self.suffixes = np.zeros(0, dtype=np.int64)
+        self.valid = 0  # length of the snapshot that still matches the history
+        self.start = 0  # history.start when the snapshot was taken
+
+    def truncate(self, history):
+        """Notes that the last results of history were deleted"""
+        self.valid = min(self.valid, max(history.start + len(history) - self.start, 0))
+
+    def stale(self, history):
+        """Results a search of history would scan directly"""
+        evicted = history.start - self.start
+        end = evicted + len(history)  # the end of history in snapshot positions
+        return evicted + (end - self.valid) + (len(self.text) - self.valid)
+
+    def needs_rebuild(self, history):
+        return self.stale(history) > max(REBUILD_MIN, self.valid >> 3)
+
+    def rebuild(self, history):
+        values = history.array
+        self.text = values.tobytes()
+        self.suffixes = suffix_array(values).astype(np.int32 if len(values) < 1 << 31 else np.int64)
+        self.valid = len(values)
+        self.start = history.start
+
+    def _count(self, key):
+        # Suffixes of the snapshot starting with key, as a range of the suffix array
+        def prefix(position):
+            return self.text[position:position + len(key)]
+        low = bisect.bisect_left(self.suffixes, key, key=prefix)
+        return low, bisect.bisect_right(self.suffixes, key, lo=low, key=prefix)
+
+    def search(self, history, query, latest=1):
+        """Occurrences of query (W=1, L=0 values) in history, rebuilding the snapshot if needed
+
+        Returns {"count", "positions", "W", "L"}: how often query occurred,
+        the start positions in history of the latest occurrences, oldest
+        first, and how many times a W and an L followed it. latest is the
+        number of positions wanted, None for all of them. Takes
+        O(len(query) * log(len(history))) on the snapshot, plus a direct
+        scan of the results it does not cover and a pass over the
+        occurrences in the snapshot for the positions.
+        """
+        query = np.asarray(query, dtype=np.uint8)
+        m = len(query)
+        if not m:
+            raise ValueError("empty query")
+        if self.needs_rebuild(history):
+            self.rebuild(history)
+        values = history.array
+
+        # Occurrences starting from evicted, the snapshot position of the
+        # oldest result kept, up to cut have the query and the result after
+        # it within the part of the snapshot that is still valid
+        evicted = history.start - self.start
+        cut = max(self.valid - m, evicted)
+        snapshot = np.frombuffer(self.text, dtype=np.uint8)
+        key = query.tobytes()
+        low, high = self._count(key)
+        outside = np.concatenate((_occurrences(snapshot[:evicted + m - 1], query),
+                                  _occurrences(snapshot[cut:], query) + cut))
+
+        next_counts = []
+        for outcome in (0, 1):
+            outcome_low, outcome_high = self._count(key + bytes([outcome]))
+            outside_with = np.count_nonzero(snapshot[outside[outside + m < len(snapshot)] + m] == outcome)
+            next_counts.append(outcome_high - outcome_low - int(outside_with))
+
+        # The rest is scanned in the current history
+        recent = _occurrences(values[cut - evicted:], query) + (cut - evicted)
+        followed = recent[recent + m < len(values)]
+        next_counts[0] += int(np.count_nonzero(values[followed + m] == 0))
+        next_counts[1] += int(np.count_nonzero(values[followed + m] == 1))
+
+        # Only the latest positions in the snapshot are picked out and sorted
+        count = high - low - len(outside) + len(recent)
+        wanted = count if latest is None else min(latest, count)
+        older = wanted - len(recent)
+        if older <= 0:
+            positions = recent[len(recent) - wanted:]
+        else:
+            found = self.suffixes[low:high]
+            found = found[(found >= evicted) & (found < cut)]
+            found = np.partition(found, len(found) - older)[len(found) - older:]
+            positions = np.concatenate((np.sort(found).astype(np.int64) - evicted, recent))
+        return {"count": count, "positions": positions, "W": next_counts[1], "L": next_counts[0]}
@@ -0,0 +1,326 @@
+"""Local result feed server: newline-delimited JSON over TCP or a Unix socket
+
+    python pattern.py serve --address 127.0.0.1:8765 --workers 4
+    python pattern.py feed --address 127.0.0.1:8765 --tables 50 --rate 5000
+
+Every request is one JSON object on a line, every reply one line back, in
+request order per connection; a request's "id", if any, is echoed:
+
+    {"op": "add", "session": "t1", "result": "W"}           -> {"ok": true, "session": "t1", "prediction": {...}}
+    {"op": "add", "session": "t1", "results": "W L W"}
+    {"op": "predict", "session": "t1"}                     -> {"ok": true, "predictions": {"t1": ...}}
+    {"op": "predict"}                                      (every session; "sessions": [...] for some)
+    {"op": "stats", "session": "t1"}                       -> {"ok": true, "stats": {...}}
+    {"op": "sessions"}                                     -> {"ok": true, "sessions": [...]}
+    {"op": "open", "session": "t1", "settings": {"max_pattern_length": 7}}
+    {"op": "close", "session": "t1"}
+    {"op": "subscribe", "session": "t1"}                   -> {"ok": true, "results": "WLW..."}
+
+A subscriber also receives {"event": "result", "session", "results",
+"prediction"} lines for everything added to the session afterwards.
+Failed requests get {"ok": false, "error": "..."}; lines that are not a
+JSON object are answered right away, ahead of any queued replies.
+
+Requests from all connections go through one queue. While a batch is being
+analyzed the next one gathers, and consecutive adds in it reach the
+SessionManager as one add_results call, so the latency of a request stays
+within about two batches however fast events arrive.
+"""
+import asyncio
+import json
+import os
+import random
+import stat
+import time
+
+from engine import RESULT_CODES
+from sessions import BatchError
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+BATCH_MAX = 4096  # requests analyzed per batch
+QUEUE_LIMIT = 65536  # queued requests before connections stop being read
+WRITE_LIMIT = 1 << 20  # unsent reply bytes before a connection stops being read
+LINE_LIMIT = 1 << 20  # longest request line
+
+
+def parse_address(address):
+    """("tcp", (host, port)) for host:port, otherwise ("unix", path)"""
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit() and '/' not in address:
+        return "tcp", (host or "127.0.0.1", int(port))
+    return "unix", address
+
+
+async def open_connection(address):
+    """asyncio streams connected to a server address"""
+    kind, where = parse_address(address)
+    if kind == "tcp":
+        return await asyncio.open_connection(*where, limit=LINE_LIMIT)
+    return await asyncio.open_unix_connection(where, limit=LINE_LIMIT)
+
+
+def _results(request):
+    # The results of an add request as a list of W/L
+    if "result" in request:
+        results = [request["result"]]
+    else:
+        results = request.get("results")
+        if isinstance(results, str):
+            results = results.split() if ' ' in results.strip() else list(results.strip())
+    if not results or not isinstance(results, list) or any(result not in RESULT_CODES for result in results):
+        raise ValueError("add needs a result or results of W and L")
+    return results
+
+
+def _session(request):
+    if "session" not in request:
+        raise ValueError(f"{request.get('op')} needs a session")
+    return str(request["session"])
+
+
+class ResultServer:
+    """Serves a SessionManager to local clients, see the module docstring"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.subscribers = {}  # session id -> writers of subscribed connections
+        self.clients = {}  # handler task -> writer of every open connection
+        self.server = None
+        self.queue = None
+        self.batcher = None
+        self.unix_path = None
+
+    async def start(self, address=DEFAULT_ADDRESS):
+        self.queue = asyncio.Queue(QUEUE_LIMIT)
+        self.batcher = asyncio.create_task(self._run_batches())
+        kind, where = parse_address(address)
+        if kind == "tcp":
+            self.server = await asyncio.start_server(self._serve_client, *where, limit=LINE_LIMIT)
+        else:
+            # A socket file left by a server that did not shut down cleanly
+            if os.path.exists(where) and stat.S_ISSOCK(os.stat(where).st_mode):
+                os.unlink(where)
+            self.server = await asyncio.start_unix_server(self._serve_client, where, limit=LINE_LIMIT)
+            self.unix_path = where
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        for writer in self.clients.values():
+            writer.close()
+        await asyncio.gather(*self.clients, return_exceptions=True)
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    async def _serve_client(self, reader, writer):
+        task = asyncio.current_task()
+        self.clients[task] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request is a JSON object")
+                except ValueError as e:
+                    self._send(writer, {"ok": False, "error": f"invalid request: {e}"})
+                    continue
+                await self.queue.put((writer, request))
+
+                # Stop reading from a client that does not read its replies
+                if writer.transport.get_write_buffer_size() > WRITE_LIMIT:
+                    await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # dropped connection, or a line longer than LINE_LIMIT
+        finally:
+            for writers in self.subscribers.values():
+                writers.discard(writer)
+            del self.clients[task]
+            writer.close()
+
+    def _send(self, writer, message):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b"\n")
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < BATCH_MAX and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            # Analyze in a thread so the loop keeps reading the next batch
+            try:
+                replies = await loop.run_in_executor(None, self._apply, [request for _, request in batch])
+            except Exception as e:
+                # The batch is lost, not the server
+                replies = [{"ok": False, "error": f"{request.get('op')}: {e}"} for _, request in batch]
+
+            for (writer, request), reply in zip(batch, replies):
+                if "id" in request:
+                    reply["id"] = request["id"]
+                self._send(writer, reply)
+
+                # In request order, so a subscriber gets exactly what came after its snapshot
+                op = request.get("op")
+                if reply["ok"] and op == "subscribe":
+                    self.subscribers.setdefault(reply["session"], set()).add(writer)
+                elif reply["ok"] and op == "unsubscribe":
+                    self.subscribers.get(reply["session"], set()).discard(writer)
+                elif reply["ok"] and op == "add":
+                    event = {"event": "result", "session": reply["session"], "results": reply["results"],
+                             "prediction": reply["prediction"]}
+                    for subscriber in self.subscribers.get(reply["session"], ()):
+                        self._send(subscriber, event)
+
+    def _apply(self, requests):
+        # Runs the requests in order in the executor thread, adds in a row as
+        # one batch for the manager; returns a reply per request
+        replies = [None] * len(requests)
+        adds = []  # (request index, session, results)
+
+        def add_pending():
+            # Never raises: a failed add is answered on its own request
+            if not adds:
+                return
+            errors = {}
+            try:
+                predictions = self.manager.add_results([(session, result) for _, session, results in adds
+                                                        for result in results])
+            except BatchError as e:
+                predictions, errors = e.predictions, e.errors
+            except Exception as e:
+                predictions = {}
+                errors = {session: e for _, session, _ in adds}
+            for i, session, results in adds:
+                if session in predictions:
+                    replies[i] = {"ok": True, "session": session, "results": results,
+                                  "prediction": predictions[session]}
+                else:
+                    replies[i] = {"ok": False, "error": f"add: {errors[session]}"}
+            adds.clear()
+
+        for i, request in enumerate(requests):
+            op = request.get("op")
+            try:
+                if op == "add":
+                    adds.append((i, _session(request), _results(request)))
+                    continue
+            except (ValueError, TypeError) as e:
+                replies[i] = {"ok": False, "error": f"{op}: {e}"}
+                continue
+            add_pending()
+            try:
+                replies[i] = self._query(op, request)
+            except KeyError as e:
+                replies[i] = {"ok": False, "error": f"{op}: unknown session {e.args[0]!r}"}
+            except Exception as e:
+                replies[i] = {"ok": False, "error": f"{op}: {e}"}
+        add_pending()
+        return replies
+
+    def _query(self, op, request):
+        # Every request but add, as a reply
+        manager = self.manager
+        if op == "predict":
+            if "session" in request:
+                session_ids = [_session(request)]
+            else:
+                session_ids = [str(session_id) for session_id in request["sessions"]] if "sessions" in request else None
+            return {"ok": True, "predictions": manager.predict(session_ids)}
+        if op == "stats":
+            return {"ok": True, "stats": manager.stats(_session(request))}
+        if op == "sessions":
+            return {"ok": True, "sessions": manager.session_ids()}
+        if op == "open":
+            manager.open(_session(request), **request.get("settings", {}))
+            return {"ok": True, "session": _session(request)}
+        if op == "close":
+            manager.close(_session(request))
+            return {"ok": True, "session": _session(request)}
+        if op == "subscribe":
+            session = _session(request)
+            try:
+                results = ''.join(manager.engine(session).results)
+            except KeyError:
+                results = ""  # nothing added yet
+            return {"ok": True, "session": session, "results": results}
+        if op == "unsubscribe":
+            return {"ok": True, "session": _session(request)}
+        raise ValueError("unknown op")
+
+
+async def serve(address, manager, ready=None):
+    """Serves manager on address until cancelled; ready(server) is called once listening"""
+    result_server = ResultServer(manager)
+    await result_server.start(address)
+    if ready:
+        ready(result_server)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await result_server.close()
+
+
+async def fake_feed(address, tables=10, rate=1000, duration=10.0, bias=0.5, seed=0):
+    """Sends random results for tables at about rate events per second
+
+    Returns {"events", "seconds", "latency_ms": {"p50", "p95", "max"}},
+    the latency being the time from sending an add to reading its reply.
+    """
+    reader, writer = await open_connection(address)
+    rnd = random.Random(seed)
+    sessions = [f"table-{i}" for i in range(tables)]
+    sent = {}  # request id -> send time
+    latencies = []
+
+    async def read_replies():
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("the server closed the connection")
+            reply = json.loads(line)
+            if not reply["ok"]:
+                raise RuntimeError(reply["error"])
+            latencies.append(time.perf_counter() - sent.pop(reply["id"]))
+            if not sent and done.is_set():
+                return
+
+    done = asyncio.Event()
+    replies = asyncio.create_task(read_replies())
+    start = time.perf_counter()
+    tick = 0.01
+    events = 0
+    while time.perf_counter() - start < duration and not replies.done():
+        # Events due by now, sent in one write
+        due = int((time.perf_counter() - start + tick) * rate) - events
+        lines = []
+        for _ in range(max(due, 0)):
+            sent[events] = time.perf_counter()
+            lines.append(json.dumps({"op": "add", "id": events, "session": rnd.choice(sessions),
+                                     "result": 'W' if rnd.random() < bias else 'L'}))
+            events += 1
+        if lines:
+            writer.write(("\n".join(lines) + "\n").encode())
+            await writer.drain()
+        await asyncio.sleep(tick)
+
+    done.set()
+    if sent or replies.done():
+        await replies
+    else:
+        replies.cancel()
+    seconds = time.perf_counter() - start
+    writer.close()
+
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1e3 if latencies else 0
+
+    return {"events": events, "seconds": seconds,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}}
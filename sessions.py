@@ -0,0 +1,279 @@
+"""Many independent analysis sessions, such as one per table, in one process
+
+    with SessionManager(workers=4, retention=5000) as manager:
+        manager.add_results([("table-1", "W"), ("table-2", "L"), ("table-1", "L")])
+        manager.predict()  # {session_id: prediction or None} for every session
+
+Each session is an AnalysisEngine of its own. Sessions are spread over
+worker processes by a hash of their id: a batch of results is split by
+worker, every worker analyzes its part at the same time, and within a
+worker each session's results are added in arrival order in one pass.
+With workers=0 the sessions live in the calling process.
+"""
+import multiprocessing
+import numbers
+import zlib
+
+from engine import ALGORITHMS, AnalysisEngine, MAX_PATTERN_LENGTH, MIN_RETENTION, RESULT_CODES
+
+SETTINGS = ("significance_threshold", "max_pattern_length", "active_algorithm", "trend_windows", "half_life",
+            "retention")
+
+
+def _is_int(value):
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+
+def check_settings(settings):
+    """Raises ValueError unless settings are valid AnalysisEngine arguments"""
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise ValueError(f"unknown settings {', '.join(sorted(map(str, unknown)))}")
+    threshold = settings.get("significance_threshold", 5)
+    if not isinstance(threshold, numbers.Real) or isinstance(threshold, bool) or threshold != threshold:
+        raise ValueError("significance_threshold must be a number")
+    length = settings.get("max_pattern_length", 5)
+    if not _is_int(length) or not 1 <= length <= MAX_PATTERN_LENGTH:
+        raise ValueError(f"max_pattern_length must be a whole number within 1-{MAX_PATTERN_LENGTH}")
+    if settings.get("active_algorithm", "pattern") not in ALGORITHMS:
+        raise ValueError(f"active_algorithm must be one of {', '.join(ALGORITHMS)}")
+    windows = settings.get("trend_windows", (2,))
+    if (not isinstance(windows, (list, tuple)) or not windows
+            or not all(_is_int(size) and size >= 2 for size in windows)):
+        raise ValueError("trend_windows must be whole numbers of at least 2")
+    half_life = settings.get("half_life", 0)
+    if not isinstance(half_life, numbers.Real) or isinstance(half_life, bool) or not half_life >= 0:
+        raise ValueError("half_life must be a number of at least 0")
+    retention = settings.get("retention", 0)
+    if not _is_int(retention) or not (retention == 0 or retention >= MIN_RETENTION):
+        raise ValueError(f"retention must be 0, to keep all results, or at least {MIN_RETENTION}")
+
+
+class BatchError(Exception):
+    """Some sessions of an add_results batch failed, the others were added
+
+    predictions holds {session_id: prediction} of the sessions whose results
+    were added, errors {session_id: exception} of those whose were not.
+    """
+    def __init__(self, predictions, errors):
+        super().__init__("; ".join(f"{session_id}: {error}" for session_id, error in errors.items()))
+        self.predictions = predictions
+        self.errors = errors
+
+
+class _Shard:
+    """The sessions one worker owns, and the commands SessionManager sends it"""
+    def __init__(self, settings):
+        self.settings = settings  # AnalysisEngine arguments of new sessions
+        self.sessions = {}
+
+    def open(self, session_id, settings):
+        if session_id in self.sessions:
+            raise ValueError(f"session {session_id!r} is already open")
+        self.sessions[session_id] = AnalysisEngine(**dict(self.settings, **settings))
+
+    def close(self, session_id):
+        del self.sessions[session_id]
+
+    def add_results(self, batches):
+        # batches maps session ids to their new results, oldest first; a
+        # session that fails does not keep the others from being added
+        predictions = {}
+        errors = {}
+        for session_id, results in batches.items():
+            try:
+                engine = self.sessions.get(session_id)
+                if engine is None:
+                    engine = self.sessions[session_id] = AnalysisEngine(**self.settings)
+                if len(results) == 1:
+                    engine.add_result(results[0])
+                else:
+                    engine.add_results(results)
+                predictions[session_id] = engine.predict_next()
+            except Exception as e:
+                errors[session_id] = e
+        return predictions, errors
+
+    def predict(self, session_ids):
+        if session_ids is None:
+            session_ids = self.sessions
+        return {session_id: self.sessions[session_id].predict_next() for session_id in session_ids}
+
+    def stats(self, session_id):
+        engine = self.sessions[session_id]
+        streak, result = engine.result_streak()
+        return {
+            "results": len(engine.results),
+            "evicted": engine.results.start,
+            "win_rate": engine.results.count('W') / len(engine.results) * 100 if engine.results else 0,
+            "streak": {"length": streak, "result": result},
+            "prediction_stats": dict(engine.prediction_stats),
+            "accuracy": engine.accuracy(),
+            "next_prediction": engine.predict_next()
+        }
+
+    def engine(self, session_id):
+        return self.sessions[session_id]
+
+    def session_ids(self):
+        return list(self.sessions)
+
+
+def _serve(connection, settings):
+    # Worker process: runs commands on its shard until told to stop
+    shard = _Shard(settings)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break  # the manager's process is gone
+        if message is None:
+            break
+        command, args = message
+        try:
+            reply = (True, getattr(shard, command)(*args))
+        except Exception as e:
+            reply = (False, e)
+        connection.send(reply)
+    connection.close()
+
+
+class SessionManager:
+    """Independent AnalysisEngine sessions by id, sharded over worker processes
+
+    settings are the AnalysisEngine arguments of new sessions; a retention
+    keeps the memory of every live session bounded. Results for a session
+    that is not open yet open it with these settings. Invalid settings
+    raise ValueError.
+    """
+    def __init__(self, workers=0, **settings):
+        check_settings(settings)
+        self.settings = settings
+        self.local = None
+        self.workers = []  # (process, connection) per shard
+        if not workers:
+            self.local = _Shard(settings)
+            return
+
+        for _ in range(workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(worker_connection, settings), daemon=True)
+            process.start()
+            worker_connection.close()
+            self.workers.append((process, connection))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def __len__(self):
+        return len(self.session_ids())
+
+    def shard(self, session_id):
+        """Index of the worker that owns a session"""
+        if not self.workers:
+            return 0
+        return zlib.crc32(str(session_id).encode()) % len(self.workers)
+
+    def _call(self, calls):
+        # Runs {shard: (command, args)}, sending every command before waiting
+        # for any reply so the workers run them at the same time
+        if self.local is not None:
+            return {shard: getattr(self.local, command)(*args) for shard, (command, args) in calls.items()}
+        if not self.workers:
+            raise RuntimeError("the session manager was shut down")
+
+        for shard, message in calls.items():
+            self.workers[shard][1].send(message)
+        replies = {}
+        error = None
+        for shard in calls:
+            ok, value = self.workers[shard][1].recv()
+            if ok:
+                replies[shard] = value
+            elif error is None:
+                error = value
+        if error is not None:
+            raise error
+        return replies
+
+    def _call_one(self, session_id, command, *args):
+        shard = self.shard(session_id)
+        return self._call({shard: (command, args)})[shard]
+
+    def open(self, session_id, **settings):
+        """Opens a session, with settings overriding the manager's
+
+        Raises ValueError if the settings are invalid or the session is open.
+        """
+        check_settings(dict(self.settings, **settings))
+        self._call_one(session_id, "open", session_id, settings)
+
+    def close(self, session_id):
+        """Closes a session and frees its state, KeyError if it is not open"""
+        self._call_one(session_id, "close", session_id)
+
+    def add_results(self, events):
+        """Adds (session_id, result) events in arrival order
+
+        Returns {session_id: prediction} with the next prediction, or None,
+        of every session the events added to. If adding to some sessions
+        fails, the others are added all the same and BatchError tells which
+        were and which were not.
+        """
+        batches = {}
+        for session_id, result in events:
+            if result not in RESULT_CODES:
+                raise ValueError(f"invalid result {result!r} for session {session_id!r}, expected W or L")
+            batches.setdefault(self.shard(session_id), {}).setdefault(session_id, []).append(result)
+
+        predictions = {}
+        errors = {}
+        for shard_predictions, shard_errors in self._call({shard: ("add_results", (batch,))
+                                                           for shard, batch in batches.items()}).values():
+            predictions.update(shard_predictions)
+            errors.update(shard_errors)
+        if errors:
+            raise BatchError(predictions, errors)
+        return predictions
+
+    def predict(self, session_ids=None):
+        """{session_id: next prediction or None} for session_ids, or for every session"""
+        if session_ids is None:
+            calls = {shard: ("predict", (None,)) for shard in range(max(len(self.workers), 1))}
+        else:
+            ids_by_shard = {}
+            for session_id in session_ids:
+                ids_by_shard.setdefault(self.shard(session_id), []).append(session_id)
+            calls = {shard: ("predict", (ids,)) for shard, ids in ids_by_shard.items()}
+
+        predictions = {}
+        for reply in self._call(calls).values():
+            predictions.update(reply)
+        return predictions
+
+    def stats(self, session_id):
+        """Result counts, prediction scores and the next prediction of a session"""
+        return self._call_one(session_id, "stats", session_id)
+
+    def engine(self, session_id):
+        """The AnalysisEngine of a session, a copy when it lives in a worker"""
+        return self._call_one(session_id, "engine", session_id)
+
+    def session_ids(self):
+        ids = []
+        for reply in self._call({shard: ("session_ids", ()) for shard in range(max(len(self.workers), 1))}).values():
+            ids.extend(reply)
+        return ids
+
+    def shutdown(self):
+        """Stops the worker processes and drops all sessions"""
+        for process, connection in self.workers:
+            connection.send(None)
+            connection.close()
+        for process, _ in self.workers:
+            process.join()
+        self.workers = []
+        self.local = None
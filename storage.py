@@ -0,0 +1,243 @@
+"""Reading and writing result files and saved sessions"""
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from engine import (AnalysisEngine, PredictionTrace, ResultHistory, BYTE_CLASSES,
+                    parse_results)
+
+READ_CHUNK_SIZE = 1 << 24
+
+# Session files: magic, format version, header length, JSON header, then the
+# arrays listed in the header, each aligned to _ALIGNMENT bytes
+SESSION_EXTENSION = ".wls"
+SESSION_MAGIC = b"WLSESSN\0"
+SESSION_VERSION = 4  # 2: pattern counts as a context trie, 3: decayed pattern weights, 4: start of a bounded history
+_SESSION_PREFIX = struct.Struct("<8sIQ")
+_ALIGNMENT = 64
+_SETTINGS = ("significance_threshold", "max_pattern_length", "active_algorithm", "trend_windows", "half_life",
+             "retention")
+
+
+def read_results(path, progress=None, chunk_size=READ_CHUNK_SIZE):
+    """Streams a text file of W/L tokens into a ResultHistory
+
+    The file is memory-mapped and parsed chunk by chunk, so only one chunk's
+    temporaries exist at a time. Tokens other than a single W or L are
+    skipped, as the bulk entry does. progress, if given, is called as
+    progress(bytes_done, bytes_total) after each chunk.
+    Returns (history, skipped_tokens).
+    """
+    history = ResultHistory()
+    skipped = 0
+    
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return history, 0
+        
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = np.frombuffer(data, dtype=np.uint8)
+            position = 0
+            
+            while position < size:
+                end = min(position + chunk_size, size)
+                
+                # Cut the chunk after its last whitespace so no token is split
+                if end < size:
+                    whitespace = np.flatnonzero(BYTE_CLASSES[view[position:end]] == 0)
+                    while not whitespace.size and end < size:
+                        end = min(end + chunk_size, size)
+                        whitespace = np.flatnonzero(BYTE_CLASSES[view[position:end]] == 0)
+                    if end < size:
+                        end = position + int(whitespace[-1]) + 1
+                
+                values, chunk_skipped = parse_results(view[position:end])
+                history.extend(values)
+                skipped += chunk_skipped
+                position = end
+                
+                if progress:
+                    progress(position, size)
+            
+            del view
+    
+    return history, skipped
+
+
+def write_results(path, history):
+    """Writes results as space separated W/L text"""
+    with open(path, 'w') as file:
+        for chunk in history.iter_text():
+            file.write(chunk)
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def save_session(path, engine):
+    """Saves results, prediction trace and pattern counts in binary form"""
+    index = engine.pattern_index
+    arrays = {
+        "results": engine.results.packbits(),
+        "prediction_targets": engine.prediction_history.targets.packbits(),
+        "prediction_actuals": engine.prediction_history.actuals.packbits(),
+        "pattern_children": index.children[:index.size],
+        "pattern_counts": index.counts[:index.size],
+        "pattern_codes": index.codes[:index.size],
+        "pattern_depths": index.depths[:index.size]
+    }
+    if index.half_life:
+        arrays["pattern_weights"] = index.weights[:index.size]
+        arrays["pattern_stamps"] = index.stamps[:index.size]
+    
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _aligned(offset + array.nbytes)
+    
+    header = json.dumps({
+        "saved": datetime.now().isoformat(timespec="seconds"),
+        "results": len(engine.results),
+        "results_start": engine.results.start,
+        "predictions": len(engine.prediction_history),
+        "max_pattern_length": index.max_length,
+        "pattern_half_life": index.half_life,
+        "pattern_time": index.time,
+        "settings": {
+            "significance_threshold": engine.significance_threshold,
+            "max_pattern_length": engine.max_pattern_length,
+            "active_algorithm": engine.active_algorithm,
+            "trend_windows": engine.trend_windows,
+            "half_life": engine.half_life,
+            "retention": engine.retention
+        },
+        "trend_windows": engine.trend_windows,
+        "trend_counts": engine.trend_counts(),
+        "prediction_stats": engine.prediction_stats,
+        "loss_streak_predictions": engine.loss_streak_predictions,
+        "arrays": sections
+    }).encode()
+    data_start = _aligned(_SESSION_PREFIX.size + len(header))
+    
+    # Write next to the target and swap it in, so a failed save keeps the old file
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(_SESSION_PREFIX.pack(SESSION_MAGIC, SESSION_VERSION, len(header)))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(data_start + sections[name]["offset"])
+            file.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temp_path, path)
+
+
+def load_session(path, engine=None):
+    """Loads a saved session into engine (or a new one) and returns it
+
+    The saved prediction trace, statistics and pattern counts are taken as
+    they are, only a version 1 file has its patterns recounted. The arrays
+    are read into the engine, so loading takes time in the size of the file.
+    The whole file is checked and loaded before engine changes: a damaged
+    file raises ValueError and leaves engine as it was.
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        prefix = file.read(_SESSION_PREFIX.size)
+        if len(prefix) < _SESSION_PREFIX.size:
+            raise ValueError("Not a WL session file")
+        magic, version, header_length = _SESSION_PREFIX.unpack(prefix)
+        if magic != SESSION_MAGIC:
+            raise ValueError("Not a WL session file")
+        if version > SESSION_VERSION:
+            raise ValueError(f"Unsupported session file version {version}")
+        if _SESSION_PREFIX.size + header_length > size:
+            raise ValueError("Session file is cut short")
+        header = json.loads(file.read(header_length))
+        data_start = _aligned(_SESSION_PREFIX.size + header_length)
+        
+        # Every section must lie inside the file before any is read
+        try:
+            sections = {}
+            for name, info in header["arrays"].items():
+                dtype = np.dtype(info["dtype"])
+                shape = tuple(int(length) for length in info["shape"])
+                offset = int(info["offset"])
+                if offset < 0 or min(shape, default=0) < 0:
+                    raise ValueError(f"Bad session file section {name}")
+                count = int(np.prod(shape))
+                if data_start + offset + count * dtype.itemsize > size:
+                    raise ValueError("Session file is cut short")
+                sections[name] = (dtype, shape, offset, count)
+            
+            arrays = {}
+            for name, (dtype, shape, offset, count) in sections.items():
+                file.seek(data_start + offset)
+                arrays[name] = np.fromfile(file, dtype=dtype, count=count).reshape(shape)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Bad session file header: {e!r}") from e
+    
+    try:
+        loaded = _load_engine(version, header, arrays, engine)
+    except (KeyError, TypeError, AttributeError, IndexError) as e:
+        raise ValueError(f"Bad session file: {e!r}") from e
+    if engine is None:
+        return loaded
+    engine.__dict__.update(loaded.__dict__)
+    return engine
+
+
+def _load_engine(version, header, arrays, engine):
+    # A new engine with the settings of engine, or of the file if there is none
+    settings = header["settings"]
+    if engine is not None:
+        settings = {name: getattr(engine, name) for name in _SETTINGS}
+    loaded = AnalysisEngine(significance_threshold=settings["significance_threshold"],
+                            max_pattern_length=settings["max_pattern_length"],
+                            active_algorithm=settings["active_algorithm"],
+                            trend_windows=settings["trend_windows"],
+                            half_life=settings.get("half_life", 0),
+                            retention=settings.get("retention", 0))
+    
+    results, predictions = header["results"], header["predictions"]
+    for name, count in (("results", results), ("prediction_targets", predictions),
+                        ("prediction_actuals", predictions)):
+        if not 0 <= count <= arrays[name].size * 8:
+            raise ValueError(f"Session file section {name} is too short")
+    loaded.results = ResultHistory.from_packed(arrays["results"], results, header.get("results_start", 0))
+    loaded.prediction_history = PredictionTrace(ResultHistory.from_packed(arrays["prediction_targets"], predictions),
+                                                ResultHistory.from_packed(arrays["prediction_actuals"], predictions))
+    loaded.prediction_stats = header["prediction_stats"]
+    loaded.loss_streak_predictions = header["loss_streak_predictions"]
+    loaded.trend_index.load(header["trend_windows"],
+                            {int(size): counts for size, counts in header["trend_counts"].items()}, results)
+    
+    if version >= 2:
+        names = ["pattern_children", "pattern_counts", "pattern_codes", "pattern_depths"]
+        half_life = header.get("pattern_half_life", 0) if version >= 3 else 0
+        if half_life:
+            names += ["pattern_weights", "pattern_stamps"]
+        nodes = len(arrays["pattern_codes"])
+        children = arrays["pattern_children"]
+        if any(len(arrays[name]) != nodes for name in names) or not nodes or \
+                children.size != 2 * nodes or not np.all(children < nodes):
+            raise ValueError("Session file pattern counts do not match")
+        if half_life:
+            loaded.pattern_index.load(header["max_pattern_length"], *(arrays[name] for name in names[:4]),
+                                      half_life, arrays["pattern_weights"], arrays["pattern_stamps"],
+                                      header["pattern_time"])
+        else:
+            loaded.pattern_index.load(header["max_pattern_length"], *(arrays[name] for name in names))
+    else:
+        # Version 1 kept a count table per length, recount into a trie
+        loaded.pattern_index.rebuild(loaded.results, loaded.max_pattern_length)
+    
+    # A session saved with more results than engine keeps
+    loaded.trim()
+    loaded.analyze()
+    return loaded
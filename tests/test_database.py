@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import database
+from database import SessionStore
+from engine import MIN_RETENTION, AnalysisEngine
+
+
+def assert_same_statistics(loaded, engine):
+    assert ''.join(loaded.results) == ''.join(engine.results)
+    assert loaded.results.start == engine.results.start
+    assert loaded.prediction_stats == engine.prediction_stats
+    assert list(loaded.prediction_history) == list(engine.prediction_history)
+    assert loaded.accuracy() == engine.accuracy()
+    assert loaded.loss_streak_predictions == engine.loss_streak_predictions
+    assert loaded.predict_next() == engine.predict_next()
+    assert loaded.pattern_stats == engine.pattern_stats
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("retention", [0, MIN_RETENTION, 150])
+@pytest.mark.parametrize("chunk_results", [16, database.CHUNK_RESULTS])
+def test_reopened_session_has_the_same_statistics(tmp_path, monkeypatch, chunk_results, retention, seed):
+    # Small rows make loads and deletes cross row boundaries
+    monkeypatch.setattr(database, "CHUNK_RESULTS", chunk_results)
+    monkeypatch.setattr(database, "FLUSH_RESULTS", 8)
+    rnd = random.Random(seed)
+    path = str(tmp_path / "sessions.wldb")
+    engine = AnalysisEngine(significance_threshold=2, max_pattern_length=4, retention=retention)
+    store = SessionStore(path)
+    store.save("table", engine)
+
+    for _ in range(600):
+        if rnd.random() < 0.8:
+            engine.add_result(rnd.choice("WL"))
+        else:
+            for _ in range(rnd.randrange(1, 4)):
+                engine.delete_last_result()
+        store.sync(engine)
+
+        if rnd.random() < 0.02:
+            store.close()
+            store = SessionStore(path)
+            loaded = store.load("table")
+            assert_same_statistics(loaded, engine)
+            engine = loaded
+    store.close()
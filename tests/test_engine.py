@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+import pytest
+
+from engine import (ALGORITHMS, MIN_RETENTION, AnalysisEngine, new_prediction_stats, same_loss_streak_records,
+                    score_predictions, walk_forward)
+
+
+def results(rnd, count):
+    # Runs of repeats, so patterns recur and predictions are made
+    stick = rnd.random()
+    out = ['W']
+    while len(out) < count:
+        out.append(out[-1] if rnd.random() < stick else rnd.choice("WL"))
+    return out
+
+
+def assert_same(engine, other):
+    assert ''.join(engine.results) == ''.join(other.results)
+    assert engine.results.start == other.results.start
+    assert engine.prediction_stats == other.prediction_stats
+    assert list(engine.prediction_history) == list(other.prediction_history)
+    assert same_loss_streak_records(engine.loss_streak_predictions, other.loss_streak_predictions)
+    assert engine.predict_next() == other.predict_next()
+    assert engine.pattern_stats == other.pattern_stats
+    assert engine.matrix_stats == other.matrix_stats
+    assert engine.adaptive_stats == other.adaptive_stats
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("retention", [0, MIN_RETENTION])
+@pytest.mark.parametrize("half_life", [0, 30])
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_add_results_scores_like_add_result(algorithm, half_life, retention, seed):
+    rnd = random.Random(seed)
+    settings = {"significance_threshold": rnd.randrange(1, 6), "max_pattern_length": rnd.choice([3, 5, 10]),
+                "active_algorithm": algorithm, "trend_windows": sorted(rnd.sample(range(2, 30), 3)),
+                "half_life": half_life, "retention": retention}
+    clicked = AnalysisEngine(**settings)
+    bulk = AnalysisEngine(**settings)
+
+    # The same edits, results one by one against in runs, deletes between them
+    for _ in range(12):
+        run = results(rnd, rnd.randrange(1, 120))
+        for result in run:
+            clicked.add_result(result)
+        bulk.add_results(run)
+        for _ in range(rnd.choice([0, 0, 1, 3])):
+            assert clicked.delete_last_result() == bulk.delete_last_result()
+        assert_same(clicked, bulk)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_walk_forward_scores_every_algorithm_like_add_result(chunk_size):
+    rnd = random.Random(chunk_size)
+    run = results(rnd, 400)
+    values = np.array([result == 'W' for result in run], dtype=np.uint8)
+    scores = {algorithm: (new_prediction_stats(), []) for algorithm in ALGORITHMS}
+    for chunk, _ in walk_forward(values, 0, 5, 3, [5, 10], ALGORITHMS, chunk_size=chunk_size):
+        for algorithm in ALGORITHMS:
+            score_predictions(scores[algorithm][0], chunk[algorithm], values, None, scores[algorithm][1])
+
+    for algorithm in ALGORITHMS:
+        engine = AnalysisEngine(significance_threshold=3, active_algorithm=algorithm, trend_windows=[5, 10])
+        for result in run:
+            engine.add_result(result)
+        assert engine.prediction_stats == scores[algorithm][0]
+        assert engine.loss_streak_predictions == scores[algorithm][1]
@@ -0,0 +1,159 @@
+import os
+import random
+
+import pytest
+
+import journal
+from engine import AnalysisEngine, same_loss_streak_records
+from journal import Journal, replay
+
+
+def assert_same_statistics(loaded, engine):
+    assert ''.join(loaded.results) == ''.join(engine.results)
+    assert loaded.results.start == engine.results.start
+    assert loaded.prediction_stats == engine.prediction_stats
+    assert list(loaded.prediction_history) == list(engine.prediction_history)
+    assert same_loss_streak_records(loaded.loss_streak_predictions, engine.loss_streak_predictions)
+    assert loaded.predict_next() == engine.predict_next()
+    assert loaded.pattern_stats == engine.pattern_stats
+    for name in journal._SETTINGS:
+        assert getattr(loaded, name) == getattr(engine, name)
+
+
+def edit(rnd, engine, log):
+    # One random edit to engine, journaled into log
+    roll = rnd.random()
+    if roll < 0.8:
+        results = [rnd.choice("WL") for _ in range(rnd.choice([1, 1, 5]))]
+        for result in results:
+            engine.add_result(result)
+        log.add_results(results)
+    elif roll < 0.95:
+        engine.delete_last_result()
+        log.delete_last_result()
+    elif roll < 0.98:
+        engine.significance_threshold = rnd.randrange(1, 6)
+        engine.retention = rnd.choice([0, 100])
+        engine.trim()
+        engine.analyze()
+        log.settings(engine)
+    else:
+        engine.clear()
+        log.clear()
+
+
+class Recorder(Journal):
+    """The journal's bytes, kept in memory"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.edits = 0
+
+    def _append(self, data, edits):
+        self.data.extend(data)
+        self.edits += edits
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_replay_applies_every_kind_of_edit(seed):
+    rnd = random.Random(seed)
+    engine = AnalysisEngine(significance_threshold=2, max_pattern_length=4)
+    log = Recorder()
+    for _ in range(300):
+        edit(rnd, engine, log)
+
+    replayed = AnalysisEngine(significance_threshold=2, max_pattern_length=4)
+    assert replay(replayed, bytes(log.data)) == (len(log.data), log.edits)
+    assert_same_statistics(replayed, engine)
+
+
+@pytest.mark.parametrize("tail", [b"S{\"significance", b"X", b"XWWL", b"\x00\x00\x00"])
+def test_replay_stops_at_a_torn_or_garbage_tail(tail):
+    data = b"WLLWD" + b"S" + b'{"significance_threshold": 1, "max_pattern_length": 3, "active_algorithm": "pattern", ' \
+        b'"trend_windows": [5], "half_life": 0, "retention": 0}\n' + b"WW"
+    engine = AnalysisEngine()
+    assert replay(engine, data + tail) == (len(data), 8)
+    assert ''.join(engine.results) == "WLLWW"
+    assert engine.significance_threshold == 1
+    assert engine.trend_windows == [5]
+
+
+def journaled(directory, seed, edits, snapshots=()):
+    # A session edited and journaled, snapshotted after the edits in snapshots
+    rnd = random.Random(seed)
+    engine = AnalysisEngine(significance_threshold=2, max_pattern_length=4)
+    log = Journal(directory)
+    for count in range(edits):
+        edit(rnd, engine, log)
+        if count in snapshots:
+            log.snapshot(engine)
+    log.close()
+    return engine
+
+
+def recovered(directory):
+    log = Journal(directory)
+    try:
+        return log.recover()
+    finally:
+        log.close()
+
+
+def test_recover_truncates_a_partial_record(tmp_path):
+    directory = str(tmp_path)
+    engine = journaled(directory, 1, 200)
+    path = os.path.join(directory, "journal-0.wlj")
+    size = os.path.getsize(path)
+    with open(path, 'ab') as file:
+        file.write(b'S{"significance_thr')
+
+    assert_same_statistics(recovered(directory), engine)
+    assert os.path.getsize(path) == size
+
+    # New edits follow the complete ones
+    log = Journal(directory)
+    log.recover()
+    log.add_results(['W'])
+    log.close()
+    engine.add_result('W')
+    assert_same_statistics(recovered(directory), engine)
+
+
+def test_recover_falls_back_to_an_older_complete_snapshot(tmp_path):
+    directory = str(tmp_path)
+    engine = journaled(directory, 2, 300, snapshots=[100])
+
+    # A crash while the next snapshot was written leaves it incomplete,
+    # its generation's journal and the older generation are still there
+    log = Journal(directory)
+    log.recover()
+    log.close()
+    with open(os.path.join(directory, "snapshot-1.wls"), 'rb') as file:
+        data = file.read()
+    with open(os.path.join(directory, "snapshot-2.wls"), 'wb') as file:
+        file.write(data[:len(data) // 2])
+    with open(os.path.join(directory, "journal-2.wlj"), 'wb') as file:
+        file.write(b"WL")
+    engine.add_results(['W', 'L'])
+    assert_same_statistics(recovered(directory), engine)
+
+    os.remove(os.path.join(directory, "snapshot-1.wls"))
+    with pytest.raises(ValueError):
+        recovered(directory)
+
+
+def test_snapshot_deletes_older_generations(tmp_path):
+    directory = str(tmp_path)
+    journaled(directory, 3, 200, snapshots=[50, 120])
+    with open(os.path.join(directory, "snapshot-1.wls.tmp"), 'wb') as file:
+        file.write(b"left by a crash")
+
+    # The open journal of the old generation goes too
+    log = Journal(directory)
+    engine = log.recover()
+    engine.add_result('W')
+    log.add_results(['W'])
+    log.snapshot(engine)
+    log.close()
+    assert os.listdir(directory) == ["snapshot-3.wls"]
+    assert_same_statistics(recovered(directory), engine)
@@ -0,0 +1,51 @@
+import random
+
+import numpy as np
+import pytest
+
+import search
+from engine import MIN_RETENTION, AnalysisEngine
+from search import suffix_array
+
+
+def brute_force(results, query):
+    positions = [i for i in range(len(results) - len(query) + 1) if results[i:i + len(query)] == query]
+    following = [results[i + len(query)] for i in positions if i + len(query) < len(results)]
+    return len(positions), positions, following.count('W'), following.count('L')
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_suffix_array_sorts_every_suffix(seed):
+    rnd = random.Random(seed)
+    values = np.array([rnd.random() < (0.95 if seed % 3 == 0 else 0.5) for _ in range(rnd.randrange(1, 300))],
+                      dtype=np.uint8)
+    text = values.tobytes()
+    assert suffix_array(values).tolist() == sorted(range(len(values)), key=lambda i: text[i:])
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("retention", [0, MIN_RETENTION])
+def test_search_matches_a_brute_force_scan(monkeypatch, retention, seed):
+    # A small snapshot threshold mixes the snapshot, deleted and evicted parts and the direct scan
+    monkeypatch.setattr(search, "REBUILD_MIN", 8)
+    rnd = random.Random(seed)
+    engine = AnalysisEngine(retention=retention)
+    for _ in range(400):
+        roll = rnd.random()
+        if roll < 0.6:
+            engine.add_result(rnd.choice('WWL' if seed % 2 else 'WL'))
+        elif roll < 0.7:
+            engine.delete_last_result()
+        elif roll < 0.75:
+            engine.add_results([rnd.choice('WL') for _ in range(rnd.randrange(1, 40))])
+        else:
+            query = ''.join(rnd.choice('WL') for _ in range(rnd.randrange(1, 8)))
+            count, positions, wins, losses = brute_force(''.join(engine.results), query)
+            found = engine.search(query, latest=None)
+            assert (found["count"], found["positions"].tolist(), found["W"], found["L"]) == \
+                (count, positions, wins, losses)
+
+            latest = rnd.choice([0, 1, 3])
+            found = engine.search(query, latest)
+            assert found["count"] == count
+            assert found["positions"].tolist() == positions[len(positions) - min(latest, count):]
@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+from server import ResultServer, open_connection
+from sessions import SessionManager
+
+
+async def exchange(address, requests):
+    reader, writer = await open_connection(address)
+    writer.write("".join(json.dumps(request) + "\n" for request in requests).encode())
+    replies = [json.loads(await asyncio.wait_for(reader.readline(), 10)) for _ in requests]
+    writer.close()
+    return replies
+
+
+def test_failed_requests_do_not_stop_the_server(tmp_path):
+    address = str(tmp_path / "wl.sock")
+    manager = SessionManager()
+
+    async def run():
+        server = ResultServer(manager)
+        await server.start(address)
+        try:
+            opened = await exchange(address, [
+                {"op": "open", "session": "t", "settings": {"significance_threshold": "x"}},
+                {"op": "open", "session": "t", "settings": {"trend_windows": [0]}},
+                {"op": "open", "session": "t", "settings": {"max_pattern_length": 70}},
+                {"op": "add", "session": "t", "results": "W L W"},
+            ])
+            assert [reply["ok"] for reply in opened] == [False, False, False, True]
+
+            # An engine that fails on adding fails only its own add requests
+            manager.local.sessions["t"].results = None
+            replies = await exchange(address, [
+                {"op": "add", "session": "t", "results": "W L", "id": 1},
+                {"op": "add", "session": "u", "results": "L L", "id": 2},
+                {"op": "stats", "session": "u", "id": 3},
+                {"op": "add", "session": "t", "result": "W", "id": 4},
+            ])
+            assert [(reply["id"], reply["ok"]) for reply in replies] == [(1, False), (2, True), (3, True), (4, False)]
+            assert replies[2]["stats"]["results"] == 2
+
+            assert not server.batcher.done()
+            later = await exchange(address, [{"op": "add", "session": "u", "result": "W"}])
+            assert later[0]["ok"]
+        finally:
+            await server.close()
+
+    asyncio.run(run())
@@ -0,0 +1,35 @@
+import pytest
+
+from sessions import BatchError, SessionManager
+
+
+@pytest.mark.parametrize("settings", [
+    {"significance_threshold": "x"},
+    {"max_pattern_length": 0},
+    {"max_pattern_length": 63},
+    {"active_algorithm": "random"},
+    {"trend_windows": [0]},
+    {"trend_windows": [5, 1.5]},
+    {"half_life": -1},
+    {"retention": 50},
+    {"window": 10},
+])
+def test_open_rejects_invalid_settings(settings):
+    manager = SessionManager()
+    with pytest.raises(ValueError):
+        manager.open("t1", **settings)
+    with pytest.raises(ValueError):
+        SessionManager(**settings)
+    assert manager.session_ids() == []
+
+
+def test_failed_session_does_not_stop_the_others():
+    manager = SessionManager()
+    manager.open("good")
+    manager.open("bad")
+    manager.local.sessions["bad"].results = None  # breaks on the next add
+    with pytest.raises(BatchError) as error:
+        manager.add_results([("good", "L"), ("bad", "W"), ("good", "W")])
+    assert set(error.value.predictions) == {"good"}
+    assert set(error.value.errors) == {"bad"}
+    assert manager.stats("good")["results"] == 2
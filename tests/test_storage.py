@@ -0,0 +1,148 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+import storage
+from engine import MIN_RETENTION, AnalysisEngine, same_loss_streak_records
+from storage import load_session, save_session
+
+
+def filled_engine(seed, **settings):
+    rnd = random.Random(seed)
+    engine = AnalysisEngine(significance_threshold=2, max_pattern_length=4, **settings)
+    for _ in range(500):
+        if rnd.random() < 0.9:
+            engine.add_result(rnd.choice("WL"))
+        else:
+            engine.delete_last_result()
+    return engine
+
+
+def assert_same(loaded, engine):
+    assert ''.join(loaded.results) == ''.join(engine.results)
+    assert loaded.results.start == engine.results.start
+    assert loaded.prediction_stats == engine.prediction_stats
+    assert list(loaded.prediction_history) == list(engine.prediction_history)
+    assert same_loss_streak_records(loaded.loss_streak_predictions, engine.loss_streak_predictions)
+    assert loaded.trend_counts() == engine.trend_counts()
+    assert loaded.predict_next() == engine.predict_next()
+    assert loaded.pattern_stats == engine.pattern_stats
+
+
+def rewrite(path, version, edit):
+    # Lays the session file out again as an older version wrote it
+    with open(path, 'rb') as file:
+        data = file.read()
+    _, _, header_length = storage._SESSION_PREFIX.unpack_from(data)
+    header = json.loads(data[storage._SESSION_PREFIX.size:storage._SESSION_PREFIX.size + header_length])
+    data_start = storage._aligned(storage._SESSION_PREFIX.size + header_length)
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"]))
+        start = data_start + info["offset"]
+        arrays[name] = np.frombuffer(data, dtype, count, start).reshape(info["shape"])
+    edit(header, arrays)
+
+    header["arrays"] = {}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = storage._aligned(offset + array.nbytes)
+    encoded = json.dumps(header).encode()
+    data_start = storage._aligned(storage._SESSION_PREFIX.size + len(encoded))
+    with open(path, 'wb') as file:
+        file.write(storage._SESSION_PREFIX.pack(storage.SESSION_MAGIC, version, len(encoded)))
+        file.write(encoded)
+        for name, array in arrays.items():
+            file.seek(data_start + header["arrays"][name]["offset"])
+            file.write(array.tobytes())
+
+
+def as_version_2(header, arrays):
+    for name in ("results_start", "pattern_half_life", "pattern_time"):
+        del header[name]
+    for name in ("half_life", "retention"):
+        del header["settings"][name]
+
+
+def as_version_1(header, arrays):
+    as_version_2(header, arrays)
+    for name in list(arrays):
+        if name.startswith("pattern_"):
+            del arrays[name]
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("retention", [0, MIN_RETENTION, 150])
+@pytest.mark.parametrize("half_life", [0, 30])
+def test_saved_session_loads_with_the_same_statistics(tmp_path, half_life, retention, seed):
+    engine = filled_engine(seed, half_life=half_life, retention=retention)
+    path = str(tmp_path / "session.wls")
+    save_session(path, engine)
+
+    assert_same(load_session(path), engine)
+    target = AnalysisEngine(significance_threshold=2, max_pattern_length=4, half_life=half_life, retention=retention)
+    target.add_results("WWLW")
+    assert load_session(path, target) is target
+    assert_same(target, engine)
+
+
+@pytest.mark.parametrize("version, edit", [(1, as_version_1), (2, as_version_2)])
+def test_older_session_versions_load(tmp_path, version, edit):
+    engine = filled_engine(7)
+    path = str(tmp_path / "session.wls")
+    save_session(path, engine)
+    rewrite(path, version, edit)
+
+    assert_same(load_session(path), engine)
+
+
+def test_session_with_more_results_than_retention_is_trimmed(tmp_path):
+    engine = filled_engine(3)
+    path = str(tmp_path / "session.wls")
+    save_session(path, engine)
+
+    bounded = load_session(path, AnalysisEngine(significance_threshold=2, max_pattern_length=4, retention=150))
+    assert len(bounded.results) == 150
+    assert bounded.results.start == len(engine.results) - 150
+    assert ''.join(bounded.results) == ''.join(engine.results)[-150:]
+
+
+def corrupt_files(data, header_length):
+    # Cuts at the prefix, in the header and in the arrays, then broken sections
+    data_start = storage._aligned(storage._SESSION_PREFIX.size + header_length)
+    for length in (0, 10, storage._SESSION_PREFIX.size + header_length // 2, data_start + 3, len(data) - 1):
+        yield data[:length]
+
+    header = json.loads(data[storage._SESSION_PREFIX.size:storage._SESSION_PREFIX.size + header_length])
+    for name, info, value in (("results", "offset", len(data)), ("pattern_counts", "shape", [10 ** 6, 2]),
+                              ("pattern_codes", "dtype", "not a dtype"), ("pattern_depths", "shape", [-1])):
+        broken = json.loads(json.dumps(header))
+        broken["arrays"][name][info] = value
+        encoded = json.dumps(broken).encode().ljust(header_length)
+        yield storage._SESSION_PREFIX.pack(storage.SESSION_MAGIC, storage.SESSION_VERSION, header_length) + \
+            encoded + data[storage._SESSION_PREFIX.size + header_length:]
+
+    children = header["arrays"]["pattern_children"]
+    position = data_start + children["offset"]
+    yield data[:position] + np.int32(10 ** 6).tobytes() + data[position + 4:]
+
+
+def test_damaged_session_leaves_the_engine_unchanged(tmp_path):
+    path = str(tmp_path / "session.wls")
+    save_session(path, filled_engine(1))
+    with open(path, 'rb') as file:
+        data = file.read()
+    _, _, header_length = storage._SESSION_PREFIX.unpack_from(data)
+
+    engine = filled_engine(2)
+    before = engine.copy()
+    for damaged in corrupt_files(data, header_length):
+        with open(path, 'wb') as file:
+            file.write(damaged)
+        with pytest.raises(ValueError):
+            load_session(path, engine)
+        assert_same(engine, before)
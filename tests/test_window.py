@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+import pattern
+from engine import AnalysisEngine
+from journal import Journal
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def pushed(results):
+    return [{"event": "result", "session": "t", "results": list(results)}]
+
+
+def wait_for_worker(app, window):
+    end = time.time() + 30
+    while window.worker is not None and time.time() < end:
+        app.processEvents()
+        time.sleep(0.002)
+    assert window.worker is None
+
+
+@pytest.mark.parametrize("cancel", [False, True])
+def test_results_pushed_during_a_worker_are_kept(app, tmp_path, cancel):
+    directory = str(tmp_path / "autosave")
+    window = pattern.ModernBaccaratAnalyzer(directory)
+    window.engine.add_results("WLWWLLWLWW")
+    window.snapshot_journal()
+
+    # Attached, as far as the window can tell, without a server
+    window.feed = pattern.FeedClient(str(tmp_path / "feed.sock"), window)
+    window.feed_session = "t"
+
+    release = threading.Event()
+
+    def task(engine, reporter):
+        release.wait(10)
+        reporter("Waiting...")(1, 1)
+        return "Done"
+
+    window.start_worker("test", task, "Error: ")
+    window.feed_messages(pushed("WWL"))
+    window.feed_messages(pushed("L"))
+    if cancel:
+        window.cancel_worker()
+    release.set()
+    wait_for_worker(app, window)
+
+    expected = AnalysisEngine()
+    expected.add_results("WLWWLLWLWW")
+    for result in "WWLL":
+        expected.add_result(result)
+    assert ''.join(window.engine.results) == ''.join(expected.results)
+    assert window.engine.prediction_stats == expected.prediction_stats
+    assert window.feed_pending is None
+
+    # The journal holds them too
+    window.detach_feed("Detached")
+    window.close()
+    journal = Journal(directory)
+    recovered = journal.recover()
+    journal.close()
+    assert ''.join(recovered.results) == ''.join(expected.results)